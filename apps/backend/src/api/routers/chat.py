@@ -1,9 +1,12 @@
 """
-chat.py — Router de chat (rotas /chat, /chats).
+chat.py — Router de chat (rotas /chat, /chat/stream, /chats).
 """
 
+import json
 from typing import Optional
-from fastapi import APIRouter, HTTPException  # type: ignore
+from uuid import uuid4
+from fastapi import APIRouter, HTTPException, Query  # type: ignore
+from fastapi.responses import StreamingResponse  # type: ignore
 from pydantic import BaseModel  # type: ignore
 
 from data.db import (
@@ -11,7 +14,9 @@ from data.db import (
     delete_chat, toggle_pin, update_chat_title,
     get_user_config, set_user_config
 )
-from services.chat_service import process_chat
+from data.pool import run_blocking
+from services.chat_service import process_chat, stream_chat
+from services.llm_scheduler import QueueFullError, ScheduledTurn, get_llm_scheduler
 from services.monster_service import get_rag_context, get_all_skill_caps
 
 router = APIRouter()
@@ -32,50 +37,75 @@ class ChatRequest(BaseModel):
     message: str
     chat_id: Optional[str] = None
     history: list = []
+    no_cache: bool = False  # True = não usar o cache de respostas neste turno
 
 
 # --- Chat Management ---
 
 @router.get("/chats")
-async def list_chats():
-    return get_all_chats()
+async def list_chats(
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Chats por página (sem limite = todos)"),
+    offset: int = Query(0, ge=0),
+):
+    return await run_blocking(get_all_chats, limit, offset)
 
 
 @router.post("/chats")
 async def new_chat(data: Optional[dict] = None):
     title = (data or {}).get("title", "Nova Conversa")
-    return {"id": create_chat(title), "title": title}
+    return {"id": await run_blocking(create_chat, title), "title": title}
 
 
 @router.get("/chats/{chat_id}/history")
-async def get_history(chat_id: str):
-    return get_chat_messages(chat_id)
+async def get_history(
+    chat_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Mensagens por página (sem limite = todas)"),
+    before: Optional[int] = Query(None, description="Só mensagens anteriores a este timestamp (ms)"),
+):
+    """
+    Histórico em ordem cronológica. Com `limit`, traz as mensagens mais
+    recentes; a página anterior é `before=<timestamp da primeira recebida>`.
+    """
+    return await run_blocking(get_chat_messages, chat_id, limit, before)
 
 
 @router.delete("/chats/{chat_id}")
 async def remove_chat(chat_id: str):
-    delete_chat(chat_id)
+    await run_blocking(delete_chat, chat_id)
     return {"status": "deleted"}
 
 
 @router.patch("/chats/{chat_id}/pin")
 async def pin_chat(chat_id: str):
-    toggle_pin(chat_id)
+    await run_blocking(toggle_pin, chat_id)
     return {"status": "toggled"}
 
 
 @router.patch("/chats/{chat_id}/title")
 async def rename_chat(chat_id: str, data: dict):
     title = data.get("title")
-    update_chat_title(chat_id, title)
+    await run_blocking(update_chat_title, chat_id, title)
     return {"status": "renamed"}
 
 
 # --- Chat Endpoint ---
 
+def _admit(request: ChatRequest) -> ScheduledTurn:
+    """
+    Entra na fila da LLM ou responde 503 na hora, antes de qualquer trabalho.
+    Sem chat_id, o turno tem uma chave FIFO própria: clientes anônimos não
+    esperam uns pelos outros (só "default_session" é compartilhado, no histórico).
+    """
+    try:
+        return get_llm_scheduler().admit(request.chat_id or f"anon:{uuid4()}")
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
 @router.post("/chat")
 async def chat(request: ChatRequest):
     chat_id = request.chat_id or "default_session"
+    scheduled = _admit(request)
 
     try:
         result = await process_chat(
@@ -83,6 +113,8 @@ async def chat(request: ChatRequest):
             chat_id=chat_id,
             skill_caps=_skill_caps,
             get_rag_context_fn=get_rag_context,
+            use_cache=not request.no_cache,
+            scheduled=scheduled,
         )
         return result
     except TimeoutError:
@@ -91,10 +123,38 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Mesma conversa de /chat, mas em Server-Sent Events: cada trecho da
+    resposta sai assim que a LLM o produz (`data: {"delta": ...}`), seguido
+    de `data: {"done": true, "chat_id": ...}` ou `data: {"error": ...}`.
+    Com a fila da LLM cheia, responde 503 (Retry-After) sem abrir o stream.
+    """
+    chat_id = request.chat_id or "default_session"
+    scheduled = _admit(request)
+
+    async def events():
+        async for event in stream_chat(
+            user_message=request.message,
+            chat_id=chat_id,
+            skill_caps=_skill_caps,
+            get_rag_context_fn=get_rag_context,
+            use_cache=not request.no_cache,
+            scheduled=scheduled,
+        ):
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # --- User Profile ---
 
-@router.get("/user/profile")
-async def get_profile():
+def _read_profile() -> dict:
     return {
         "mr": get_user_config("mr", 1),
         "hr": get_user_config("hr", 0),
@@ -103,14 +163,17 @@ async def get_profile():
     }
 
 
+@router.get("/user/profile")
+async def get_profile():
+    return await run_blocking(_read_profile)
+
+
 @router.post("/user/profile")
 async def update_profile(data: dict):
-    if "mr" in data:
-        set_user_config("mr", data["mr"])
-    if "hr" in data:
-        set_user_config("hr", data["hr"])
-    if "jewels" in data:
-        set_user_config("jewels", data["jewels"])
+    # As gravações do sessions.db passam pelo SingleWriter (Future.result() bloqueia)
+    for key in ("mr", "hr", "jewels"):
+        if key in data:
+            await run_blocking(set_user_config, key, data[key])
     return {"status": "updated"}
 
 
@@ -0,0 +1,31 @@
+"""
+metrics.py — Router de métricas internas (/metrics).
+"""
+
+from fastapi import APIRouter  # type: ignore
+
+from core.mhw.lookup_cache import lookup_cache_metrics
+from core.mhw.query_embedder import embedding_metrics
+from data.pool import pool_metrics
+from services.catalog_service import catalog_metrics
+from services.chat_service import chat_stage_metrics, prompt_token_metrics
+from services.llm_client import llm_client_metrics
+from services.llm_scheduler import llm_scheduler_metrics
+from services.response_cache import response_cache_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+async def get_metrics():
+    return {
+        "db_pools": pool_metrics(),
+        "catalog": catalog_metrics(),
+        "lookup_caches": lookup_cache_metrics(),
+        "llm_client": llm_client_metrics(),
+        "llm_scheduler": llm_scheduler_metrics(),
+        "chat_stages": chat_stage_metrics(),
+        "prompt_tokens": prompt_token_metrics(),
+        "query_embeddings": embedding_metrics(),
+        "response_cache": response_cache_metrics(),
+    }
@@ -34,6 +34,7 @@ DATA_DIR = ROOT_DIR / "data"
 RAG_DIR = DATA_DIR / "rag"
 STORAGE_DIR = DATA_DIR / "storage"
 KNOWLEDGE_DIR = DATA_DIR / "knowledge_base"
+CACHE_DIR = DATA_DIR / "cache"
 
 # --- Environment ---
 load_dotenv(ROOT_DIR / ".env")
@@ -46,15 +47,85 @@ HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8000"))
 
 # --- LLM ---
-LLM_BASE_URL = "https://integrate.api.nvidia.com/v1"
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://integrate.api.nvidia.com/v1")
 LLM_MODEL = "moonshotai/kimi-k2-instruct-0905"
 LLM_TIMEOUT = 60.0
 LLM_TEMPERATURE = 0.3
 LLM_MAX_TOKENS = 2048
 
+# --- LLM HTTP client (um por processo, ver services/llm_client.py) ---
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "1") != "0"
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# --- Fila de chamadas à LLM (services/llm_scheduler.py) ---
+# Chamadas simultâneas à LLM (turnos de chat, streams e resumos do histórico)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Turnos esperando a vez antes de recusar com 503
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "32"))
+# Retry-After (s) enquanto não há duração de chamadas para estimar
+LLM_QUEUE_RETRY_AFTER = int(os.getenv("LLM_QUEUE_RETRY_AFTER", "5"))
+
 # --- DB Paths ---
 MHW_DB_PATH = str(DATA_DIR / "mhw.db")
-SESSIONS_DB_PATH = str(DATA_DIR / "sessions.db")
+SESSIONS_DB_PATH = os.getenv("SESSIONS_DB_PATH", str(DATA_DIR / "sessions.db"))
+NAME_INDEX_PATH = str(CACHE_DIR / "name_index.db")
+QUERY_EMBED_CACHE_PATH = str(CACHE_DIR / "query_embeddings.db")
+GAME_DATA_CACHE_PATH = str(CACHE_DIR / "game_data.db")
+RESPONSE_CACHE_PATH = str(DATA_DIR / "response_cache.db")
+
+# --- DB Pool ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Threads para trabalho bloqueante (SQLite) fora do event loop; padrão = tamanho do pool
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(DB_POOL_SIZE)))
+
+# --- Lookup Cache (get_armor_details / get_weapon_details) ---
+LOOKUP_CACHE_SIZE = int(os.getenv("LOOKUP_CACHE_SIZE", "2048"))
+LOOKUP_CACHE_TTL = float(os.getenv("LOOKUP_CACHE_TTL", "3600"))
+
+# --- Cache de embeddings de queries do RAG (core/mhw/embedding_cache.py) ---
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "20000"))
+QUERY_EMBED_BATCH_SIZE = int(os.getenv("QUERY_EMBED_BATCH_SIZE", "50"))
+
+# --- Histórico do chat (services/history_manager.py) ---
+# Últimos N turnos (pergunta + resposta) vão literais, dentro do orçamento de tokens;
+# os anteriores entram como um resumo incremental guardado no sessions.db
+CHAT_HISTORY_MAX_TURNS = int(os.getenv("CHAT_HISTORY_MAX_TURNS", "6"))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "400"))
+# Mensagens antigas dobradas no resumo por atualização (chats longos alcançam aos poucos)
+CHAT_SUMMARY_BATCH = int(os.getenv("CHAT_SUMMARY_BATCH", "20"))
+
+# --- Cache de respostas do chat (services/response_cache.py) ---
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") != "0"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+# Similaridade mínima (cosseno) para reaproveitar a resposta de uma pergunta
+# quase igual com o mesmo contexto; 0 desliga a busca por embedding
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.97"))
+
+# --- Busca híbrida do RAG (denso + BM25, fundidos com RRF) ---
+# Só as N primeiras queries expandidas vão para a busca vetorial; todas vão ao BM25
+RAG_DENSE_QUERIES = int(os.getenv("RAG_DENSE_QUERIES", "4"))
+RAG_SPARSE_TOP_K = int(os.getenv("RAG_SPARSE_TOP_K", "20"))
+RAG_FUSION_TOP_K = int(os.getenv("RAG_FUSION_TOP_K", "40"))
+
+# --- Montagem do contexto RAG (core/mhw/context_assembler.py) ---
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "6000"))  # 0 = sem limite
+RAG_CONTEXT_DEDUP_THRESHOLD = float(os.getenv("RAG_CONTEXT_DEDUP_THRESHOLD", "0.8"))  # Jaccard (MinHash)
+RAG_CONTEXT_ENTITY_BOOST = float(os.getenv("RAG_CONTEXT_ENTITY_BOOST", "0.15"))
+
+# --- Loader de XMLs do RAG (core/mhw/rag_loader.py) ---
+# Pico de memória por XML via tracemalloc (deixa o parse ~3x mais lento)
+RAG_PARSE_TRACE_MEMORY = os.getenv("RAG_PARSE_TRACE_MEMORY", "0") == "1"
+# Processos para parse + loaders no rebuild (0/1 = serial). Cada processo
+# importa o LlamaIndex (~2s), então só compensa com vários núcleos livres.
+RAG_LOADER_WORKERS = int(os.getenv("RAG_LOADER_WORKERS", "0"))
 
 # Logic to enforce SSoT: files must exist in ROOT_DIR / data
 if not os.path.exists(MHW_DB_PATH):
@@ -0,0 +1,171 @@
+"""
+context_assembler.py — Monta o contexto RAG do turno dentro de um orçamento de tokens.
+
+get_rag_context recupera dezenas de nodes (várias queries expandidas × top-k);
+colar tudo no prompt do sistema deixa a LLM lenta e cara. `assemble`:
+
+  1. Pontua cada node juntando as listas de todas as queries: maior score +
+     uma fração da soma dos demais (node que aparece em várias queries sobe),
+     normalizado para [0, 1].
+  2. Soma um bônus por entidade da pergunta (monstro, arma, skill...) citada
+     no node.
+  3. Descarta quase-duplicatas: MinHash sobre shingles de palavras, com
+     Jaccard estimado >= RAG_CONTEXT_DEDUP_THRESHOLD em relação a um node já
+     escolhido (além do prefixo idêntico de 400 caracteres de antes).
+  4. Empacota os melhores até RAG_CONTEXT_TOKEN_BUDGET tokens, pela
+     estimativa local de `estimate_tokens` (sem tokenizer de modelo).
+"""
+
+import re
+import zlib
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np  # type: ignore
+
+from core.config import (
+    RAG_CONTEXT_TOKEN_BUDGET, RAG_CONTEXT_DEDUP_THRESHOLD, RAG_CONTEXT_ENTITY_BOOST,
+)
+
+SUM_WEIGHT = 0.25      # peso dos scores além do maior (node em várias queries)
+MAX_ENTITY_BOOSTS = 3  # bônus de entidade conta no máximo N menções
+SEPARATOR = "\n\n"
+
+_SHINGLE = 3
+_NUM_HASHES = 64
+_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(20240601)
+_HASH_A = _rng.integers(1, _PRIME, size=_NUM_HASHES, dtype=np.uint64)
+_HASH_B = _rng.integers(0, _PRIME, size=_NUM_HASHES, dtype=np.uint64)
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_WORD_RE = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimativa rápida de tokens BPE: cada palavra ou símbolo conta 1, e
+    palavras longas contam mais um a cada 4 caracteres além dos 4 primeiros
+    (português acentuado quebra em mais pedaços que inglês).
+    """
+    if not text:
+        return 0
+    return sum(1 + max(0, len(piece) - 4) // 4 for piece in _PIECE_RE.findall(text))
+
+
+# ------------------------------------------------------------
+# Quase-duplicatas (MinHash)
+# ------------------------------------------------------------
+
+def minhash(text: str) -> np.ndarray:
+    """Assinatura MinHash (_NUM_HASHES valores) dos shingles de _SHINGLE palavras."""
+    words = _WORD_RE.findall(text.casefold())
+    if len(words) < _SHINGLE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + _SHINGLE]) for i in range(len(words) - _SHINGLE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # Permutações (a·x + b) mod p; o estouro de uint64 só embaralha mais (como no datasketch)
+    values = (_HASH_A[:, None] * hashes[None, :] + _HASH_B[:, None]) % _PRIME
+    return values.min(axis=1)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard estimado entre duas assinaturas."""
+    return float(np.count_nonzero(a == b)) / _NUM_HASHES
+
+
+# ------------------------------------------------------------
+# Montagem
+# ------------------------------------------------------------
+
+class Candidate:
+    __slots__ = ("node_id", "content", "scores", "score", "boosts")
+
+    def __init__(self, node_id: str, content: str):
+        self.node_id = node_id
+        self.content = content
+        self.scores: List[float] = []
+        self.score = 0.0
+        self.boosts = 0
+
+
+class AssembledContext(NamedTuple):
+    text: str
+    tokens: int
+    candidates: int  # nodes únicos recebidos
+    selected: int
+    duplicates: int  # descartados por prefixo igual ou MinHash
+    over_budget: int  # descartados por não caber no orçamento
+
+
+def _collect(results: Iterable[Sequence]) -> List[Candidate]:
+    """Junta as listas (NodeWithScore) de todas as queries, um Candidate por node."""
+    by_id: dict = {}
+    for nodes in results:
+        for n in nodes:
+            cand = by_id.get(n.node.node_id)
+            if cand is None:
+                cand = by_id[n.node.node_id] = Candidate(n.node.node_id, n.node.get_content())
+            cand.scores.append(float(n.score) if n.score is not None else 0.0)
+    return list(by_id.values())
+
+
+def _score(candidates: List[Candidate], entities: Sequence[str], entity_boost: float):
+    for cand in candidates:
+        best = max(cand.scores)
+        cand.score = best + SUM_WEIGHT * (sum(cand.scores) - best)
+    top = max((c.score for c in candidates), default=0.0)
+    if top > 0:
+        for cand in candidates:
+            cand.score /= top
+    if entities and entity_boost:
+        for cand in candidates:
+            lower = cand.content.lower()
+            cand.boosts = min(MAX_ENTITY_BOOSTS, sum(1 for e in entities if e in lower))
+            cand.score += entity_boost * cand.boosts
+
+
+def assemble(
+    results: Iterable[Sequence],
+    entities: Sequence[str] = (),
+    token_budget: Optional[int] = None,
+    dedup_threshold: Optional[float] = None,
+    entity_boost: Optional[float] = None,
+) -> AssembledContext:
+    """
+    `results`: uma lista de NodeWithScore por query (ou uma só, já fundida).
+    `entities`: termos da pergunta (minúsculos) que dão bônus ao node que os cita.
+    """
+    token_budget = RAG_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    dedup_threshold = RAG_CONTEXT_DEDUP_THRESHOLD if dedup_threshold is None else dedup_threshold
+    entity_boost = RAG_CONTEXT_ENTITY_BOOST if entity_boost is None else entity_boost
+
+    candidates = _collect(results)
+    _score(candidates, [e for e in dict.fromkeys(entities) if e], entity_boost)
+    candidates.sort(key=lambda c: -c.score)
+
+    chosen: List[str] = []
+    signatures: List[np.ndarray] = []
+    seen_keys: set = set()
+    tokens = duplicates = over_budget = 0
+    separator_tokens = estimate_tokens(SEPARATOR)
+    for cand in candidates:
+        # Prefixo idêntico (headers repetidos entre chunks do mesmo documento)
+        key = cand.content[:400]
+        if key in seen_keys:
+            duplicates += 1
+            continue
+        cost = estimate_tokens(cand.content) + (separator_tokens if chosen else 0)
+        if token_budget > 0 and tokens + cost > token_budget:
+            over_budget += 1
+            continue
+        signature = minhash(cand.content)
+        if any(similarity(signature, s) >= dedup_threshold for s in signatures):
+            duplicates += 1
+            continue
+        seen_keys.add(key)
+        signatures.append(signature)
+        chosen.append(cand.content)
+        tokens += cost
+
+    return AssembledContext(SEPARATOR.join(chosen), tokens, len(candidates), len(chosen), duplicates, over_budget)
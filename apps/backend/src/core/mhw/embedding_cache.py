@@ -0,0 +1,184 @@
+"""
+embedding_cache.py — Cache persistente de embeddings de queries do RAG.
+
+Boa parte das queries geradas por _expand_queries são textos fixos
+("CONJUNTO DE ARMADURA: Barioth", "MONSTRO: rathalos", ...). Os embeddings
+delas ficam em data/cache/query_embeddings.db, chaveados por modelo + texto
+normalizado, então só o prompt livre do usuário precisa ir à API.
+
+- Chave: sha1(modelo + texto normalizado: NFC, casefold, espaços colapsados)
+- Valor: vetor float32 em BLOB
+- LRU: `last_used` atualizado a cada acerto; acima de
+  QUERY_EMBED_CACHE_SIZE entradas as menos usadas são apagadas.
+- Um LRU pequeno em memória na frente evita ir ao SQLite nas queries quentes.
+
+Fica em data/cache (e não em data/storage) porque o storage do índice é
+apagado a cada rebuild, e embeddings de query não dependem do índice.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+from core.config import QUERY_EMBED_CACHE_PATH, QUERY_EMBED_CACHE_SIZE
+
+_MEMORY_SIZE = 1024
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).casefold().split())
+
+
+def _key(model: str, text: str) -> str:
+    return hashlib.sha1(f"{model}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+
+def _to_blob(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _from_blob(blob: bytes) -> list[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class QueryEmbeddingCache:
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max(1, max_size)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._memory: "OrderedDict[str, list[float]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: str, vector: list[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > _MEMORY_SIZE:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> dict[int, list[float]]:
+        """{posição em texts: vetor} para os textos já em cache."""
+        keys = [_key(model, t) for t in texts]
+        found: dict[int, list[float]] = {}
+        with self._lock:
+            pending: dict[str, list[int]] = {}
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[i] = vector
+                else:
+                    pending.setdefault(key, []).append(i)
+
+            if pending:
+                conn = self._connection()
+                placeholders = ",".join("?" * len(pending))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", list(pending)
+                ).fetchall()
+                for key, blob in rows:
+                    vector = _from_blob(blob)
+                    self._remember(key, vector)
+                    for i in pending[key]:
+                        found[i] = vector
+                    self.disk_hits += 1
+                if rows:
+                    conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        [time.time(), *(key for key, _ in rows)],
+                    )
+                    conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return found
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = _key(model, text)
+                self._remember(key, list(vector))
+                rows.append((key, model, normalize_query(text), _to_blob(vector), now))
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, text, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_size:
+                excess = count - self.max_size
+                conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self.evicted += excess
+            conn.commit()
+            self.stored += len(rows)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def metrics(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            size = self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                "size": size,
+                "max_size": self.max_size,
+                "memory_size": len(self._memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "stored": self.stored,
+                "evicted": self.evicted,
+            }
+
+
+_cache: Optional[QueryEmbeddingCache] = None
+_init_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    global _cache
+    if _cache is None:
+        with _init_lock:
+            if _cache is None:
+                _cache = QueryEmbeddingCache(QUERY_EMBED_CACHE_PATH, QUERY_EMBED_CACHE_SIZE)
+    return _cache
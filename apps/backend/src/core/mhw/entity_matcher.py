@@ -0,0 +1,211 @@
+"""
+entity_matcher.py — Detector de entidades (Aho–Corasick) para mensagens do chat.
+
+Um único autômato, montado uma vez, reconhece numa só passada pelo texto
+todas as menções de:
+  - monstros (MONSTER_ABBREVIATIONS, MONSTER_TREE_MAP)
+  - elementos (ELEMENT_MAP) e tipos de arma (WEAPON_MAP)
+  - apelidos de skill (SKILL_MAP)
+  - nomes do mhw.db (armaduras, armas, amuletos, joias, monstros, skills; pt/en)
+
+O casamento é feito sobre `text.lower()` (os spans se referem a esse texto).
+Padrões curtos (<= 3 caracteres, ex: "gs", "ls", "cb") e nomes do banco
+só contam em limite de palavra, para "gs" não casar dentro de "things".
+
+Usado por _expand_queries (mhw_rag), _extract_and_verify_equipment
+(chat_service) e pela normalização de skills de search_equipment.
+"""
+
+import threading
+from typing import Iterable, NamedTuple, Optional
+
+from core.logging import log
+from data.pool import get_mhw_pool, mhw_db_fingerprint
+
+# Tipos vindos do mhw.db: kind -> tabela *_text
+DB_KINDS = {
+    "armor_name": "armor_text",
+    "weapon_name": "weapon_text",
+    "charm_name": "charm_text",
+    "decoration_name": "decoration_text",
+    "monster_name": "monster_text",
+    "skill_name": "skilltree_text",
+}
+
+_SHORT_PATTERN = 3
+_MIN_DB_NAME = 4
+
+
+class EntityMatch(NamedTuple):
+    kind: str      # "monster", "monster_tree", "element", "weapon_type", "skill" ou um DB_KINDS
+    key: str       # padrão que casou (minúsculo)
+    value: object  # valor associado (abreviação, nome canônico, id do banco...)
+    start: int
+    end: int
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch in "_'"
+
+
+class AhoCorasick:
+    """Autômato Aho–Corasick simples: trie em dicts + links de falha."""
+
+    def __init__(self):
+        self._goto: list[dict] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, payload):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), pattern, payload))
+
+    def build(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                # Saídas do sufixo também valem neste nó
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def iter(self, text: str):
+        """Gera (start, end, pattern, payload) para cada ocorrência, em ordem de término."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, pattern, payload in out[node]:
+                yield i + 1 - length, i + 1, pattern, payload
+
+    def __len__(self):
+        return len(self._goto)
+
+
+class EntityMatcher:
+    def __init__(self, fingerprint: Optional[str] = None):
+        self.fingerprint = fingerprint
+        self._automaton = AhoCorasick()
+        self._seen: set = set()
+        self._pattern_count = 0
+
+    def add(self, pattern: str, kind: str, value, whole_word: bool = False):
+        pattern = pattern.lower().strip()
+        if not pattern or (pattern, kind, value) in self._seen:
+            return
+        self._seen.add((pattern, kind, value))
+        self._automaton.add(pattern, (kind, value, whole_word or len(pattern) <= _SHORT_PATTERN))
+        self._pattern_count += 1
+
+    def build(self) -> "EntityMatcher":
+        self._automaton.build()
+        self._seen.clear()
+        return self
+
+    def find(self, text: str, kinds: Optional[Iterable[str]] = None) -> list[EntityMatch]:
+        """Todas as menções em `text` (sobrepostas inclusive), ordenadas por posição."""
+        if not text:
+            return []
+        lower = text.lower()
+        wanted = set(kinds) if kinds is not None else None
+        matches = []
+        for start, end, pattern, (kind, value, whole_word) in self._automaton.iter(lower):
+            if wanted is not None and kind not in wanted:
+                continue
+            if whole_word and (
+                (start > 0 and _is_word_char(lower[start - 1]))
+                or (end < len(lower) and _is_word_char(lower[end]))
+            ):
+                continue
+            matches.append(EntityMatch(kind, pattern, value, start, end))
+        matches.sort(key=lambda m: (m.start, -(m.end - m.start)))
+        return matches
+
+    def stats(self) -> dict:
+        return {"patterns": self._pattern_count, "nodes": len(self._automaton)}
+
+
+def longest_non_overlapping(matches: list[EntityMatch]) -> list[EntityMatch]:
+    """Mantém, da esquerda para a direita, a menção mais longa em cada trecho do texto."""
+    chosen: list[EntityMatch] = []
+    for m in sorted(matches, key=lambda m: (-(m.end - m.start), m.start)):
+        if all(m.end <= c.start or m.start >= c.end for c in chosen):
+            chosen.append(m)
+    return sorted(chosen, key=lambda m: m.start)
+
+
+# ============================================================
+# Instância global
+# ============================================================
+
+def _build_matcher(fingerprint: Optional[str]) -> EntityMatcher:
+    from core.mhw.mhw_rag import MONSTER_ABBREVIATIONS
+    from core.mhw.mhw_tools import MONSTER_TREE_MAP, ELEMENT_MAP, WEAPON_MAP, SKILL_MAP
+
+    matcher = EntityMatcher(fingerprint)
+    for name, abbrev in MONSTER_ABBREVIATIONS.items():
+        matcher.add(name, "monster", abbrev)
+    for monster in MONSTER_TREE_MAP:
+        matcher.add(monster, "monster_tree", monster)
+    for key, element in ELEMENT_MAP.items():
+        matcher.add(key, "element", element)
+    for key, weapon_type in WEAPON_MAP.items():
+        matcher.add(key, "weapon_type", weapon_type)
+    for key, skill in SKILL_MAP.items():
+        matcher.add(key, "skill", skill)
+
+    if fingerprint is not None:
+        with get_mhw_pool().connection() as conn:
+            for kind, table in DB_KINDS.items():
+                rows = conn.execute(
+                    f"SELECT id, name FROM {table} WHERE lang_id IN ('pt', 'en') AND name IS NOT NULL"
+                ).fetchall()
+                for r in rows:
+                    if len(r['name'].strip()) >= _MIN_DB_NAME:
+                        matcher.add(r['name'], kind, r['id'], whole_word=True)
+    return matcher.build()
+
+
+_lock = threading.Lock()
+_matcher: Optional[EntityMatcher] = None
+
+
+def get_entity_matcher() -> EntityMatcher:
+    """Matcher compartilhado; remontado se o mhw.db mudar."""
+    global _matcher
+    try:
+        fingerprint = mhw_db_fingerprint()
+    except OSError:
+        fingerprint = None  # Sem mhw.db: só os mapas estáticos
+    current = _matcher
+    if current is not None and current.fingerprint == fingerprint:
+        return current
+    with _lock:
+        if _matcher is None or _matcher.fingerprint != fingerprint:
+            _matcher = _build_matcher(fingerprint)
+            log.info(f"EntityMatcher: {_matcher.stats()['patterns']} padrões compilados")
+        return _matcher
+
+
+def find_entities(text: str, kinds: Optional[Iterable[str]] = None) -> list[EntityMatch]:
+    return get_entity_matcher().find(text, kinds)
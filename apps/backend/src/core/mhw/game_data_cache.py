@@ -0,0 +1,316 @@
+"""
+game_data_cache.py — Cache compilado dos XMLs de data/rag.
+
+Cada XML vira uma tabela SQLite própria em data/cache/game_data.db, com uma
+coluna por campo do DATA_RECORD (na ordem original dos registros). Ler uma
+tabela do cache é bem mais rápido que parsear o XML, e os leitores de
+runtime (rag_loader, nomes de monstros no startup) usam só o cache.
+
+Versionamento por arquivo, com os mesmos hashes SHA256 do rag_manifest.json:
+  - files(name, size, mtime_ns, sha256, ...) registra de qual versão do XML
+    cada tabela foi compilada;
+  - se size/mtime batem, a tabela é usada direto; senão o XML é re-hasheado
+    e, se o conteúdo mudou, só aquela tabela é recompilada.
+
+Compilação completa (passo de build):
+    python -m core.mhw.game_data_cache
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from core.config import GAME_DATA_CACHE_PATH, RAG_DIR
+
+# Incrementar quando o formato das tabelas mudar (força recompilação)
+CACHE_VERSION = 1
+
+# Valores curtos (ids, lang_id, números) se repetem muito entre registros
+_INTERN_MAX_LEN = 32
+
+
+class XMLTable:
+    """
+    Registros de um XML em colunas: {campo: [valor por registro]}, com None
+    onde o registro não tem o campo. Ocupa bem menos que uma lista de dicts.
+    """
+
+    __slots__ = ("columns", "size")
+
+    def __init__(self):
+        self.columns: dict[str, list] = {}
+        self.size = 0
+
+    def append(self, record: dict):
+        for field in record:
+            if field not in self.columns:
+                self.columns[field] = [None] * self.size
+        for field, column in self.columns.items():
+            column.append(record.get(field))
+        self.size += 1
+
+    def rows(self) -> list[dict]:
+        """Registros como dicts (novos a cada chamada; campos ausentes ficam de fora)."""
+        fields = list(self.columns.items())
+        return [
+            {field: column[i] for field, column in fields if column[i] is not None}
+            for i in range(self.size)
+        ]
+
+
+def iterparse_table(path: Path) -> XMLTable:
+    """Lê os DATA_RECORD (filhos da raiz) em streaming, liberando cada elemento após o uso."""
+    table = XMLTable()
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1 and elem.tag == "DATA_RECORD":
+            record = {}
+            for child in elem:
+                value = child.text or ""
+                record[child.tag] = sys.intern(value) if len(value) <= _INTERN_MAX_LEN else value
+            table.append(record)
+            root.clear()
+    return table
+
+
+def _file_hash(path: Path) -> str:
+    """SHA256 do arquivo (mesmo hash do rag_manifest.json)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+@contextmanager
+def _immediate(conn: sqlite3.Connection):
+    """
+    Transação BEGIN IMMEDIATE (trava de escrita já no início). O sqlite3 do
+    Python não abre transação para DDL, então sem isso DROP/CREATE rodariam
+    em autocommit, fora da transação dos INSERTs.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+class GameDataCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.loaded = 0
+        self.compiled = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS files (
+                    name TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    columns TEXT NOT NULL,
+                    records INTEGER NOT NULL,
+                    compiled_at REAL NOT NULL
+                );
+            """)
+            with _immediate(conn):
+                row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+                if not row or int(row[0]) != CACHE_VERSION:
+                    for (table_name,) in conn.execute("SELECT table_name FROM files").fetchall():
+                        conn.execute(f"DROP TABLE IF EXISTS {_quote(table_name)}")
+                    conn.execute("DELETE FROM files")
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(CACHE_VERSION),))
+            self._conn = conn
+        return self._conn
+
+    # ------------------------------------------------------------
+    # Versão de cada tabela
+    # ------------------------------------------------------------
+
+    def _fresh_entry(self, conn, path: Path, st: os.stat_result) -> Optional[tuple]:
+        """(table_name, columns) se a tabela compilada corresponde ao XML atual."""
+        row = conn.execute(
+            "SELECT size, mtime_ns, sha256, table_name, columns FROM files WHERE name = ?", (path.name,)
+        ).fetchone()
+        if row is None:
+            return None
+        size, mtime_ns, sha256, table_name, columns = row
+        if (size, mtime_ns) != (st.st_size, st.st_mtime_ns):
+            if _file_hash(path) != sha256:
+                return None
+            # Mesmo conteúdo (ex.: arquivo copiado/tocado): só atualiza o stat
+            conn.execute(
+                "UPDATE files SET size = ?, mtime_ns = ? WHERE name = ?",
+                (st.st_size, st.st_mtime_ns, path.name),
+            )
+            conn.commit()
+        return table_name, json.loads(columns)
+
+    def _compile(self, conn, path: Path, st: os.stat_result) -> XMLTable:
+        """
+        Parseia o XML (antes da trava de escrita do SQLite) e grava tabela + registro em `files` numa
+        única transação. Outro processo (pool do rag_loader, dois backends
+        subindo juntos) pode ter compilado a mesma versão enquanto este
+        parseava: o sha256 é conferido de novo já com a trava de escrita.
+        """
+        sha256 = _file_hash(path)
+        table = iterparse_table(path)
+        table_name = f"xml_{path.stem}"
+        columns = list(table.columns)
+        with _immediate(conn):
+            row = conn.execute("SELECT sha256 FROM files WHERE name = ?", (path.name,)).fetchone()
+            if row is not None and row[0] == sha256:
+                conn.execute(
+                    "UPDATE files SET size = ?, mtime_ns = ? WHERE name = ?",
+                    (st.st_size, st.st_mtime_ns, path.name),
+                )
+                return table
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(table_name)}")
+            conn.execute(f"CREATE TABLE {_quote(table_name)} ({', '.join(_quote(c) + ' TEXT' for c in columns) or 'empty TEXT'})")
+            if columns:
+                conn.executemany(
+                    f"INSERT INTO {_quote(table_name)} ({', '.join(map(_quote, columns))}) "
+                    f"VALUES ({', '.join('?' * len(columns))})",
+                    zip(*(table.columns[c] for c in columns)),
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO files (name, size, mtime_ns, sha256, table_name, columns, records, compiled_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path.name, st.st_size, st.st_mtime_ns, sha256, table_name, json.dumps(columns), table.size, time.time()),
+            )
+        self.compiled += 1
+        return table
+
+    def _load(self, conn, table_name: str, columns: list) -> XMLTable:
+        table = XMLTable()
+        if not columns:
+            return table
+        rows = conn.execute(f"SELECT {', '.join(map(_quote, columns))} FROM {_quote(table_name)} ORDER BY rowid").fetchall()
+        values = list(zip(*rows)) if rows else [() for _ in columns]
+        for column, column_values in zip(columns, values):
+            table.columns[column] = [
+                sys.intern(v) if v is not None and len(v) <= _INTERN_MAX_LEN else v
+                for v in column_values
+            ]
+        table.size = len(rows)
+        self.loaded += 1
+        return table
+
+    # ------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------
+
+    def table(self, path: Path) -> tuple[Optional[XMLTable], str]:
+        """
+        Tabela do XML em `path` e a origem ("cache" ou "xml" quando precisou
+        compilar). (None, "missing") se o arquivo não existe.
+        """
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None, "missing"
+        with self._lock:
+            conn = self._connection()
+            entry = self._fresh_entry(conn, path, st)
+            if entry is not None:
+                return self._load(conn, *entry), "cache"
+            return self._compile(conn, path, st), "xml"
+
+    def compile_all(self, rag_path: Path = RAG_DIR) -> dict:
+        """Garante todas as tabelas em dia e remove as de XMLs que sumiram. Retorna {arquivo: origem}."""
+        result = {}
+        present = set()
+        for path in sorted(rag_path.glob("*.xml")):
+            present.add(path.name)
+            with self._lock:
+                conn = self._connection()
+                st = path.stat()
+                if self._fresh_entry(conn, path, st) is None:
+                    self._compile(conn, path, st)
+                    result[path.name] = "xml"
+                else:
+                    result[path.name] = "cache"
+        with self._lock:
+            conn = self._connection()
+            stale = [
+                (name, table_name) for name, table_name in conn.execute("SELECT name, table_name FROM files")
+                if name not in present
+            ]
+            with _immediate(conn):
+                for name, table_name in stale:
+                    conn.execute(f"DROP TABLE IF EXISTS {_quote(table_name)}")
+                    conn.execute("DELETE FROM files WHERE name = ?", (name,))
+        return result
+
+    def monster_names(self, rag_path: Path = RAG_DIR) -> list[str]:
+        """Nomes de monstros (pt/en) de monster_text.xml."""
+        table, _ = self.table(rag_path / "monster_text.xml")
+        if table is None or "name" not in table.columns or "lang_id" not in table.columns:
+            return []
+        return list({
+            name for lang, name in zip(table.columns["lang_id"], table.columns["name"])
+            if lang in ("pt", "en") and name
+        })
+
+    def metrics(self) -> dict:
+        with self._lock:
+            files, records = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(records), 0) FROM files").fetchone()
+        return {"tables": files, "records": records, "loaded": self.loaded, "compiled": self.compiled}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache: Optional[GameDataCache] = None
+_init_lock = threading.Lock()
+
+
+def get_game_data_cache() -> GameDataCache:
+    global _cache
+    if _cache is None:
+        with _init_lock:
+            if _cache is None:
+                _cache = GameDataCache(GAME_DATA_CACHE_PATH)
+    return _cache
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    sources = get_game_data_cache().compile_all()
+    compiled = sum(1 for s in sources.values() if s == "xml")
+    print(f"{len(sources)} XMLs ({compiled} compilados, {len(sources) - compiled} já em dia) "
+          f"em {time.perf_counter() - started:.1f}s -> {GAME_DATA_CACHE_PATH}")
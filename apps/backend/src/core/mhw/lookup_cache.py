@@ -0,0 +1,113 @@
+"""
+lookup_cache.py — Cache LRU/TTL para lookups de nome no mhw.db.
+
+O mhw.db é somente-leitura em runtime, então o resultado de
+get_armor_details("Rimeguard Helm γ+") só muda se o arquivo mudar.
+`cached_lookup(name)` memoiza a função por nome normalizado, inclusive
+os "não encontrado" (cache negativo), e descarta tudo quando o
+fingerprint do mhw.db muda.
+"""
+
+import copy
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from core.config import LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL
+from data.pool import mhw_db_fingerprint
+
+
+class LookupCache:
+    """LRU limitado a `max_size` entradas, cada uma válida por `ttl` segundos."""
+
+    def __init__(self, name: str, max_size: int, ttl: float):
+        self.name = name
+        self._max_size = max(1, max_size)
+        self._ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint: Optional[str] = None
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _check_db(self):
+        fingerprint = mhw_db_fingerprint()
+        if fingerprint != self._fingerprint:
+            if self._fingerprint is not None:
+                self._invalidations += 1
+            self._data.clear()
+            self._fingerprint = fingerprint
+
+    def get_or_compute(self, key: str, compute: Callable[[], object]):
+        with self._lock:
+            self._check_db()
+            entry = self._data.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self._ttl:
+                self._data.move_to_end(key)
+                self._hits += 1
+                if entry[1] is None:
+                    self._negative_hits += 1
+                return copy.deepcopy(entry[1])
+            self._misses += 1
+
+        # Fora do lock: lookups concorrentes de nomes diferentes não se bloqueiam
+        value = compute()
+
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._max_size:
+                self._data.popitem(last=False)
+                self._evictions += 1
+        return copy.deepcopy(value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": len(self._data),
+                "max_size": self._max_size,
+                "ttl_s": self._ttl,
+                "hits": self._hits,
+                "negative_hits": self._negative_hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 3) if total else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+_caches: dict[str, LookupCache] = {}
+
+
+def _normalize_key(name) -> str:
+    # Mesma normalização que os lookups aplicam antes de consultar o banco
+    return str(name).lower().strip()
+
+
+def cached_lookup(cache_name: str):
+    """Decorator para funções `fn(name) -> dict | None` sobre o mhw.db."""
+    cache = LookupCache(cache_name, LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL)
+    _caches[cache_name] = cache
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(name):
+            return cache.get_or_compute(_normalize_key(name), lambda: fn(name))
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def lookup_cache_metrics() -> dict:
+    return {name: cache.metrics() for name, cache in _caches.items()}
@@ -7,14 +7,13 @@ from bs4 import BeautifulSoup  # type: ignore
 
 
 from core.config import MHW_DB_PATH
+from data.pool import get_mhw_pool
+from core.mhw.name_index import resolve_name
 DB_PATH = MHW_DB_PATH
 
 def get_db_connection():
-    if not os.path.exists(DB_PATH):
-        raise FileNotFoundError(f"Database not found at {DB_PATH}. Please ensure mhw.db is downloaded.")
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Conexão somente-leitura emprestada do pool do mhw.db; close() devolve ao pool."""
+    return get_mhw_pool().lease()
 
 def normalize_search_term(term):
     if not term: return ""
@@ -51,20 +50,25 @@ def get_monster_data(monster_name):
     conn = get_db_connection()
     try:
         # Se for Kulve, garantir busca pelo nome exato ou termo chave
-        search = f"%{monster_name}%"
+        search = monster_name
         if "taroth" in monster_name.lower() or "kulve" in monster_name.lower():
-            search = "%Kulve Taroth%"
+            search = "Kulve Taroth"
+
+        # Candidatos ranqueados pelo índice de nomes (exato > palavra inteira > parcial, pt antes de en)
+        matches = resolve_name('monster', search, limit=20, conn=conn)
+        if not matches: return None
 
         query_monster = """
-            SELECT m.id, m.size, t.name, t.ecology, t.description 
+            SELECT m.id, m.size, t.ecology, t.description 
             FROM monster m
-            JOIN monster_text t ON m.id = t.id
-            WHERE t.name LIKE ? AND (t.lang_id = 'pt' OR t.lang_id = 'en')
-            ORDER BY CASE WHEN t.lang_id = 'pt' THEN 0 ELSE 1 END
+            JOIN monster_text t ON m.id = t.id AND t.lang_id = ?
+            WHERE m.id = ?
         """
-        cursor = conn.execute(query_monster, (search,))
-        monsters = cursor.fetchall()
-        if not monsters: return None
+        monsters = []
+        for match in matches:
+            row = conn.execute(query_monster, (match['lang'], match['id'])).fetchone()
+            if row:
+                monsters.append({"id": row['id'], "name": match['name'], "ecology": row['ecology'], "description": row['description']})
             
         all_monster_info = []
         for monster in monsters:
@@ -230,18 +234,19 @@ def get_skill_info(skill_name):
     conn = get_db_connection()
     try:
         search_term = normalize_search_term(skill_name)
+        matches = resolve_name('skill', search_term, limit=1, conn=conn)
+        if not matches: return None
         query = """
-            SELECT s.level, s.description, st.name
-            FROM skill s JOIN skilltree_text st ON s.skilltree_id = st.id
-            WHERE st.name LIKE ? AND st.lang_id IN ('pt', 'en')
-            ORDER BY st.lang_id DESC, s.level
+            SELECT s.level, s.description
+            FROM skill s
+            WHERE s.skilltree_id = ? AND s.lang_id = ?
+            ORDER BY s.level
         """
-        skills = conn.execute(query, (f"%{search_term}%",)).fetchall()
+        skills = conn.execute(query, (matches[0]['id'], matches[0]['lang'])).fetchall()
         if not skills: return None
-        res = {"name": skills[0]['name'], "levels": []}
+        res = {"name": matches[0]['name'], "levels": []}
         for s in skills:
-            if s['name'] == res['name']:
-                res['levels'].append({"level": s['level'], "description": s['description']})
+            res['levels'].append({"level": s['level'], "description": s['description']})
         return res
     except Exception: return None
     finally: conn.close()
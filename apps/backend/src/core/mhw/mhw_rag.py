@@ -18,7 +18,11 @@ from dotenv import load_dotenv  # type: ignore
 
 # Localizar .env na raiz do projeto
 import sys
-from core.config import DATA_DIR, RAG_DIR, STORAGE_DIR, NVIDIA_API_KEY, LLM_MODEL, LLM_BASE_URL, LLM_TIMEOUT, ROOT_DIR
+from core.config import (
+    DATA_DIR, RAG_DIR, STORAGE_DIR, NVIDIA_API_KEY, LLM_MODEL, LLM_BASE_URL, LLM_TIMEOUT, ROOT_DIR,
+    RAG_DENSE_QUERIES, RAG_SPARSE_TOP_K, RAG_FUSION_TOP_K,
+)
+from core.mhw.entity_matcher import find_entities
 
 load_dotenv(ROOT_DIR / ".env")
 
@@ -28,6 +32,8 @@ STORAGE_PATH = STORAGE_DIR
 
 # Instância global do motor
 _query_engine = None
+_sparse_index = None  # BM25 sobre os mesmos nodes (sparse_index.BM25Index)
+_sparse_masks: dict = {}  # filter_key -> máscara do BM25 para a partição
 _nvidia_initialized = False
 
 
@@ -45,14 +51,44 @@ def _ensure_nvidia_settings():
 
 
 
+def _replace_groups(index, store, docs_by_group: dict, replace_all: bool = False) -> tuple[int, int]:
+    """
+    Troca no índice os documentos dos grupos recarregados (ou todos, com
+    `replace_all`). Nodes cujo content_hash já está no store reaproveitam o
+    embedding; só o resto vai à API. Retorna (reaproveitados, recalculados).
+    """
+    from llama_index.core import Settings  # type: ignore
+    from llama_index.core.ingestion import run_transformations  # type: ignore
+    from core.mhw.rag_loader import document_group  # type: ignore
+    from core.mhw.vector_store import content_hash
+
+    old_refs = [ref for ref in store.ref_doc_ids() if replace_all or document_group(ref) in docs_by_group]
+    previous = store.embeddings_by_hash(old_refs)
+    store.delete_ref_docs(old_refs)
+
+    documents = [doc for docs in docs_by_group.values() for doc in docs]
+    nodes = run_transformations(documents, Settings.transformations)
+    reused = 0
+    for node in nodes:
+        embedding = previous.get(content_hash(node))
+        if embedding is not None:
+            node.embedding = embedding
+            reused += 1
+    index.insert_nodes(nodes)
+    return reused, len(nodes) - reused
+
+
 def setup_rag_engine(progress_callback=None):
     """
     Inicializa o motor de RAG com detecção inteligente de mudanças.
     
     Fluxo:
     1. Se storage existe E nenhum XML mudou → carrega do cache (rápido)
-    2. Se storage não existe OU XMLs mudaram → rebuild completo
-    3. Após rebuild, salva manifesto para próxima comparação
+    2. Se XMLs mudaram e há mapa grupo -> XMLs → recarrega só os grupos afetados
+    3. Se storage não existe (ou sem mapa de dependências) → rebuild completo
+    Nos dois casos, nodes com texto idêntico ao do build anterior
+    reaproveitam o embedding (content_hash); só o resto vai à API.
+    4. Após rebuild, salva manifesto para próxima comparação
     """
     global _query_engine
     if _query_engine is not None:
@@ -60,7 +96,8 @@ def setup_rag_engine(progress_callback=None):
 
     # Lazy init: imports e NVIDIA SDK só quando realmente necessário
     _ensure_nvidia_settings()
-    from llama_index.core import VectorStoreIndex, StorageContext, load_index_from_storage  # type: ignore
+    from llama_index.core import VectorStoreIndex, StorageContext  # type: ignore
+    from core.mhw.vector_store import NumpyVectorStore
 
 
     import threading
@@ -114,9 +151,17 @@ def setup_rag_engine(progress_callback=None):
         report("Erro: Pasta 'rag' não encontrada!", 100)
         return None
 
-    # === DECISÃO INTELIGENTE: Carregar ou Reconstruir? ===
+    from core.mhw.rag_loader import LOADER_GROUPS, load_document_groups  # type: ignore
+
+    # === DECISÃO INTELIGENTE: Carregar, Atualizar ou Reconstruir? ===
     should_rebuild = rag_pipeline.needs_rebuild()
 
+    # Com o store NumPy e o mapa grupo -> XMLs do último build, só os grupos
+    # que leem algum XML alterado são recarregados
+    affected = None
+    if should_rebuild and NumpyVectorStore.exists(STORAGE_PATH):
+        affected = rag_pipeline.affected_groups(rag_pipeline.detect_changes(), LOADER_GROUPS)
+
     if not should_rebuild:
         # FAST PATH: XMLs não mudaram, carregar do cache
         total_mb = sum(
@@ -125,8 +170,14 @@ def setup_rag_engine(progress_callback=None):
         report(f"📂 Carregando base de dados ({total_mb:.0f} MB)...", 85)
 
         def load_storage():
-            ctx = StorageContext.from_defaults(persist_dir=str(STORAGE_PATH))
-            return load_index_from_storage(ctx)
+            if not NumpyVectorStore.exists(STORAGE_PATH):
+                # Storage no formato JSON antigo: converte sem recalcular embeddings
+                store = NumpyVectorStore.from_legacy_storage(STORAGE_PATH)
+                store.persist(str(STORAGE_PATH))
+                NumpyVectorStore.remove_legacy_storage(STORAGE_PATH)
+                report(f"🔁 Storage convertido para NumPy ({store.count()} vetores)", 95)
+            store = NumpyVectorStore.from_persist_dir(STORAGE_PATH)
+            return VectorStoreIndex.from_vector_store(store)
 
         index = run_with_heartbeat(
             load_storage,
@@ -137,48 +188,73 @@ def setup_rag_engine(progress_callback=None):
 
         report("✅ Base de dados carregada! (nenhum XML modificado)", 97)
     else:
-        # REBUILD: XMLs mudaram ou primeira execução
-        report("🔨 Construindo base de conhecimento (XMLs alterados detectados)...", 80)
-
-        # Limpar storage antigo se existir
-        if STORAGE_PATH.exists():
-            import shutil
-            shutil.rmtree(STORAGE_PATH, ignore_errors=True)
-            report("🗑️ Storage antigo removido (XMLs alterados)", 81)
-
-        # Usar o loader inteligente que parseia XMLs em documentos estruturados
-        from core.mhw.rag_loader import load_all_documents  # type: ignore
-
-        report("📋 Parseando dados do jogo...", 82)
-        documents = load_all_documents(progress_callback=progress_callback)
-
-        report(f"📊 Gerando índice ({len(documents)} documentos estruturados)...", 90)
-
-        def build_index():
-            return VectorStoreIndex.from_documents(documents, show_progress=True)
+        # REBUILD: só os grupos afetados pelos XMLs alterados ou, sem mapa de
+        # dependências (primeira execução / storage antigo), todos
+        full = affected is None
+        groups = set(LOADER_GROUPS) if full else affected
+        if full:
+            report("🔨 Construindo base de conhecimento (XMLs alterados detectados)...", 80)
+        else:
+            report(f"🧩 Atualização incremental (grupos afetados: {', '.join(sorted(groups)) or 'nenhum'})...", 80)
+
+        def rebuild_index():
+            # O store anterior, se houver, é a fonte dos embeddings reaproveitados
+            if NumpyVectorStore.exists(STORAGE_PATH):
+                store = NumpyVectorStore.from_persist_dir(STORAGE_PATH)
+            elif NumpyVectorStore.has_legacy_storage(STORAGE_PATH):
+                store = NumpyVectorStore.from_legacy_storage(STORAGE_PATH)
+            else:
+                store = NumpyVectorStore()
+            index = VectorStoreIndex.from_vector_store(store)
+            if not groups:
+                return index
+
+            report("📋 Parseando dados do jogo...", 82)
+            docs_by_group, sources = load_document_groups(groups, progress_callback=progress_callback)
+            total = sum(len(docs) for docs in docs_by_group.values())
+            report(f"📊 Gerando índice ({total} documentos estruturados)...", 90)
+            reused, embedded = _replace_groups(index, store, docs_by_group, replace_all=full)
+            report(f"♻️ Embeddings: {reused} reaproveitados, {embedded} recalculados", 96)
+
+            report("💾 Salvando base de dados para uso futuro...", 97)
+            store.persist(str(STORAGE_PATH))
+            NumpyVectorStore.remove_legacy_storage(STORAGE_PATH)
+            rag_pipeline.save_sources(sources, replace=full)
+            return index
 
         index = run_with_heartbeat(
-            build_index,
-            "Gerando embeddings",
-            90, 96,
+            rebuild_index,
+            "Gerando embeddings" if full else "Atualizando índice",
+            82, 96,
             interval=3.0
         )
 
-        report("💾 Salvando base de dados para uso futuro...", 97)
-        STORAGE_PATH.mkdir(exist_ok=True)
-        if index is not None:
-            index.storage_context.persist(persist_dir=str(STORAGE_PATH))
-
         # Salvar manifesto com hashes dos XMLs atuais
         rag_pipeline.save_manifest()
         report("✅ Base de dados pronta! Manifesto salvo.", 98)
 
     report("⚔️ Preparando assistente...", 99)
     if index is not None:
+        _load_sparse_index(index.vector_store, report)
         _query_engine = index.as_query_engine(similarity_top_k=30)
     return _query_engine
 
 
+def _load_sparse_index(store, report):
+    """Carrega (ou remonta, se o store mudou) o índice BM25. Sem ele, a busca fica só vetorial."""
+    global _sparse_index
+    from core.mhw import sparse_index
+
+    _sparse_masks.clear()
+    try:
+        _sparse_index = sparse_index.load_or_build(store, STORAGE_PATH)
+        stats = _sparse_index.stats()
+        report(f"🔤 Índice BM25 pronto ({stats['nodes']} nodes, {stats['terms']} termos)", 99)
+    except Exception as e:
+        _sparse_index = None
+        print(f"  ⚠️ Índice BM25 indisponível ({e}); busca só vetorial")
+
+
 # ============================================================
 # MULTI-QUERY EXPANSION — Melhora o recall
 # ============================================================
@@ -228,6 +304,120 @@ MONSTER_ABBREVIATIONS = {
 }
 
 
+# Templates das queries expandidas. Ficam em constantes para o
+# _expand_queries e o pré-aquecimento do cache de embeddings
+# (expansion_templates) usarem exatamente os mesmos textos.
+_MONSTER_ARMOR_QUERIES = (
+    "CONJUNTO DE ARMADURA: {name}",
+    "CONJUNTO DE ARMADURA: {abbrev}",
+    "ARMADURA: {name}",
+    "ARMADURA: {abbrev}",
+    "SET: {name}",
+)
+_MONSTER_WEAPON_QUERIES = ("ARMA: {name}", "ARMA: {abbrev}")
+_MONSTER_CRAFT_QUERIES = ("Materiais {name}", "Materiais {abbrev}")
+_MONSTER_WEAKNESS_QUERY = "MONSTRO: {name} fraquezas elementais"
+_MONSTER_BASE_QUERY = "MONSTRO: {name}"
+_MONSTER_GREEK_QUERIES = ("CONJUNTO DE ARMADURA: {name} {greek}", "{name} {greek}")
+
+_ELEMENT_QUERIES = {
+    ("gelo", "ice"): [
+        "CONJUNTO DE ARMADURA: Barioth",
+        "CONJUNTO DE ARMADURA: Beotodus",
+        "CONJUNTO DE ARMADURA: Legiana",
+        "CONJUNTO DE ARMADURA: Velkhana",
+        "Armas de Gelo recomendadas: Legiana, Velkhana, Barioth, Beotodus",
+    ],
+    ("fogo", "fire"): [
+        "CONJUNTO DE ARMADURA: Rathalos",
+        "CONJUNTO DE ARMADURA: Anjanath",
+        "CONJUNTO DE ARMADURA: Teostra",
+    ],
+    ("trovão", "thunder", "raio"): [
+        "CONJUNTO DE ARMADURA: Zinogre",
+        "CONJUNTO DE ARMADURA: Tobi-Kadachi",
+        "CONJUNTO DE ARMADURA: Fulgur Anja",
+    ],
+}
+
+_MR_QUERIES = [
+    "CONJUNTO DE ARMADURA: Master Rank (MR)",
+    "CONJUNTO DE ARMADURA: RM",
+    "Master Rank (MR)",
+]
+
+_SKILL_LOOKUP_QUERY = "SKILL REVERSE LOOKUP: {skill}"
+
+# Mapeamento de termos comuns para skills (heurística de sinônimos)
+_SKILL_TERMS = {
+    "ataque": "Reforço de Ataque",
+    "vida": "Reforço de Vida",
+    "afiação": "Mestre Afiador",
+    "critico": "Olho Crítico",
+    "crítico": "Olho Crítico",
+    "exploração de fraqueza": "Exploração de Fraqueza",
+    "fraqueza": "Exploração de Fraqueza",
+    "vulnerabilidade": "Exploração de Fraqueza",
+    "agitador": "Agitador",
+    "indignação": "Indignação",
+    "foco": "Foco",
+}
+
+# Keywords de sets comuns (não vinculados a monstros)
+_COMMON_SETS = {
+    "óssea": ["Óssea", "Bone"],
+    "bone": ["Bone", "Óssea"],
+    "osso": ["Osso", "Bone"],
+    "liga": ["Liga Leve", "Alloy"],
+    "alloy": ["Alloy", "Liga Leve"],
+    "couro": ["Couro", "Leather"],
+    "leather": ["Leather", "Couro"],
+    "metal": ["Metal", "Alloy", "Liga Leve"],
+}
+_SET_QUERY = "CONJUNTO DE ARMADURA: {set}"
+_MR_SET_SUFFIXES = ("α+", "β+")
+
+# Conversões de símbolos gregos
+_GREEK_TERMS = {
+    "a+": "α+", "alpha+": "α+", "alpha +": "α+", "alfa+": "α+",
+    "b+": "β+", "beta+": "β+", "beta +": "β+",
+    "g+": "γ+", "gamma+": "γ+", "gamma +": "γ+",
+}
+
+
+# Termos que misturam assuntos: com eles a busca não é restrita a uma partição
+_MIXED_INTENT_TERMS = ("armadura", "armor", "set", "build", "joia", "amuleto", "charm")
+
+
+def _is_skill_lookup(lower: str) -> bool:
+    """Pergunta do tipo "quais peças têm a skill X" (busca reversa de skill)."""
+    is_skill_search = "tem" in lower or "quais" in lower or "onde" in lower or "peça" in lower or "peças" in lower or "quais armaduras" in lower
+    return is_skill_search and ("skill" in lower or "habilidade" in lower or "pericia" in lower or "ponto" in lower or "ataque" in lower or "vida" in lower)
+
+
+def _weapon_type_slug(weapon_type: str) -> str:
+    """"Sword & Shield" -> "sword-and-shield" (formato do weapon_type nos XMLs)."""
+    return weapon_type.lower().replace(" & ", "-and-").replace(" ", "-")
+
+
+def _detect_partition(prompt: str) -> Optional[dict]:
+    """
+    Filtro de metadata (rag_loader) quando a intenção do prompt é clara:
+      - busca reversa de uma skill conhecida -> {"source": "skill_lookup"}
+      - arma de um tipo só, sem misturar armadura/build -> {"source": "weapon", "weapon_type": ...}
+    None = busca no corpus inteiro.
+    """
+    lower = prompt.lower()
+    weapon_types = {m.value for m in find_entities(prompt, kinds=("weapon_type",))}
+    if _is_skill_lookup(lower) and not weapon_types:
+        if any(term in lower for term in _SKILL_TERMS) or find_entities(prompt, kinds=("skill", "skill_name")):
+            return {"source": "skill_lookup"}
+        return None
+    if len(weapon_types) == 1 and not any(term in lower for term in _MIXED_INTENT_TERMS):
+        return {"source": "weapon", "weapon_type": _weapon_type_slug(weapon_types.pop())}
+    return None
+
+
 def _expand_queries(prompt: str, history_text: str = "") -> list[str]:
     """
     Expande o prompt do usuário em múltiplas sub-queries para melhorar o recall.
@@ -236,45 +426,35 @@ def _expand_queries(prompt: str, history_text: str = "") -> list[str]:
     """
     queries = [prompt]
     lower = prompt.lower()
-    full_search_text = (lower + " " + history_text.lower()).strip()
-
-    # Detectar nomes de monstros — processa os mais longos primeiro (evita match parcial)
-    for monster_name, abbrev in sorted(
-        MONSTER_ABBREVIATIONS.items(), key=lambda x: len(x[0]), reverse=True
-    ):
-        if monster_name in full_search_text:
-            # Se o monstro está no prompt atual, damos prioridade. 
-            # Se está só no histórico, só usamos se o prompt atual for "vago" (não tem monstro)
-            if monster_name not in lower and any(m in lower for m in MONSTER_ABBREVIATIONS.keys()):
-                continue
-
-            is_armor = "armadura" in lower or "armor" in lower or "set" in lower or "peça" in lower
-            is_weapon = (
-                "arma " in lower or "weapon" in lower or "espada" in lower
-                or lower.startswith("arma") or "sword" in lower or "hammer" in lower
-            )
-            is_craft = (
-                "craft" in lower or "material" in lower or "preciso" in lower
-                or "fazer" in lower or "criar" in lower or "montar" in lower
-            )
-
-            if is_armor:
-                queries.append(f"CONJUNTO DE ARMADURA: {monster_name}")
-                queries.append(f"CONJUNTO DE ARMADURA: {abbrev}")
-                queries.append(f"ARMADURA: {monster_name}")
-                queries.append(f"ARMADURA: {abbrev}")
-                queries.append(f"SET: {monster_name}")
-            if is_weapon and not is_armor:
-                queries.append(f"ARMA: {monster_name}")
-                queries.append(f"ARMA: {abbrev}")
-            if is_craft or is_armor:
-                queries.append(f"Materiais {monster_name}")
-                queries.append(f"Materiais {abbrev}")
-            if "fraqueza" in lower or "weakness" in lower:
-                queries.append(f"MONSTRO: {monster_name} fraquezas elementais")
-            # Sempre buscar o monstro base
-            queries.append(f"MONSTRO: {monster_name}")
-            break
+
+    # Detectar nomes de monstros numa passada só (matcher Aho–Corasick compartilhado).
+    # Se o prompt atual cita monstro, ele tem prioridade; senão usa o histórico (prompt vago).
+    prompt_monsters = find_entities(prompt, kinds=("monster",))
+    candidates = prompt_monsters or find_entities(history_text, kinds=("monster",))
+    if candidates:
+        # O mais longo primeiro (evita match parcial, ex: "zinogre" dentro de "stygian zinogre")
+        best = max(candidates, key=lambda m: (len(m.key), -m.start))
+        monster_name, abbrev = best.key, best.value
+        is_armor = "armadura" in lower or "armor" in lower or "set" in lower or "peça" in lower
+        is_weapon = (
+            "arma " in lower or "weapon" in lower or "espada" in lower
+            or lower.startswith("arma") or "sword" in lower or "hammer" in lower
+        )
+        is_craft = (
+            "craft" in lower or "material" in lower or "preciso" in lower
+            or "fazer" in lower or "criar" in lower or "montar" in lower
+        )
+
+        if is_armor:
+            queries += [t.format(name=monster_name, abbrev=abbrev) for t in _MONSTER_ARMOR_QUERIES]
+        if is_weapon and not is_armor:
+            queries += [t.format(name=monster_name, abbrev=abbrev) for t in _MONSTER_WEAPON_QUERIES]
+        if is_craft or is_armor:
+            queries += [t.format(name=monster_name, abbrev=abbrev) for t in _MONSTER_CRAFT_QUERIES]
+        if "fraqueza" in lower or "weakness" in lower:
+            queries.append(_MONSTER_WEAKNESS_QUERY.format(name=monster_name))
+        # Sempre buscar o monstro base
+        queries.append(_MONSTER_BASE_QUERY.format(name=monster_name))
 
     # Conversões de símbolos gregos (agora preservando o contexto do set)
     alpha_beta = {
@@ -288,122 +468,230 @@ def _expand_queries(prompt: str, history_text: str = "") -> list[str]:
             queries.append(fixed_term)
             if "armadura" in lower or "set" in lower:
                 # Se falou em set e alpha/beta, tenta buscar o conjunto com o símbolo correto
-                for monster_name in MONSTER_ABBREVIATIONS.keys():
-                    if monster_name in lower:
-                        queries.append(f"CONJUNTO DE ARMADURA: {monster_name} {replacement}")
+                for monster_name in dict.fromkeys(m.key for m in prompt_monsters):
+                    queries.append(_MONSTER_GREEK_QUERIES[0].format(name=monster_name, greek=replacement))
 
     # Detecção de Elemento para Builds
-    if "gelo" in lower or "ice" in lower:
-        queries.append("CONJUNTO DE ARMADURA: Barioth")
-        queries.append("CONJUNTO DE ARMADURA: Beotodus")
-        queries.append("CONJUNTO DE ARMADURA: Legiana")
-        queries.append("CONJUNTO DE ARMADURA: Velkhana")
-        queries.append("Armas de Gelo recomendadas: Legiana, Velkhana, Barioth, Beotodus")
-    if "fogo" in lower or "fire" in lower:
-        queries.append("CONJUNTO DE ARMADURA: Rathalos")
-        queries.append("CONJUNTO DE ARMADURA: Anjanath")
-        queries.append("CONJUNTO DE ARMADURA: Teostra")
-    if "trovão" in lower or "thunder" in lower or "raio" in lower:
-        queries.append("CONJUNTO DE ARMADURA: Zinogre")
-        queries.append("CONJUNTO DE ARMADURA: Tobi-Kadachi")
-        queries.append("CONJUNTO DE ARMADURA: Fulgur Anja")
+    for keywords, element_queries in _ELEMENT_QUERIES.items():
+        if any(k in lower for k in keywords):
+            queries += element_queries
 
     # Detecção de Rank/Raridade nas queries
     is_mr = "mr " in lower or " rm" in lower or "rank m" in lower or lower.endswith(" mr") or lower.endswith(" rm") or "master rank" in lower
     if is_mr:
-        queries.append("CONJUNTO DE ARMADURA: Master Rank (MR)")
-        queries.append("CONJUNTO DE ARMADURA: RM")
-        queries.append("Master Rank (MR)")
-    
+        queries += _MR_QUERIES
+
     # Detecção de Skill Lookup Intent (Busca Reversa)
-    is_skill_search = "tem" in lower or "quais" in lower or "onde" in lower or "peça" in lower or "peças" in lower or "quais armaduras" in lower
-    if is_skill_search and ("skill" in lower or "habilidade" in lower or "pericia" in lower or "ponto" in lower or "ataque" in lower or "vida" in lower):
-        # Mapeamento de termos comuns para skills (heurística de sinônimos)
-        skill_terms = {
-            "ataque": "Reforço de Ataque",
-            "vida": "Reforço de Vida",
-            "afiação": "Mestre Afiador",
-            "critico": "Olho Crítico",
-            "crítico": "Olho Crítico",
-            "exploração de fraqueza": "Exploração de Fraqueza",
-            "fraqueza": "Exploração de Fraqueza",
-            "vulnerabilidade": "Exploração de Fraqueza",
-            "agitador": "Agitador",
-            "indignação": "Indignação",
-            "foco": "Foco",
-        }
-        
+    if _is_skill_lookup(lower):
         extracted_skill = ""
-        for term, official in skill_terms.items():
+        for term, official in _SKILL_TERMS.items():
             if term in lower:
                 extracted_skill = official
                 break
-        
+
         if extracted_skill:
-            queries.append(f"SKILL REVERSE LOOKUP: {extracted_skill}")
+            queries.append(_SKILL_LOOKUP_QUERY.format(skill=extracted_skill))
         else:
             # Fallback: remove stop words e tenta buscar o termo central
             clean_prompt = prompt
             for word in ["quais", "armaduras", "de", "master", "rank", "rm", "mr", "dão", "tem", "a", "skill", "habilidade"]:
-                import re
                 clean_prompt = re.sub(rf'\b{word}\b', '', clean_prompt, flags=re.IGNORECASE).strip()
             if clean_prompt:
-                queries.append(f"SKILL REVERSE LOOKUP: {clean_prompt}")
+                queries.append(_SKILL_LOOKUP_QUERY.format(skill=clean_prompt))
             else:
-                queries.append(f"SKILL REVERSE LOOKUP: {prompt}")
+                queries.append(_SKILL_LOOKUP_QUERY.format(skill=prompt))
 
     # Keywords de sets comuns (não vinculados a monstros)
-    common_sets = {
-        "óssea": ["Óssea", "Bone"],
-        "bone": ["Bone", "Óssea"],
-        "osso": ["Osso", "Bone"],
-        "liga": ["Liga Leve", "Alloy"],
-        "alloy": ["Alloy", "Liga Leve"],
-        "couro": ["Couro", "Leather"],
-        "leather": ["Leather", "Couro"],
-        "metal": ["Metal", "Alloy", "Liga Leve"],
-    }
-    for kw, targets in common_sets.items():
+    for kw, targets in _COMMON_SETS.items():
         if kw in lower:
             for t in targets:
-                queries.append(f"CONJUNTO DE ARMADURA: {t}")
+                queries.append(_SET_QUERY.format(set=t))
                 if is_mr:
-                    queries.append(f"CONJUNTO DE ARMADURA: {t} α+")
-                    queries.append(f"CONJUNTO DE ARMADURA: {t} β+")
+                    queries += [_SET_QUERY.format(set=f"{t} {suffix}") for suffix in _MR_SET_SUFFIXES]
 
-    # Conversões de símbolos gregos (agora preservando o contexto do set)
-    alpha_beta = {
-        "a+": "α+", "alpha+": "α+", "alpha +": "α+", "alfa+": "α+",
-        "b+": "β+", "beta+": "β+", "beta +": "β+",
-        "g+": "γ+", "gamma+": "γ+", "gamma +": "γ+",
-    }
-    for term, replacement in alpha_beta.items():
+    # Conversões de símbolos gregos (preservando o contexto do set)
+    for term, replacement in _GREEK_TERMS.items():
         if term in lower:
             fixed_term = prompt.lower().replace(term, replacement)
             queries.append(fixed_term)
-            if "armadura" in lower or "set" in lower or any(m in lower for m in MONSTER_ABBREVIATIONS.keys()):
+            if "armadura" in lower or "set" in lower or prompt_monsters:
                 # Tenta buscar o conjunto com o símbolo correto para o monstro detectado
-                for monster_name in MONSTER_ABBREVIATIONS.keys():
-                    if monster_name in lower:
-                        queries.append(f"CONJUNTO DE ARMADURA: {monster_name} {replacement}")
-                        queries.append(f"{monster_name} {replacement}")
+                for monster_name in dict.fromkeys(m.key for m in prompt_monsters):
+                    queries += [t.format(name=monster_name, greek=replacement) for t in _MONSTER_GREEK_QUERIES]
 
     return list(dict.fromkeys(queries))  # Deduplica mantendo ordem
 
 
+def expansion_templates() -> list[str]:
+    """
+    Todas as queries fixas que _expand_queries pode gerar (tudo menos as
+    derivadas do texto livre do usuário). Usado para pré-aquecer o cache
+    de embeddings.
+    """
+    queries: list[str] = []
+    for name, abbrev in MONSTER_ABBREVIATIONS.items():
+        queries += [t.format(name=name, abbrev=abbrev) for t in _MONSTER_ARMOR_QUERIES]
+        queries += [t.format(name=name, abbrev=abbrev) for t in _MONSTER_WEAPON_QUERIES]
+        queries += [t.format(name=name, abbrev=abbrev) for t in _MONSTER_CRAFT_QUERIES]
+        queries.append(_MONSTER_WEAKNESS_QUERY.format(name=name))
+        queries.append(_MONSTER_BASE_QUERY.format(name=name))
+        for greek in set(_GREEK_TERMS.values()):
+            queries += [t.format(name=name, greek=greek) for t in _MONSTER_GREEK_QUERIES]
+    for element_queries in _ELEMENT_QUERIES.values():
+        queries += element_queries
+    queries += _MR_QUERIES
+    queries += [_SKILL_LOOKUP_QUERY.format(skill=s) for s in _SKILL_TERMS.values()]
+    for targets in _COMMON_SETS.values():
+        for t in targets:
+            queries.append(_SET_QUERY.format(set=t))
+            queries += [_SET_QUERY.format(set=f"{t} {suffix}") for suffix in _MR_SET_SUFFIXES]
+    return list(dict.fromkeys(queries))
+
+
+async def prewarm_query_embeddings() -> int:
+    """Garante no cache de embeddings todos os templates do expansor. Retorna quantos foram calculados."""
+    import asyncio
+    from core.mhw.query_embedder import prewarm
+
+    await asyncio.to_thread(_ensure_nvidia_settings)
+    return await prewarm(expansion_templates())
+
+
+async def _retrieve_each(retriever, queries: List[str]) -> List[Any]:
+    """Uma busca (e um embedding) por query, em paralelo. Caminho de fallback."""
+    import asyncio
+
+    async def retrieve_task(q):
+        try:
+            # Tentar versão assíncrona do retriever (LlamaIndex)
+            if hasattr(retriever, "aretrieve"):
+                return await retriever.aretrieve(q)
+            else:
+                return retriever.retrieve(q)
+        except Exception as e:
+            print(f"  ⚠️ Erro na query '{q[:50]}': {e}")
+            return []
+
+    return list(await asyncio.gather(*(retrieve_task(q) for q in queries)))
+
+
+def _search_many(retriever, embeddings: List[List[float]], top_k: int, filters: Optional[dict] = None) -> List[List[Any]]:
+    """
+    Top-k para várias queries de uma vez. Retorna, por query, os nodes com score.
+    NumpyVectorStore faz tudo num produto matriz × matriz (só contra a
+    partição de `filters`, se houver); outros stores caem para uma consulta
+    local por vetor (sem rede).
+    """
+    from llama_index.core.schema import NodeWithScore  # type: ignore
+    from llama_index.core.vector_stores.types import ExactMatchFilter, MetadataFilters, VectorStoreQuery  # type: ignore
+
+    vector_store = retriever._vector_store
+    if hasattr(vector_store, "query_many"):
+        results = vector_store.query_many(embeddings, top_k, filters=filters)
+    else:
+        metadata_filters = MetadataFilters(
+            filters=[ExactMatchFilter(key=k, value=v) for k, v in filters.items()]
+        ) if filters else None
+        results = [
+            vector_store.query(VectorStoreQuery(query_embedding=e, similarity_top_k=top_k, filters=metadata_filters))
+            for e in embeddings
+        ]
+
+    rows = []
+    for r in results:
+        nodes = r.nodes
+        if nodes is None:
+            # Store sem texto: nodes vêm do docstore (ids mapeados pelo index_struct)
+            nodes_dict = retriever._index.index_struct.nodes_dict
+            nodes = retriever._docstore.get_nodes([nodes_dict.get(i, i) for i in r.ids or []], raise_error=False)
+        rows.append([NodeWithScore(node=n, score=s) for n, s in zip(nodes, r.similarities or []) if n is not None])
+    return rows
+
+
+async def _retrieve_batched(retriever, queries: List[str], filters: Optional[dict] = None) -> List[Any]:
+    """
+    Todas as queries num único request de embedding + uma busca multi-vetor.
+    Retorna, por query, a lista de nodes (mesma forma de retriever.aretrieve).
+    """
+    import time
+    from core.mhw.query_embedder import embed_queries
+    from data.pool import run_blocking
+
+    embeddings = await embed_queries(queries)
+
+    # Produto matricial sobre os vetores (mmap) + leitura dos nodes no SQLite: fora do event loop
+    started = time.perf_counter()
+    results = await run_blocking(_search_many, retriever, embeddings, retriever.similarity_top_k, filters)
+    unique = len({n.node.node_id for row in results for n in row})
+    print(f"  🔎 {len(queries)} queries, {unique} nodes únicos, busca em {(time.perf_counter() - started) * 1000:.0f}ms")
+    return results
+
+
+def _sparse_mask(filters: dict, store):
+    """Máscara do BM25 para a partição de `filters` (cacheada até o próximo reload)."""
+    from core.mhw.vector_store import filter_key
+
+    key = filter_key(filters)
+    mask = _sparse_masks.get(key)
+    if mask is None:
+        mask = _sparse_masks[key] = _sparse_index.mask(store.partition(filters).node_ids)
+    return mask
+
+
+async def _retrieve_hybrid(retriever, queries: List[str], filters: Optional[dict] = None) -> List[Any]:
+    """
+    Busca híbrida: todas as queries expandidas vão ao BM25 (local, sem
+    embedding) e só as RAG_DENSE_QUERIES primeiras à busca vetorial. As
+    listas são fundidas com RRF; retorna os nodes na ordem fundida.
+    Com `filters`, os dois lados buscam só na partição.
+    """
+    from llama_index.core.schema import NodeWithScore  # type: ignore
+    from core.mhw.sparse_index import reciprocal_rank_fusion
+    from data.pool import run_blocking
+
+    sparse_index = _sparse_index
+    dense_queries = queries[:RAG_DENSE_QUERIES]
+    try:
+        dense = await _retrieve_batched(retriever, dense_queries, filters)
+    except Exception as e:
+        print(f"  ⚠️ Busca em lote falhou ({e}); usando uma busca por query")
+        dense = await _retrieve_each(retriever, dense_queries)
+    allowed = await run_blocking(_sparse_mask, filters, retriever._vector_store) if filters else None
+    sparse = await run_blocking(lambda: [sparse_index.search(q, RAG_SPARSE_TOP_K, allowed) for q in queries])
+
+    rankings = [[n.node.node_id for n in row] for row in dense]
+    rankings += [[node_id for node_id, _ in row] for row in sparse]
+    fused = reciprocal_rank_fusion(rankings)[:RAG_FUSION_TOP_K]
+
+    nodes = {n.node.node_id: n.node for row in dense for n in row}
+    missing = [node_id for node_id, _ in fused if node_id not in nodes]
+    if missing:
+        for node in await run_blocking(retriever._vector_store.get_nodes, missing):
+            nodes[node.node_id] = node
+    sparse_only = sum(1 for node_id in missing if node_id in nodes)
+    print(f"  🔀 RRF: {len(dense_queries)} queries densas + {len(queries)} BM25 -> {len(fused)} nodes ({sparse_only} só do BM25)")
+    return [NodeWithScore(node=nodes[node_id], score=score) for node_id, score in fused if node_id in nodes]
+
+
 async def get_rag_context(prompt: str, history: Optional[List[dict]] = None) -> str:
     """
     Recupera contexto relevante usando multi-query expansion de forma ASSÍNCRONA.
-    Faz múltiplas buscas paralelas no índice para maximizar o recall e performance.
+    Com o índice BM25 carregado, a busca é híbrida (_retrieve_hybrid: denso +
+    esparso fundidos com RRF); sem ele, todas as queries expandidas são
+    embedadas numa única chamada e buscadas de uma vez (_retrieve_batched).
+    Os nodes recuperados passam pelo context_assembler (ranking, remoção de
+    quase-duplicatas e orçamento de tokens) antes de virar texto.
     """
+    import asyncio
+    from data.pool import run_blocking
     global _query_engine
     if _query_engine is None:
-        _query_engine = setup_rag_engine()
+        # Carregar/montar o índice é bloqueante: fora do event loop
+        _query_engine = await asyncio.to_thread(setup_rag_engine)
 
     if not _query_engine:
         return ""
 
-    import asyncio
     retriever = _query_engine._retriever
 
     # Extrair texto do histórico para contexto (últimas 2 mensagens do usuário)
@@ -415,62 +703,49 @@ async def get_rag_context(prompt: str, history: Optional[List[dict]] = None) ->
     # Expandir prompt em múltiplas queries usando também o histórico
     queries = _expand_queries(prompt, history_text)
 
-    # Coletar todos os nodes únicos de todas as queries em paralelo
-    async def retrieve_task(q):
+    # Intenção clara (arma de um tipo, busca reversa de skill): busca só na partição
+    vector_store = retriever._vector_store
+    filters = _detect_partition(prompt)
+    if filters and hasattr(vector_store, "partition"):
+        # A primeira montagem da partição lê os metadados de todos os nodes
+        size = len(await run_blocking(vector_store.partition, filters))
+        print(f"  🎯 Partição {filters}: {size} nodes")
+        if not size:
+            filters = None
+
+    if _sparse_index is not None and hasattr(vector_store, "get_nodes"):
+        results = [await _retrieve_hybrid(retriever, queries, filters)]
+    else:
         try:
-            # Tentar versão assíncrona do retriever (LlamaIndex)
-            if hasattr(retriever, "aretrieve"):
-                return await retriever.aretrieve(q)
-            else:
-                return retriever.retrieve(q)
+            results = await _retrieve_batched(retriever, queries, filters)
         except Exception as e:
-            print(f"  ⚠️ Erro na query '{q[:50]}': {e}")
-            return []
+            print(f"  ⚠️ Busca em lote falhou ({e}); usando uma busca por query")
+            results = await _retrieve_each(retriever, queries)
 
-    # Disparar todas as buscas ao mesmo tempo
-    from typing import cast
-    tasks = [retrieve_task(q) for q in queries]
-    results = cast(List[Any], await asyncio.gather(*tasks))
+    # Pontuar, deduplicar e empacotar no orçamento de tokens
+    from core.mhw.context_assembler import assemble
 
-    # Deduplicar e juntar conteúdos
-    seen_keys: set = set()
-    all_contents: list = []
-
-    for nodes in results:
-        for node in nodes:
-            content = node.get_content()
-            # Deduplica por início do conteúdo (expandido para 400 chars para evitar falsos positivos em headers similares)
-            key = content[:400]
-            if key not in seen_keys:
-                seen_keys.add(key)
-                all_contents.append(content)
-
-    return "\n\n".join(all_contents)
+    entities = [m.key for m in find_entities(prompt) if len(m.key) >= 4]
+    context = await run_blocking(assemble, results, entities)
+    print(
+        f"  📦 Contexto: {context.selected}/{context.candidates} nodes, ~{context.tokens} tokens "
+        f"({context.duplicates} duplicados, {context.over_budget} fora do orçamento)"
+    )
+    return context.text
 
 
 def get_all_monster_names_from_xml() -> list[str]:
     """
-    Extrai todos os nomes de monstros do arquivo monster_text.xml (PT e EN).
+    Extrai todos os nomes de monstros de monster_text.xml (PT e EN), via
+    cache compilado (o XML só é parseado quando muda).
     """
-    import xml.etree.ElementTree as ET
-
-    monster_text_path = RAG_PATH / "monster_text.xml"
-    if not monster_text_path.exists():
-        return []
+    from core.mhw.game_data_cache import get_game_data_cache
 
-    names: set = set()
     try:
-        tree = ET.parse(monster_text_path)
-        root = tree.getroot()
-        for record in root.findall("DATA_RECORD"):
-            lang = record.find("lang_id")
-            name = record.find("name")
-            if lang is not None and lang.text in ["pt", "en"] and name is not None and name.text:
-                names.add(name.text)
+        return get_game_data_cache().monster_names(RAG_PATH)
     except Exception as e:
         print(f"Erro ao extrair nomes do XML: {e}")
-
-    return list(names)
+        return []
 
 
 def get_rag_response(prompt: str) -> str:
@@ -492,8 +767,10 @@ def reload_engine():
     Força reconstrução do índice (hot-reload).
     Chamado pelo rag_pipeline quando detecta mudanças.
     """
-    global _query_engine
+    global _query_engine, _sparse_index
     _query_engine = None
+    _sparse_index = None
+    _sparse_masks.clear()
     return setup_rag_engine()
 
 
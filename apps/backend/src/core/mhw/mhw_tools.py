@@ -1,7 +1,8 @@
-import sqlite3
 import json
 from typing import List, Optional, Any, Dict
-from core.config import MHW_DB_PATH
+from data.pool import get_mhw_pool
+from core.mhw.name_index import resolve_name
+from core.mhw.lookup_cache import cached_lookup
 
 # === Global Normalization Maps ===
 
@@ -209,7 +210,7 @@ def search_equipment(
     """
     Busca equipamentos (armaduras ou armas) no banco de dados verificado da Wiki.
     """
-    conn = sqlite3.connect(MHW_DB_PATH)
+    conn = get_mhw_pool().lease()
     cursor = conn.cursor()
 
     # Normalize Weapon Type
@@ -229,14 +230,11 @@ def search_equipment(
             if s_lower in SKILL_MAP:
                 normalized_skills.append(SKILL_MAP[s_lower])
             else:
-                # Fuzzy Match
-                best_match = None
-                max_len = 0
-                for k, v in SKILL_MAP.items():
-                    if k in s_lower and len(k) > max_len:
-                        best_match = v
-                        max_len = len(k)
-                if best_match:
+                # Fuzzy Match: apelido de skill mais longo contido no texto
+                from core.mhw.entity_matcher import find_entities
+                found = find_entities(s_lower, kinds=("skill",))
+                if found:
+                    best_match = max(found, key=lambda m: len(m.key)).value
                     normalized_skills.append(str(best_match))
                 else:
                     normalized_skills.append(str(s))
@@ -432,9 +430,10 @@ def search_equipment(
     return json.dumps(results, indent=2, ensure_ascii=False)
 
 
+@cached_lookup("armor_details")
 def get_armor_details(armor_name: str) -> Optional[dict]:
     """Busca detalhes técnicos de uma armadura de forma flexível (PT/EN/Variações)."""
-    conn = sqlite3.connect(MHW_DB_PATH)
+    conn = get_mhw_pool().lease()
     cursor = conn.cursor()
     
     # 1. Normalização do termo de busca
@@ -463,30 +462,14 @@ def get_armor_details(armor_name: str) -> Optional[dict]:
         if short.lower() in search_name and short.lower() != full:
             variants.append(search_name.replace(short.lower(), full))
             
-    # Tenta encontrar o ID no armor_text (PT ou EN)
-    placeholders = ",".join(["?"] * len(variants))
-    sql_find_id = f"""
-        SELECT id FROM armor_text 
-        WHERE (name IN ({placeholders}) OR name LIKE ?) 
-        AND lang_id IN ('pt', 'en')
-        LIMIT 1
-    """
-    params = variants + [f"%{search_name}%"]
-    cursor.execute(sql_find_id, params)
-    row_id = cursor.fetchone()
-    
-    found_id = row_id[0] if row_id else None
-    
-    # 2. Busca na armor_text para encontrar o ID e o nome em Inglês (ponte para Wiki)
-    cursor.execute("""
-        SELECT id FROM armor_text 
-        WHERE (name IN ({vars}) OR name LIKE ?) 
-        AND lang_id IN ('pt', 'en')
-        LIMIT 1
-    """.replace('{vars}', placeholders), variants + [f"%{search_name}%"])
-    row_found = cursor.fetchone()
-    
-    found_id = row_found[0] if row_found else None
+    # 2. Resolve o ID via índice de nomes (PT ou EN) e pega o nome em Inglês (ponte para Wiki)
+    found_id = None
+    for variant in variants:
+        matches = resolve_name('armor', variant, limit=1, conn=conn)
+        if matches:
+            found_id = matches[0]['id']
+            break
+
     en_name = None
     if found_id:
         cursor.execute("SELECT name FROM armor_text WHERE id = ? AND lang_id = 'en'", (found_id,))
@@ -503,6 +486,7 @@ def get_armor_details(armor_name: str) -> Optional[dict]:
     
     if not wiki_row:
         # Fallback: busca por nome parcial na wiki_armor
+        placeholders = ",".join(["?"] * len(variants))
         wiki_sql = """
             SELECT wa.id, wa.name, wa.slot_1, wa.slot_2, wa.slot_3
             FROM wiki_armor wa
@@ -583,33 +567,35 @@ def get_armor_details(armor_name: str) -> Optional[dict]:
     }
 
 
+@cached_lookup("weapon_details")
 def get_weapon_details(weapon_name: str) -> Optional[dict]:
     """Busca detalhes técnicos completos de uma arma."""
-    conn = sqlite3.connect(MHW_DB_PATH)
+    conn = get_mhw_pool().lease()
     cursor = conn.cursor()
     
     # 1. Normalização e variantes
     search = weapon_name.lower().strip()
-    variants = [search, f"%{search}%"]
-    
-    # Adiciona mapeamento de monstros (ex: "Velkhana" -> "Rimeguard" ou nomes específicos)
-    # Mas aqui vamos usar busca por nome no banco que é mais direta
     
-    # 2. Busca JOIN de weapon + weapon_text
-    sql = """
-        SELECT w.id, wt_en.name as name_en, wt_pt.name as name_pt, 
-               w.weapon_type, w.rarity, w.attack, w.affinity, 
-               w.element1, w.element1_attack, w.slot_1, w.slot_2, w.slot_3,
-               w.element_hidden
-        FROM weapon w
-        JOIN weapon_text wt_en ON w.id = wt_en.id AND wt_en.lang_id = 'en'
-        LEFT JOIN weapon_text wt_pt ON w.id = wt_pt.id AND wt_pt.lang_id = 'pt'
-        WHERE (wt_en.name LIKE ? OR wt_en.name = ? OR wt_pt.name LIKE ? OR wt_pt.name = ?)
-        ORDER BY w.rarity DESC, CASE WHEN wt_pt.name LIKE ? THEN 0 ELSE 1 END
-        LIMIT 1
-    """
-    cursor.execute(sql, (f"%{search}%", search, f"%{search}%", search, f"%{search}%"))
-    row = cursor.fetchone()
+    # 2. Resolve pelo índice de nomes; entre todos os candidatos do melhor nível, a de maior raridade
+    # (sem limite: as melhorias de raridade alta têm ids maiores que as originais)
+    matches = resolve_name('weapon', search, limit=None, conn=conn)
+    best_ids = [m['id'] for m in matches if m['rank'] == matches[0]['rank']] if matches else []
+    row = None
+    if best_ids:
+        sql = f"""
+            SELECT w.id, wt_en.name as name_en, wt_pt.name as name_pt, 
+                   w.weapon_type, w.rarity, w.attack, w.affinity, 
+                   w.element1, w.element1_attack, w.slot_1, w.slot_2, w.slot_3,
+                   w.element_hidden
+            FROM weapon w
+            JOIN weapon_text wt_en ON w.id = wt_en.id AND wt_en.lang_id = 'en'
+            LEFT JOIN weapon_text wt_pt ON w.id = wt_pt.id AND wt_pt.lang_id = 'pt'
+            WHERE w.id IN ({",".join("?" * len(best_ids))})
+            ORDER BY w.rarity DESC
+            LIMIT 1
+        """
+        cursor.execute(sql, best_ids)
+        row = cursor.fetchone()
     
     if not row:
         # Tenta na wiki_weapon como fallback
@@ -659,21 +645,16 @@ def get_weapon_details(weapon_name: str) -> Optional[dict]:
 
 def get_charm_details(charm_name: str) -> Optional[dict]:
     """Busca detalhes de um amuleto."""
-    conn = sqlite3.connect(MHW_DB_PATH)
+    conn = get_mhw_pool().lease()
     cursor = conn.cursor()
     
-    cursor.execute("SELECT id FROM charm_text WHERE name = ? AND lang_id = 'en'", (charm_name,))
-    row = cursor.fetchone()
-    if not row:
-        # Tenta busca parcial se exato falhar
-        cursor.execute("SELECT id, name FROM charm_text WHERE name LIKE ? AND lang_id IN ('pt', 'en') LIMIT 1", (f"%{charm_name}%",))
-        row = cursor.fetchone()
-        
-    if not row:
+    # Exato > palavra inteira > parcial, via índice de nomes
+    matches = resolve_name('charm', charm_name, limit=1, conn=conn)
+    if not matches:
         conn.close()
         return None
         
-    charm_id = row[0]
+    charm_id = matches[0]['id']
     # Tenta buscar skills em PT, fallback EN
     cursor.execute("""
         SELECT st.name, cs.level, s.max_level
@@ -718,9 +699,6 @@ def validate_build(
             else:
                 armor_pieces = [armor_pieces]
 
-    conn = sqlite3.connect(MHW_DB_PATH)
-    cursor = conn.cursor()
-    
     all_skills: Dict[str, Dict[str, int]] = {}
     active_sets: Dict[int, Dict[str, Any]] = {}
     total_slots: Dict[int, int] = {1: 0, 2: 0, 3: 0, 4: 0}
@@ -766,6 +744,10 @@ def validate_build(
                     all_skills[name] = {"points": 0, "max": s.get("max", 5)}
                 all_skills[name]["points"] += s.get("points", 0)
                 
+    # Conexão só é emprestada depois dos lookups acima (que usam o pool por conta própria)
+    conn = get_mhw_pool().lease()
+    cursor = conn.cursor()
+
     # 4. Lógica de Preenchimento Automático de Joias (BiS Simulation)
     # Definimos joias priorizadas para preenchimento de slots
     bis_jewels = [
@@ -850,17 +832,16 @@ def validate_build(
 
 def get_monster_info(monster_name: str) -> str:
     """busca informações sobre um monstro (fraquezas, hitzones)"""
-    conn = sqlite3.connect(MHW_DB_PATH)
+    conn = get_mhw_pool().lease()
     cursor = conn.cursor()
 
     try:
-        cursor.execute("SELECT id, name FROM monster_text WHERE name LIKE ?", (f"%{monster_name}%",))
-        monsters = cursor.fetchall()
-        if not monsters:
+        matches = resolve_name('monster', monster_name, limit=1, conn=conn)
+        if not matches:
             conn.close()
             return f"Monstro '{monster_name}' não encontrado."
             
-        m_id, m_name = monsters[0]
+        m_id, m_name = matches[0]['id'], matches[0]['name']
         
         cursor.execute("""
             SELECT weakness_fire, weakness_water, weakness_ice, weakness_thunder, weakness_dragon,
@@ -0,0 +1,288 @@
+"""
+name_index.py — Índice de nomes normalizados (sem acento, sem caixa) do mhw.db.
+
+Cobre armas, armaduras, amuletos, monstros, skills, itens e joias (pt/en).
+`resolve_name(kind, query)` é o ponto único de resolução de nomes usado
+pelos helpers de mhw_tools/mhw_api, no lugar de LIKE '%termo%'.
+
+O mhw.db é aberto como imutável, então o índice vive num arquivo à parte
+(data/cache/name_index.db) com:
+  - names(kind, id, lang, name, norm) + índice (kind, norm)
+  - names_fts: FTS5 com tokenizer trigram sobre `norm` (busca por substring
+    via índice em vez de LIKE '%...%' com full scan)
+
+As conexões do pool do mhw.db anexam esse arquivo como schema `nameidx`
+(ver data/pool.py), então as queries de equipamento podem filtrar por nome
+com um subselect no próprio SQL. Sem o índice (não montado, SQLite sem
+trigram), cai para LIKE nas tabelas *_text.
+
+O índice guarda o fingerprint do mhw.db e é remontado quando ele muda.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Optional
+
+from core.config import NAME_INDEX_PATH
+from core.logging import log
+from data.pool import get_mhw_pool, mhw_db_fingerprint
+
+# Incrementar quando o schema ou a normalização mudarem (força remontagem)
+INDEX_VERSION = 2
+
+# Schema do índice nas conexões do pool
+SCHEMA = "nameidx"
+
+# kind -> tabela *_text no mhw.db
+KINDS = {
+    "armor": "armor_text",
+    "weapon": "weapon_text",
+    "charm": "charm_text",
+    "monster": "monster_text",
+    "skill": "skilltree_text",
+    "item": "item_text",
+    "decoration": "decoration_text",
+}
+
+# Níveis de relevância devolvidos por resolve_name
+RANK_EXACT, RANK_WORD, RANK_CONTAINS = 0, 1, 2
+
+_MIN_TRIGRAM = 3
+_build_lock = threading.Lock()
+
+
+def normalize_name(text: Optional[str]) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados ("Lâmina  Ígnea" -> "lamina ignea")."""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+# ============================================================
+# Montagem
+# ============================================================
+
+def trigram_supported() -> bool:
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        finally:
+            conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _index_key() -> str:
+    return f"{INDEX_VERSION}:{mhw_db_fingerprint()}"
+
+
+def _stored_key(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    try:
+        conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'key'").fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+    except sqlite3.Error:
+        return None
+
+
+def _build(path: str, key: str) -> int:
+    """Monta o índice em `path` a partir do mhw.db. Retorna o número de nomes."""
+    rows = []
+    with get_mhw_pool().connection() as src:
+        for kind, table in KINDS.items():
+            for r in src.execute(f"SELECT id, lang_id, name FROM {table} WHERE lang_id IN ('pt', 'en') AND name IS NOT NULL"):
+                rows.append((kind, r['id'], r['lang_id'], r['name'], normalize_name(r['name'])))
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript("""
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE names (
+                rowid INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                lang TEXT NOT NULL,
+                name TEXT NOT NULL,
+                norm TEXT NOT NULL
+            );
+            CREATE INDEX idx_names_kind_norm ON names(kind, norm);
+            CREATE VIRTUAL TABLE names_fts USING fts5(norm, content='names', content_rowid='rowid', tokenize='trigram');
+        """)
+        conn.executemany("INSERT INTO names (kind, id, lang, name, norm) VALUES (?, ?, ?, ?, ?)", rows)
+        conn.execute("INSERT INTO names_fts(names_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO meta (key, value) VALUES ('key', ?)", (key,))
+        conn.commit()
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def ensure_name_index(force: bool = False) -> bool:
+    """
+    Garante que o índice existe e corresponde ao mhw.db atual.
+    Retorna False se não for possível usá-lo (SQLite sem FTS5 trigram).
+    """
+    if not trigram_supported():
+        log.warning("NameIndex: SQLite sem FTS5 trigram; busca por nome usará LIKE.")
+        return False
+
+    with _build_lock:
+        key = _index_key()
+        if not force and _stored_key(NAME_INDEX_PATH) == key:
+            return True
+
+        os.makedirs(os.path.dirname(NAME_INDEX_PATH), exist_ok=True)
+        tmp_path = NAME_INDEX_PATH + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        count = _build(tmp_path, key)
+
+        # Conexões abertas seguram o arquivo antigo (no Windows impedem o replace)
+        get_mhw_pool().reset()
+        os.replace(tmp_path, NAME_INDEX_PATH)
+        get_mhw_pool().reset()
+        log.info(f"NameIndex: {count} nomes indexados em {NAME_INDEX_PATH}")
+        return True
+
+
+# ============================================================
+# Consulta
+# ============================================================
+
+_fallback_logged = False
+
+
+def is_attached(conn) -> bool:
+    global _fallback_logged
+    attached = any(row[1] == SCHEMA for row in conn.execute("PRAGMA database_list"))
+    if not attached and not _fallback_logged:
+        _fallback_logged = True
+        log.warning(f"NameIndex: {NAME_INDEX_PATH} não anexado; busca por nome usando LIKE.")
+    return attached
+
+
+def _like_pattern(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def ids_matching_sql(conn, kind: str, query: str) -> tuple[str, list]:
+    """
+    SELECT que devolve os ids de `kind` cujo nome (pt ou en) contém `query`,
+    ignorando acentos e caixa. Para usar como `col IN (<sql>)`.
+    """
+    norm = normalize_name(query)
+    if not is_attached(conn):
+        table = KINDS[kind]
+        return (
+            f"SELECT id FROM {table} WHERE lang_id IN ('pt', 'en') AND name LIKE ? ESCAPE '\\'",
+            [_like_pattern(query.strip())],
+        )
+    if len(norm) >= _MIN_TRIGRAM:
+        phrase = '"' + norm.replace('"', '""') + '"'
+        return (
+            f"SELECT n.id FROM {SCHEMA}.names n "
+            f"WHERE n.kind = ? AND n.rowid IN (SELECT rowid FROM {SCHEMA}.names_fts WHERE names_fts MATCH ?)",
+            [kind, phrase],
+        )
+    # Trigram não cobre termos com menos de 3 caracteres
+    return (
+        f"SELECT n.id FROM {SCHEMA}.names n WHERE n.kind = ? AND n.norm LIKE ? ESCAPE '\\'",
+        [kind, _like_pattern(norm)],
+    )
+
+
+def search_ids(kind: str, query: str) -> set[int]:
+    """Ids de `kind` cujo nome contém `query` (pt ou en, sem acento/caixa)."""
+    with get_mhw_pool().connection() as conn:
+        sql, params = ids_matching_sql(conn, kind, query)
+        return {row[0] for row in conn.execute(sql, params)}
+
+
+def _candidates(conn, kind: str, norm: str, raw: str) -> list[tuple]:
+    """(id, lang, name, norm) de todos os nomes de `kind` que contêm `norm`."""
+    if not is_attached(conn):
+        table = KINDS[kind]
+        rows = conn.execute(
+            f"SELECT id, lang_id, name FROM {table} WHERE lang_id IN ('pt', 'en') AND name LIKE ? ESCAPE '\\'",
+            [_like_pattern(raw)],
+        ).fetchall()
+        return [(r[0], r[1], r[2], normalize_name(r[2])) for r in rows]
+    if len(norm) >= _MIN_TRIGRAM:
+        phrase = '"' + norm.replace('"', '""') + '"'
+        # CROSS JOIN fixa a ordem: FTS primeiro, depois a tabela por rowid
+        # (com JOIN o planner varre names por kind e consulta o FTS linha a linha)
+        rows = conn.execute(
+            f"SELECT n.id, n.lang, n.name, n.norm "
+            f"FROM {SCHEMA}.names_fts CROSS JOIN {SCHEMA}.names n ON n.rowid = names_fts.rowid "
+            f"WHERE names_fts MATCH ? AND n.kind = ?",
+            [phrase, kind],
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            f"SELECT id, lang, name, norm FROM {SCHEMA}.names WHERE kind = ? AND norm LIKE ? ESCAPE '\\'",
+            [kind, _like_pattern(norm)],
+        ).fetchall()
+    return [tuple(r) for r in rows]
+
+
+def _match_rank(norm: str, name_norm: str) -> int:
+    if name_norm == norm:
+        return RANK_EXACT
+    if re.search(rf"(?<!\w){re.escape(norm)}(?!\w)", name_norm):
+        return RANK_WORD
+    return RANK_CONTAINS
+
+
+def resolve_name(kind: str, query: str, limit: Optional[int] = 10, conn=None) -> list[dict]:
+    """
+    Resolve `query` para entidades de `kind` (ver KINDS), ignorando acentos e caixa.
+
+    Retorna até `limit` dicts {"id", "name", "lang", "rank"}, um por id,
+    ordenados por: nome exato > palavras inteiras > pedaço de palavra; dentro
+    do mesmo nível, por id, a ordem das tabelas que o LIKE antigo devolvia
+    ("Ataque" continua sendo "Reforço de Ataque", não "Ataque de Fogo").
+    `name` é o nome que casou, pt antes de en. `limit=None` devolve todos.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Tipo de nome desconhecido: {kind}")
+    norm = normalize_name(query)
+    if not norm:
+        return []
+
+    if conn is None:
+        with get_mhw_pool().connection() as pooled:
+            rows = _candidates(pooled, kind, norm, query.strip())
+    else:
+        rows = _candidates(conn, kind, norm, query.strip())
+
+    best: dict = {}
+    for item_id, lang, name, name_norm in rows:
+        if norm not in name_norm:
+            continue  # fallback LIKE não ignora acentos do lado do banco
+        rank = _match_rank(norm, name_norm)
+        key = (rank, lang != 'pt')
+        current = best.get(item_id)
+        if current is None or key < current[0]:
+            best[item_id] = (key, {"id": item_id, "name": name, "lang": lang, "rank": rank})
+
+    ordered = sorted(best.values(), key=lambda entry: (entry[0][0], entry[1]["id"]))
+    if limit is not None:
+        ordered = ordered[:limit]
+    return [match for _, match in ordered]
+
+if __name__ == "__main__":
+    ensure_name_index(force=True)
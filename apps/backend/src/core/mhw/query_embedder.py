@@ -0,0 +1,159 @@
+"""
+query_embedder.py — Embedding das queries do RAG em lote.
+
+_expand_queries gera 10–20 variações por turno. Em vez de um
+`retriever.aretrieve(q)` (e um round trip ao endpoint de embedding) por
+variação, `embed_queries(texts)` manda todas numa única chamada
+`embeddings.create(input=[...])` com input_type="query", igual ao que o
+NVIDIAEmbedding faz para uma query só.
+
+Com outro embed model (sem o cliente OpenAI-compatível do NVIDIA), cai para
+`aget_query_embedding` por texto, em paralelo.
+
+Antes da chamada, os textos passam pelo cache persistente
+(embedding_cache): só os que faltam vão à API. `prewarm(texts)` embeda
+de antemão, em lotes, os templates fixos do expansor.
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from typing import List
+
+from core.config import QUERY_EMBED_BATCH_SIZE
+from core.logging import log
+from core.mhw.embedding_cache import get_query_embedding_cache
+from data.pool import run_blocking
+
+_LATENCY_WINDOW = 200
+
+
+class EmbeddingMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.texts = 0
+        self.errors = 0
+        self._latencies: deque = deque(maxlen=_LATENCY_WINDOW)
+
+    def record(self, texts: int, calls: int, latency_ms: float):
+        with self._lock:
+            self.calls += calls
+            self.texts += texts
+            self._latencies.append(latency_ms)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            data = {
+                "calls": self.calls,
+                "texts": self.texts,
+                "avg_batch": round(self.texts / self.calls, 1) if self.calls else 0.0,
+                "errors": self.errors,
+            }
+        if latencies:
+            data["latency_ms"] = {
+                "p50": round(statistics.median(latencies), 1),
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+                "max": round(latencies[-1], 1),
+            }
+        return data
+
+
+_metrics = EmbeddingMetrics()
+
+
+def _embed_model():
+    from llama_index.core import Settings  # type: ignore
+    return Settings.embed_model
+
+
+def embed_model_ready() -> bool:
+    """O embed model já foi configurado (sem isso, Settings.embed_model cai no padrão da OpenAI)."""
+    from llama_index.core import Settings  # type: ignore
+    return getattr(Settings, "_embed_model", None) is not None
+
+
+async def _embed_batch_nvidia(embed_model, texts: List[str]) -> List[List[float]]:
+    extra_body = {"input_type": "query", "truncate": embed_model.truncate}
+    if getattr(embed_model, "dimensions", None):
+        extra_body["dimensions"] = embed_model.dimensions
+    response = await embed_model._aclient.embeddings.create(
+        input=texts,
+        model=embed_model.model,
+        extra_body=extra_body,
+    )
+    return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+
+def _model_name(embed_model) -> str:
+    return getattr(embed_model, "model", None) or getattr(embed_model, "model_name", None) or type(embed_model).__name__
+
+
+async def _embed_uncached(embed_model, texts: List[str]) -> List[List[float]]:
+    """Uma chamada à API para `texts` (sem passar pelo cache)."""
+    started = time.perf_counter()
+    try:
+        if getattr(embed_model, "_aclient", None) is not None and hasattr(embed_model, "truncate"):
+            embeddings = await _embed_batch_nvidia(embed_model, texts)
+            calls = 1
+        else:
+            embeddings = await asyncio.gather(*(embed_model.aget_query_embedding(t) for t in texts))
+            calls = len(texts)
+    except Exception:
+        _metrics.record_error()
+        raise
+    latency_ms = (time.perf_counter() - started) * 1000
+    _metrics.record(len(texts), calls, latency_ms)
+    log.info(f"Embedding: {len(texts)} queries em {calls} chamada(s) ({latency_ms:.0f}ms)")
+    return list(embeddings)
+
+
+async def embed_queries(texts: List[str]) -> List[List[float]]:
+    """
+    Embeddings (input_type=query) de `texts`, na mesma ordem. O que já está
+    no cache não vai à rede; o resto segue numa chamada só.
+    """
+    if not texts:
+        return []
+    embed_model = _embed_model()
+    model = _model_name(embed_model)
+    cache = get_query_embedding_cache()
+
+    found = await run_blocking(cache.get_many, model, texts)
+    missing = list(dict.fromkeys(t for i, t in enumerate(texts) if i not in found))
+    if missing:
+        vectors = await _embed_uncached(embed_model, missing)
+        await run_blocking(cache.put_many, model, missing, vectors)
+        computed = dict(zip(missing, vectors))
+        for i, t in enumerate(texts):
+            if i not in found:
+                found[i] = computed[t]
+    return [found[i] for i in range(len(texts))]
+
+
+async def prewarm(texts: List[str]) -> int:
+    """Embeda e guarda no cache os `texts` que ainda não estão lá. Retorna quantos."""
+    embed_model = _embed_model()
+    model = _model_name(embed_model)
+    cache = get_query_embedding_cache()
+
+    found = await run_blocking(cache.get_many, model, texts)
+    missing = list(dict.fromkeys(t for i, t in enumerate(texts) if i not in found))
+    for start in range(0, len(missing), QUERY_EMBED_BATCH_SIZE):
+        batch = missing[start:start + QUERY_EMBED_BATCH_SIZE]
+        vectors = await _embed_uncached(embed_model, batch)
+        await run_blocking(cache.put_many, model, batch, vectors)
+    return len(missing)
+
+
+def embedding_metrics() -> dict:
+    data = _metrics.snapshot()
+    data["cache"] = get_query_embedding_cache().metrics()
+    return data
@@ -6,43 +6,140 @@ este módulo parseia os XMLs, junta dados relacionados por ID, e gera
 documentos de texto legíveis e semânticos que o RAG consegue indexar.
 """
 
-import xml.etree.ElementTree as ET
+import multiprocessing
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Optional
 from llama_index.core import Document  # type: ignore
 
 
 
-from core.config import DATA_DIR, RAG_DIR
+from core.config import DATA_DIR, RAG_DIR, RAG_LOADER_WORKERS, RAG_PARSE_TRACE_MEMORY
+from core.mhw.game_data_cache import XMLTable, get_game_data_cache
 
 RAG_PATH = RAG_DIR
 
 LANGS = ["pt", "en"]
 
+# XMLs lidos pelo loader em execução (por thread) — vira o mapa de
+# dependências grupo -> XMLs usado no rebuild incremental
+_tracking = threading.local()
+
+
+def _track(filename: str):
+    reads = getattr(_tracking, "reads", None)
+    if reads is not None:
+        reads.add(filename)
+
+
+class XMLTableCache:
+    """
+    Tabelas e lookups de texto de uma carga (load_document_groups): cada XML é
+    lido uma única vez e compartilhado por todos os loaders. As tabelas vêm do
+    cache compilado (game_data_cache); só XMLs novos/alterados são parseados.
+    Guarda tempo de leitura por arquivo e, com `trace_memory`, o pico de memória.
+    """
+
+    def __init__(self, trace_memory: bool = RAG_PARSE_TRACE_MEMORY):
+        self.trace_memory = trace_memory
+        self._lock = threading.Lock()
+        self._tables: dict[str, XMLTable] = {}
+        self._lookups: dict[tuple, dict] = {}
+        self.stats: dict[str, dict] = {}
+
+    def table(self, filename: str) -> Optional[XMLTable]:
+        with self._lock:
+            if filename not in self._tables:
+                self._tables[filename] = self._parse(filename)
+            return self._tables[filename]
+
+    def text_lookup(self, filename: str, key: str) -> dict:
+        with self._lock:
+            cached = self._lookups.get((filename, key))
+        if cached is None:
+            cached = _text_lookup_from_records(_parse_xml(filename), key)
+            with self._lock:
+                self._lookups[(filename, key)] = cached
+        return cached
+
+    def _parse(self, filename: str) -> Optional[XMLTable]:
+        path = RAG_PATH / filename
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        elif self.trace_memory:
+            tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+        started = time.perf_counter()
+        try:
+            table, source = get_game_data_cache().table(path)
+        except Exception as e:
+            print(f"⚠️ Erro ao parsear {filename}: {e}")
+            return None
+        finally:
+            peak = tracemalloc.get_traced_memory()[1] - before if self.trace_memory else None
+            if self.trace_memory and not tracing:
+                tracemalloc.stop()
+        if table is None:
+            return None
+        self.stats[filename] = {
+            "source": source,
+            "records": table.size,
+            "seconds": round(time.perf_counter() - started, 3),
+            "peak_kb": max(0, peak) // 1024 if peak is not None else None,
+        }
+        return table
+
+    def report(self) -> list[str]:
+        """Uma linha por XML (mais lento primeiro) + total."""
+        lines = []
+        for name, st in sorted(self.stats.items(), key=lambda kv: -kv[1]["seconds"]):
+            line = f"{name}: {st['records']} registros em {st['seconds'] * 1000:.0f}ms ({st['source']})"
+            if st["peak_kb"] is not None:
+                line += f" (pico {st['peak_kb'] / 1024:.1f} MB)"
+            lines.append(line)
+        total = sum(st["seconds"] for st in self.stats.values())
+        parsed = sum(1 for st in self.stats.values() if st["source"] == "xml")
+        lines.append(f"{len(self.stats)} XMLs lidos uma vez cada em {total:.1f}s ({parsed} parseados, o resto do cache)")
+        return lines
+
+
+_table_cache: Optional[XMLTableCache] = None
+
+
+@contextmanager
+def table_cache():
+    """Ativa um XMLTableCache para os loaders chamados dentro do bloco."""
+    global _table_cache
+    previous = _table_cache
+    cache = _table_cache = XMLTableCache()
+    try:
+        yield cache
+    finally:
+        _table_cache = previous
+
 
 def _parse_xml(filename: str) -> list[dict]:
     """Parseia um XML e retorna lista de dicts (um por DATA_RECORD)."""
-    path = RAG_PATH / filename
-    if not path.exists():
-        return []
+    _track(filename)
+    cache = _table_cache
+    if cache is not None:
+        table = cache.table(filename)
+        return table.rows() if table is not None else []
+
     try:
-        tree = ET.parse(path)
-        records = []
-        for rec in tree.getroot().findall("DATA_RECORD"):
-            data = {}
-            for child in rec:
-                data[child.tag] = child.text or ""
-            records.append(data)
-        return records
+        table, _ = get_game_data_cache().table(RAG_PATH / filename)
+        return table.rows() if table is not None else []
     except Exception as e:
         print(f"⚠️ Erro ao parsear {filename}: {e}")
         return []
 
 
-def _build_text_lookup(filename: str, key: str = "id") -> dict:
-    """
-    Cria lookup {id -> {lang -> {field: value}}} a partir de um XML de texto.
-    """
-    records = _parse_xml(filename)
+def _text_lookup_from_records(records: list[dict], key: str) -> dict:
     lookup: dict = {}
     for rec in records:
         rid = rec.get(key, "")
@@ -56,6 +153,18 @@ def _build_text_lookup(filename: str, key: str = "id") -> dict:
     return lookup
 
 
+def _build_text_lookup(filename: str, key: str = "id") -> dict:
+    """
+    Cria lookup {id -> {lang -> {field: value}}} a partir de um XML de texto.
+    Com um table_cache ativo, o lookup é montado uma vez e compartilhado (somente leitura).
+    """
+    cache = _table_cache
+    if cache is not None:
+        _track(filename)
+        return cache.text_lookup(filename, key)
+    return _text_lookup_from_records(_parse_xml(filename), key)
+
+
 def _group_by(records: list[dict], key: str) -> dict:
     """Agrupa registros por um campo chave."""
     grouped: dict = {}
@@ -304,6 +413,7 @@ def _load_monsters() -> list[Document]:
                     break
 
         docs.append(Document(
+            id_=f"monster:{mid}",
             text="\n".join(lines),
             metadata={"source": "monster", "monster_id": mid, "name_pt": name_pt, "name_en": name_en, "size": size},
         ))
@@ -431,6 +541,7 @@ def _load_weapons() -> list[Document]:
             lines.insert(1, f"Monstro: {monster_found}")
 
         docs.append(Document(
+            id_=f"weapon:{wid}",
             text="\n".join(lines),
             metadata={"source": "weapon", "weapon_type": wtype, "name": name, "monster": monster_found},
         ))
@@ -561,6 +672,7 @@ def _load_armor() -> list[Document]:
                         lines.append(f"      - {sname}: Nível {level}")
 
         docs.append(Document(
+            id_=f"armor_set:{aset_id}",
             text="\n".join(lines),
             metadata={"source": "armor_set", "name": set_name, "armorset_id": aset_id},
         ))
@@ -638,6 +750,7 @@ def _load_armorsets() -> list[Document]:
                         lines.append(f"  {required} peças → {sname}")
 
         docs.append(Document(
+            id_=f"armorset:{sid}",
             text="\n".join(lines),
             metadata={"source": "armorset", "name": name},
         ))
@@ -692,6 +805,7 @@ def _load_charms() -> list[Document]:
             lines.append(f"Materiais: {recipe_lookup[create_rid]}")
 
         docs.append(Document(
+            id_=f"charm:{cid}",
             text="\n".join(lines),
             metadata={"source": "charm", "name": name},
         ))
@@ -754,6 +868,7 @@ def _load_decorations() -> list[Document]:
                 lines.append(f"  - {r}")
 
         docs.append(Document(
+            id_=f"decoration:{did}",
             text="\n".join(lines),
             metadata={"source": "decoration", "name": name},
         ))
@@ -771,6 +886,7 @@ def _load_manual_knowledge() -> list[Document]:
         topic = rec.get("topic", "")
         if content:
             docs.append(Document(
+                id_=f"manual:{topic}",
                 text=f"=== {topic} ===\n{content}",
                 metadata={"source": "manual", "topic": topic}
             ))
@@ -788,6 +904,7 @@ def _load_jewel_catalog() -> list[Document]:
         topic = rec.get("topic", "")
         if content:
             docs.append(Document(
+                id_=f"jewel_catalog:{topic}",
                 text=f"=== {topic} ===\n{content}",
                 metadata={"source": "jewel_catalog", "topic": topic}
             ))
@@ -864,6 +981,7 @@ def _load_items() -> list[Document]:
                     lines.append(f"Combinação: {fname} = {name} x{qty}")
 
         docs.append(Document(
+            id_=f"item:{iid}",
             text="\n".join(lines),
             metadata={"source": "item", "name": name},
         ))
@@ -907,6 +1025,7 @@ def _load_skills() -> list[Document]:
                 lines.append(f"  Nível {level_num}: {lvl_desc_pt}" if lvl_desc_pt else f"  Nível {level_num}")
 
         docs.append(Document(
+            id_=f"skill:{stid}",
             text="\n".join(lines),
             metadata={"source": "skill", "name": name},
         ))
@@ -1015,6 +1134,7 @@ def _load_quests() -> list[Document]:
                     break
 
         docs.append(Document(
+            id_=f"quest:{qid}",
             text="\n".join(lines),
             metadata={"source": "quest", "name": name},
         ))
@@ -1062,6 +1182,7 @@ def _load_kinsects() -> list[Document]:
             lines.append(f"Cura: {heal}")
 
         docs.append(Document(
+            id_=f"kinsect:{kid}",
             text="\n".join(lines),
             metadata={"source": "kinsect", "name": name},
         ))
@@ -1112,6 +1233,7 @@ def _load_tools() -> list[Document]:
             lines.append(f"Slots: [{', '.join(slots)}]")
 
         docs.append(Document(
+            id_=f"tool:{tid}",
             text="\n".join(lines),
             metadata={"source": "tool", "name": name},
         ))
@@ -1156,6 +1278,7 @@ def _load_locations() -> list[Document]:
                 lines.append(f"Itens coletáveis: {', '.join(item_list[:30])}")
 
         docs.append(Document(
+            id_=f"location:{lid}",
             text="\n".join(lines),
             metadata={"source": "location", "name": name},
         ))
@@ -1260,6 +1383,7 @@ def _load_skill_reverse_lookup() -> list[Document]:
                 lines.append("")
 
         docs.append(Document(
+            id_=f"skill_lookup:{stid}",
             text="\n".join(lines).strip(),
             metadata={"source": "skill_lookup", "skill_name": sname, "skilltree_id": stid},
         ))
@@ -1270,37 +1394,165 @@ def _load_skill_reverse_lookup() -> list[Document]:
 # ============================================================
 # ENTRY POINT
 # ============================================================
-def load_all_documents(progress_callback=None) -> list[Document]:
-    """Carrega TODOS os dados do jogo como documentos estruturados."""
+# (grupo, mensagem, loader). O grupo é o `source` dos documentos do loader
+# e o prefixo dos ids estáveis ("weapon:<id>"); é a unidade do rebuild incremental.
+LOADERS = [
+    ("monster", "Carregando monstros...", _load_monsters),
+    ("weapon", "Carregando armas...", _load_weapons),
+    ("armor_set", "Carregando armaduras...", _load_armor),
+    ("charm", "Carregando amuletos...", _load_charms),
+    ("decoration", "Carregando decorações...", _load_decorations),
+    ("item", "Carregando itens...", _load_items),
+    ("skill_lookup", "Carregando skills (Reverse Lookup)...", _load_skill_reverse_lookup),
+    ("skill", "Carregando skills (Descrições)...", _load_skills),
+    ("quest", "Carregando quests...", _load_quests),
+    ("kinsect", "Carregando kinsects...", _load_kinsects),
+    ("tool", "Carregando ferramentas...", _load_tools),
+    ("location", "Carregando localizações...", _load_locations),
+    ("manual", "Carregando conhecimento manual...", _load_manual_knowledge),
+    ("jewel_catalog", "Carregando catálogo de joias...", _load_jewel_catalog),
+]
+
+LOADER_GROUPS = [group for group, _, _ in LOADERS]
+
+
+def document_group(doc_id: str) -> str:
+    """Grupo de um documento a partir do id ("weapon:12" -> "weapon")."""
+    return doc_id.split(":", 1)[0]
+
+
+_LOADER_BY_GROUP = {group: loader_fn for group, _, loader_fn in LOADERS}
+
+
+def _run_loader(group: str) -> tuple[list[Document], list[str]]:
+    """Roda o loader do grupo registrando os XMLs que ele lê."""
+    _tracking.reads = set()
+    try:
+        docs = _LOADER_BY_GROUP[group]()
+    finally:
+        reads = sorted(_tracking.reads)
+        _tracking.reads = None
+    return docs, reads
+
+
+def _assign_ids(group: str, docs: list[Document]):
+    """Ids estáveis vêm do loader; chaves repetidas (ex.: mesmo tópico) ganham sufixo."""
+    seen: dict[str, int] = {}
+    for doc in docs:
+        if not doc.id_.startswith(f"{group}:"):
+            doc.id_ = f"{group}:{doc.id_}"
+        count = seen.get(doc.id_, 0)
+        seen[doc.id_] = count + 1
+        if count:
+            doc.id_ = f"{doc.id_}#{count + 1}"
+
+
+# ------------------------------------------------------------
+# Modo com processos (RAG_LOADER_WORKERS > 1)
+# ------------------------------------------------------------
+
+def _compile_table_task(rag_path: str, filename: str, trace_memory: bool) -> tuple[str, Optional[dict]]:
+    """Worker: garante a tabela do XML em dia no cache compilado."""
+    global RAG_PATH
+    RAG_PATH = Path(rag_path)
+    cache = XMLTableCache(trace_memory=trace_memory)
+    cache.table(filename)
+    return filename, cache.stats.get(filename)
+
+
+def _loader_task(rag_path: str, group: str) -> tuple[str, list[Document], list[str]]:
+    """Worker: roda um loader; as tabelas vêm do cache compilado (e ficam para as próximas tasks)."""
+    global RAG_PATH, _table_cache
+    RAG_PATH = Path(rag_path)
+    if _table_cache is None:
+        _table_cache = XMLTableCache()
+    docs, reads = _run_loader(group)
+    return group, docs, reads
+
+
+def _load_parallel(selected: list, workers: int, cache: XMLTableCache, report) -> tuple[dict, dict]:
+    """
+    Fase 1: XMLs novos/alterados compilados no cache em paralelo (cada um uma
+    vez). Fase 2: loaders em paralelo, lendo só as tabelas que usam. O
+    resultado é montado na ordem de LOADERS, então a saída é a mesma do modo
+    serial independente da ordem em que os workers terminam.
+    """
+    filenames = sorted(p.name for p in RAG_PATH.glob("*.xml"))
+    results: dict = {}
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        report(f"Lendo {len(filenames)} XMLs em {workers} processos...")
+        futures = [
+            pool.submit(_compile_table_task, str(RAG_PATH), name, cache.trace_memory)
+            for name in filenames
+        ]
+        for future in as_completed(futures):
+            name, stats = future.result()
+            if stats is not None:
+                cache.stats[name] = stats
+
+        futures = {pool.submit(_loader_task, str(RAG_PATH), group): group for group, _ in selected}
+        messages = dict(selected)
+        for done, future in enumerate(as_completed(futures), 1):
+            group, docs, reads = future.result()
+            results[group] = (docs, reads)
+            report(f"{messages[group]} → {len(docs)} documentos ({done}/{len(selected)})")
+
+    docs_by_group: dict[str, list[Document]] = {}
+    sources: dict[str, list[str]] = {}
+    for group, _ in selected:
+        docs, reads = results[group]
+        docs_by_group[group] = docs
+        sources[group] = reads
+    return docs_by_group, sources
+
+
+def load_document_groups(groups: Optional[set] = None, progress_callback=None,
+                         workers: int = RAG_LOADER_WORKERS) -> tuple[dict, dict]:
+    """
+    Roda os loaders (todos, ou só os de `groups`). Com `workers` > 1, parse e
+    loaders rodam num pool de processos.
+
+    Returns:
+        (documentos por grupo, XMLs lidos por grupo)
+    """
     def report(text: str):
         if progress_callback:
             progress_callback(text, 88)
         print(f"  📋 {text}")
 
-    all_docs: list[Document] = []
-
-    loaders = [
-        ("Carregando monstros...", _load_monsters),
-        ("Carregando armas...", _load_weapons),
-        ("Carregando armaduras...", _load_armor),
-        ("Carregando amuletos...", _load_charms),
-        ("Carregando decorações...", _load_decorations),
-        ("Carregando itens...", _load_items),
-        ("Carregando skills (Reverse Lookup)...", _load_skill_reverse_lookup),
-        ("Carregando skills (Descrições)...", _load_skills),
-        ("Carregando quests...", _load_quests),
-        ("Carregando kinsects...", _load_kinsects),
-        ("Carregando ferramentas...", _load_tools),
-        ("Carregando localizações...", _load_locations),
-        ("Carregando conhecimento manual...", _load_manual_knowledge),
-        ("Carregando catálogo de joias...", _load_jewel_catalog),
-    ]
-
-    for msg, loader_fn in loaders:
-        report(msg)
-        result = loader_fn()
-        all_docs.extend(result)
-        report(f"  → {len(result)} documentos")
-
-    report(f"✅ Total: {len(all_docs)} documentos estruturados prontos para indexação")
+    selected = [(group, msg) for group, msg, _ in LOADERS if groups is None or group in groups]
+
+    if workers > 1 and len(selected) > 1:
+        cache = XMLTableCache()
+        docs_by_group, sources = _load_parallel(selected, workers, cache, report)
+    else:
+        docs_by_group = {}
+        sources = {}
+        with table_cache() as cache:
+            for group, msg in selected:
+                report(msg)
+                docs_by_group[group], sources[group] = _run_loader(group)
+                report(f"  → {len(docs_by_group[group])} documentos")
+
+    for group, docs in docs_by_group.items():
+        _assign_ids(group, docs)
+
+    for line in cache.report():
+        print(f"  ⏱️ {line}")
+    if progress_callback and cache.stats:
+        progress_callback(cache.report()[-1], 88)
+
+    return docs_by_group, sources
+
+
+def load_all_documents(progress_callback=None) -> list[Document]:
+    """Carrega TODOS os dados do jogo como documentos estruturados."""
+    docs_by_group, _ = load_document_groups(progress_callback=progress_callback)
+    all_docs = [doc for docs in docs_by_group.values() for doc in docs]
+
+    msg = f"✅ Total: {len(all_docs)} documentos estruturados prontos para indexação"
+    if progress_callback:
+        progress_callback(msg, 88)
+    print(f"  📋 {msg}")
     return all_docs
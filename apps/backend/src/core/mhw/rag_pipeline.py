@@ -25,6 +25,8 @@ from core.config import DATA_DIR, RAG_DIR, STORAGE_DIR
 RAG_PATH = RAG_DIR
 STORAGE_PATH = STORAGE_DIR
 MANIFEST_PATH = STORAGE_PATH / "rag_manifest.json"
+# Grupo de documentos (loader do rag_loader) -> XMLs que ele lê
+SOURCES_PATH = STORAGE_PATH / "rag_sources.json"
 
 
 
@@ -59,6 +61,38 @@ def save_manifest():
     print(f"  📋 Manifesto salvo com {len(manifest)} XMLs rastreados")
 
 
+def load_sources() -> dict:
+    """Mapa {grupo: [XMLs]} salvo no último build (vazio se não existir)."""
+    if SOURCES_PATH.exists():
+        try:
+            with open(SOURCES_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return {}
+    return {}
+
+
+def save_sources(sources: dict, replace: bool = False):
+    """Atualiza (ou, com `replace`, substitui) o mapa grupo -> XMLs com os grupos recém-carregados."""
+    merged = sources if replace else {**load_sources(), **sources}
+    SOURCES_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(SOURCES_PATH, "w", encoding="utf-8") as fp:
+        json.dump(merged, fp, indent=2, sort_keys=True)
+
+
+def affected_groups(changes: dict, groups: list) -> Optional[set]:
+    """
+    Grupos de documentos que precisam ser recarregados dadas as mudanças.
+    Retorna None quando não há mapa de dependências para todos os `groups`
+    (storage antigo ou loader novo) — aí o rebuild tem que ser completo.
+    """
+    sources = load_sources()
+    if any(g not in sources for g in groups):
+        return None
+    changed = set(changes["added"]) | set(changes["modified"]) | set(changes["removed"])
+    return {g for g in groups if changed & set(sources[g])}
+
+
 def detect_changes() -> dict:
     """
     Compara estado atual dos XMLs com o manifesto salvo.
@@ -97,12 +131,13 @@ def needs_rebuild() -> bool:
     """
     Verifica se o índice precisa ser reconstruído.
     Retorna True se:
-    - Não existe storage/
+    - Não existe índice em data/storage (nem no formato NumPy, nem no JSON legado)
     - Não existe manifesto
     - Algum XML foi adicionado, modificado ou removido
     """
-    storage = Path("storage")
-    if not storage.exists() or not any(storage.iterdir()):
+    from core.mhw.vector_store import NumpyVectorStore
+
+    if not (NumpyVectorStore.exists(STORAGE_PATH) or NumpyVectorStore.has_legacy_storage(STORAGE_PATH)):
         return True
 
     if not MANIFEST_PATH.exists():
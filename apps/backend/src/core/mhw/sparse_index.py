@@ -0,0 +1,189 @@
+"""
+sparse_index.py — Índice BM25 local sobre os mesmos nodes do vector store.
+
+Busca densa erra nomes exatos e abreviações ("Legi", "Kushala", "α+"); o
+BM25 acerta esses casos de graça (sem embedding). get_rag_context funde as
+duas listas com Reciprocal Rank Fusion (reciprocal_rank_fusion).
+
+Formato (data/storage/bm25.npz, ao lado do vector store):
+  - node_ids, doc_len: um por node
+  - vocab + postings em CSR (indptr, doc_idx, tf)
+  - signature: hash dos node_ids do store — se o store mudar (rebuild),
+    o índice é remontado.
+
+Tokenização: minúsculas, sem acento, palavras + sufixo "+" ("α+", "β+").
+"""
+
+import hashlib
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np  # type: ignore
+
+INDEX_FILE = "bm25.npz"
+
+# Incrementar quando tokenização/formato mudarem (força remontagem)
+INDEX_VERSION = 1
+
+_K1 = 1.5
+_B = 0.75
+RRF_K = 60
+
+_TOKEN_RE = re.compile(r"[^\W_]+\+?")
+
+
+def tokenize(text: str) -> list[str]:
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(stripped)
+
+
+def signature(node_ids: Iterable[str]) -> str:
+    h = hashlib.sha1(f"v{INDEX_VERSION}".encode())
+    for node_id in sorted(node_ids):
+        h.update(node_id.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class BM25Index:
+    def __init__(self, node_ids: Sequence[str], doc_len: np.ndarray, vocab: Sequence[str],
+                 indptr: np.ndarray, doc_idx: np.ndarray, tf: np.ndarray, signature: str):
+        self.node_ids = list(node_ids)
+        self.doc_len = doc_len.astype(np.float32)
+        self.vocab = {term: i for i, term in enumerate(vocab)}
+        self.indptr = indptr
+        self.doc_idx = doc_idx
+        self.tf = tf
+        self.signature = signature
+        n = len(self.node_ids)
+        self.avgdl = float(self.doc_len.mean()) if n else 0.0
+        df = np.diff(indptr).astype(np.float32)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5))
+
+    @classmethod
+    def build(cls, items: Iterable[tuple[str, str]]) -> "BM25Index":
+        """`items`: (node_id, texto) — o texto é o mesmo que vai para o embedding."""
+        node_ids: list[str] = []
+        doc_len: list[int] = []
+        postings: dict[str, list[tuple[int, int]]] = {}
+        for doc, (node_id, text) in enumerate(items):
+            tokens = tokenize(text)
+            node_ids.append(node_id)
+            doc_len.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc, count))
+
+        vocab = sorted(postings)
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        for i, term in enumerate(vocab):
+            indptr[i + 1] = indptr[i] + len(postings[term])
+        doc_idx = np.empty(indptr[-1], dtype=np.int32)
+        tf = np.empty(indptr[-1], dtype=np.float32)
+        for i, term in enumerate(vocab):
+            entries = postings[term]
+            doc_idx[indptr[i]:indptr[i + 1]] = [d for d, _ in entries]
+            tf[indptr[i]:indptr[i + 1]] = [c for _, c in entries]
+        return cls(node_ids, np.asarray(doc_len, dtype=np.int32), vocab, indptr, doc_idx, tf, signature(node_ids))
+
+    # ------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------
+
+    def save(self, persist_dir):
+        path = Path(persist_dir) / INDEX_FILE
+        tmp = path.with_name(path.name + ".tmp")
+        vocab = sorted(self.vocab, key=self.vocab.get)
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                node_ids=np.asarray(self.node_ids, dtype=str),
+                doc_len=self.doc_len.astype(np.int32),
+                vocab=np.asarray(vocab, dtype=str),
+                indptr=self.indptr,
+                doc_idx=self.doc_idx,
+                tf=self.tf,
+                signature=np.asarray(self.signature),
+            )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, persist_dir) -> Optional["BM25Index"]:
+        path = Path(persist_dir) / INDEX_FILE
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return cls(
+                    data["node_ids"].tolist(), data["doc_len"], data["vocab"].tolist(),
+                    data["indptr"], data["doc_idx"], data["tf"], str(data["signature"]),
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+    # ------------------------------------------------------------
+    # Busca
+    # ------------------------------------------------------------
+
+    def mask(self, node_ids: Iterable[str]) -> np.ndarray:
+        """Máscara booleana (uma posição por node do índice) dos `node_ids` — para `search(allowed=...)`."""
+        wanted = set(node_ids)
+        return np.fromiter((n in wanted for n in self.node_ids), dtype=bool, count=len(self.node_ids))
+
+    def search(self, query: str, top_k: int, allowed: Optional[np.ndarray] = None) -> List[tuple[str, float]]:
+        """[(node_id, score)] em ordem decrescente de BM25; `allowed` (ver `mask`) restringe a uma partição."""
+        if not self.node_ids:
+            return []
+        scores = np.zeros(len(self.node_ids), dtype=np.float32)
+        norm = _K1 * (1 - _B + _B * self.doc_len / (self.avgdl or 1.0))
+        for term in set(tokenize(query)):
+            i = self.vocab.get(term)
+            if i is None:
+                continue
+            start, end = self.indptr[i], self.indptr[i + 1]
+            docs = self.doc_idx[start:end]
+            tf = self.tf[start:end]
+            scores[docs] += self.idf[i] * tf * (_K1 + 1) / (tf + norm[docs])
+        if allowed is not None:
+            scores[~allowed] = 0.0
+
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        k = min(top_k, len(hits))
+        top = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.node_ids[j], float(scores[j])) for j in top]
+
+    def stats(self) -> dict:
+        return {"nodes": len(self.node_ids), "terms": len(self.vocab), "postings": int(len(self.doc_idx))}
+
+
+def load_or_build(store, persist_dir) -> BM25Index:
+    """Carrega o bm25.npz se ele corresponde aos nodes do store; senão remonta e salva."""
+    from llama_index.core.schema import MetadataMode  # type: ignore
+
+    node_ids = store.node_ids()
+    index = BM25Index.load(persist_dir)
+    if index is not None and index.signature == signature(node_ids):
+        return index
+    nodes = store.get_nodes(node_ids)
+    index = BM25Index.build((n.node_id, n.get_content(metadata_mode=MetadataMode.EMBED)) for n in nodes)
+    Path(persist_dir).mkdir(parents=True, exist_ok=True)
+    index.save(persist_dir)
+    return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[tuple[str, float]]:
+    """
+    Funde listas ranqueadas de ids: score(id) = Σ 1 / (k + posição). Empates
+    mantêm a ordem de primeira aparição.
+    """
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: -kv[1])
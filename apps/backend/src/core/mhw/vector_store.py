@@ -0,0 +1,514 @@
+"""
+vector_store.py — Vector store em NumPy com memory-map para o RAG.
+
+Substitui o SimpleVectorStore/SimpleDocumentStore (JSON gigante lido
+inteiro no startup) por dois arquivos em data/storage:
+
+  - vectors.npy: matriz float32 contígua (n × dim), linhas já normalizadas
+    (L2), aberta com np.load(mmap_mode='r') — o load é instantâneo e as
+    páginas só entram na memória quando a busca as toca.
+  - nodes.db: SQLite com o texto e o JSON de cada node (sem o texto e sem o
+    embedding), indexado pela linha da matriz. Só as linhas do top-k são lidas.
+    Guarda também o hash do texto embedado de cada node (content_hash), que
+    permite reaproveitar o embedding num rebuild quando o texto não mudou.
+
+Busca: similaridade de cosseno = produto matriz × vetor (ou matriz × matriz
+em `query_many`), top-k com argpartition.
+
+Filtros de metadata (igualdade, ex: {"source": "skill_lookup"}) usam
+sub-índices por partição (`partition`): as linhas que casam, com uma cópia
+contígua dos vetores, montadas na primeira consulta e descartadas quando o
+store muda. A busca filtrada só percorre a partição.
+
+O store guarda o texto (stores_text=True), então o VectorStoreIndex não
+precisa de docstore: `VectorStoreIndex.from_vector_store(store)`.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np  # type: ignore
+from llama_index.core.bridge.pydantic import PrivateAttr  # type: ignore
+from llama_index.core.schema import BaseNode, MetadataMode  # type: ignore
+from llama_index.core.vector_stores.types import (  # type: ignore
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict  # type: ignore
+
+VECTORS_FILE = "vectors.npy"
+NODES_FILE = "nodes.db"
+
+# Incrementar quando o formato dos arquivos mudar
+STORE_VERSION = 2
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def content_hash(node: BaseNode) -> str:
+    """Hash do texto que vai para o embedding (conteúdo + metadata embedável)."""
+    return hashlib.sha256(node.get_content(metadata_mode=MetadataMode.EMBED).encode("utf-8")).hexdigest()
+
+
+def _node_record(node: BaseNode) -> tuple:
+    """(node_id, ref_doc_id, content_hash, node_type, node_json sem texto, texto)."""
+    meta = node_to_metadata_dict(node, remove_text=True)
+    return (node.node_id, node.ref_doc_id, content_hash(node), meta["_node_type"], meta["_node_content"], node.get_content())
+
+
+def filter_key(filters) -> tuple:
+    """
+    Normaliza filtros de igualdade para uma chave ((campo, valor), ...).
+    Aceita dict {campo: valor} ou MetadataFilters só com EQ combinados por AND.
+    """
+    if isinstance(filters, MetadataFilters):
+        if filters.condition not in (None, FilterCondition.AND):
+            raise NotImplementedError("NumpyVectorStore só suporta filtros combinados com AND")
+        items = {}
+        for f in filters.filters:
+            if isinstance(f, MetadataFilters) or f.operator != FilterOperator.EQ:
+                raise NotImplementedError("NumpyVectorStore só suporta filtros de igualdade")
+            items[f.key] = f.value
+    else:
+        items = dict(filters)
+    return tuple(sorted((k, str(v)) for k, v in items.items()))
+
+
+class Partition:
+    """Sub-índice de um filtro: linhas que casam + cópia contígua dos vetores delas."""
+
+    def __init__(self, rows: np.ndarray, matrix: np.ndarray, node_ids: List[str]):
+        self.rows = rows
+        self.matrix = matrix
+        self.node_ids = node_ids
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """Vector store float32 em memória/mmap com payload dos nodes em SQLite."""
+
+    stores_text: bool = True
+    flat_metadata: bool = False
+
+    _matrix: Any = PrivateAttr(default=None)          # (n, dim) float32, normalizado
+    _node_ids: list = PrivateAttr(default_factory=list)
+    _ref_doc_ids: list = PrivateAttr(default_factory=list)
+    _hashes: list = PrivateAttr(default_factory=list)
+    _alive: Any = PrivateAttr(default=None)           # bool (n,) — False = apagado
+    _conn: Any = PrivateAttr(default=None)            # nodes.db persistido
+    _persisted_rows: int = PrivateAttr(default=0)     # linhas [0, n) que estão no nodes.db
+    _pending: dict = PrivateAttr(default_factory=dict)  # linha -> registro ainda não persistido
+    _metadata: Any = PrivateAttr(default=None)        # metadata (só escalares) por linha, lida sob demanda
+    _partitions: dict = PrivateAttr(default_factory=dict)  # filter_key -> Partition
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NumpyVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    # ------------------------------------------------------------
+    # Arquivos
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def exists(persist_dir) -> bool:
+        """Existe um store persistido em `persist_dir`, no formato atual."""
+        d = Path(persist_dir)
+        if not ((d / VECTORS_FILE).exists() and (d / NODES_FILE).exists()):
+            return False
+        try:
+            conn = sqlite3.connect(f"{(d / NODES_FILE).resolve().as_uri()}?mode=ro", uri=True)
+            try:
+                version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return False
+        return bool(version) and int(version[0]) == STORE_VERSION
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir) -> "NumpyVectorStore":
+        store = cls()
+        store._open(Path(persist_dir))
+        return store
+
+    def _open(self, d: Path):
+        conn = sqlite3.connect(f"{(d / NODES_FILE).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if not version or int(version[0]) != STORE_VERSION:
+            conn.close()
+            raise ValueError(f"{NODES_FILE}: versão do store incompatível")
+        rows = conn.execute("SELECT node_id, ref_doc_id, content_hash FROM nodes ORDER BY row").fetchall()
+        self._matrix = np.load(d / VECTORS_FILE, mmap_mode="r")
+        if len(rows) != self._matrix.shape[0]:
+            conn.close()
+            raise ValueError(f"{VECTORS_FILE} e {NODES_FILE} fora de sincronia")
+        self._conn = conn
+        self._node_ids = [r[0] for r in rows]
+        self._ref_doc_ids = [r[1] for r in rows]
+        self._hashes = [r[2] for r in rows]
+        self._alive = np.ones(len(rows), dtype=bool)
+        self._persisted_rows = len(rows)
+        self._pending = {}
+        self._invalidate_partitions()
+
+    def _close_files(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        # Solta o mmap antes de substituir o arquivo (obrigatório no Windows)
+        if isinstance(self._matrix, np.memmap):
+            self._matrix = np.array(self._matrix)
+
+    def persist(self, persist_path: str, fs: Optional[Any] = None) -> None:
+        """Grava vectors.npy + nodes.db em `persist_path` (diretório), compactando linhas apagadas."""
+        d = Path(persist_path)
+        if d.suffix:  # StorageContext.persist passa um caminho de arquivo
+            d = d.parent
+        d.mkdir(parents=True, exist_ok=True)
+        keep = np.flatnonzero(self._alive) if self._alive is not None else np.array([], dtype=int)
+        dim = self._matrix.shape[1] if self._matrix is not None else 0
+
+        tmp_vectors = d / (VECTORS_FILE + ".tmp")
+        tmp_nodes = d / (NODES_FILE + ".tmp")
+        if tmp_nodes.exists():
+            tmp_nodes.unlink()
+
+        matrix = np.ascontiguousarray(self._matrix[keep] if len(keep) else np.zeros((0, dim)), dtype=np.float32)
+        with open(tmp_vectors, "wb") as f:
+            np.save(f, matrix)
+
+        out = sqlite3.connect(str(tmp_nodes))
+        try:
+            out.executescript("""
+                CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE nodes (
+                    row INTEGER PRIMARY KEY,
+                    node_id TEXT NOT NULL UNIQUE,
+                    ref_doc_id TEXT,
+                    content_hash TEXT NOT NULL,
+                    node_type TEXT NOT NULL,
+                    node_json TEXT NOT NULL,
+                    text TEXT NOT NULL
+                );
+                CREATE INDEX idx_nodes_ref_doc ON nodes(ref_doc_id);
+            """)
+            out.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+                ("version", str(STORE_VERSION)), ("dim", str(dim)), ("count", str(len(keep))),
+            ])
+            out.executemany(
+                "INSERT INTO nodes (row, node_id, ref_doc_id, content_hash, node_type, node_json, text) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((new_row, *record) for new_row, record in enumerate(self._records(keep.tolist()))),
+            )
+            out.commit()
+        finally:
+            out.close()
+
+        self._close_files()
+        os.replace(tmp_vectors, d / VECTORS_FILE)
+        os.replace(tmp_nodes, d / NODES_FILE)
+        self._open(d)
+
+    def _records(self, rows: List[int]):
+        """Registros completos das linhas pedidas, na ordem, em blocos."""
+        chunk = 500
+        for start in range(0, len(rows), chunk):
+            part = rows[start:start + chunk]
+            stored = {}
+            persisted = [r for r in part if r < self._persisted_rows]
+            if persisted and self._conn is not None:
+                placeholders = ",".join("?" * len(persisted))
+                for row, *record in self._conn.execute(
+                    f"SELECT row, node_id, ref_doc_id, content_hash, node_type, node_json, text FROM nodes WHERE row IN ({placeholders})",
+                    persisted,
+                ):
+                    stored[row] = tuple(record)
+            for r in part:
+                yield self._pending[r] if r in self._pending else stored[r]
+
+    # ------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        vectors = _normalize_rows(np.asarray([n.get_embedding() for n in nodes], dtype=np.float32))
+        base = len(self._node_ids)
+        self._matrix = vectors if self._matrix is None or base == 0 else np.vstack([self._matrix, vectors])
+        self._alive = np.concatenate([self._alive if self._alive is not None else np.zeros(0, dtype=bool),
+                                      np.ones(len(nodes), dtype=bool)])
+        for offset, node in enumerate(nodes):
+            record = _node_record(node)
+            self._pending[base + offset] = record
+            self._node_ids.append(node.node_id)
+            self._ref_doc_ids.append(node.ref_doc_id)
+            self._hashes.append(record[2])
+        self._invalidate_partitions()
+        return [n.node_id for n in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        for row, ref in enumerate(self._ref_doc_ids):
+            if ref == ref_doc_id:
+                self._alive[row] = False
+                self._pending.pop(row, None)
+        self._invalidate_partitions()
+
+    def delete_ref_docs(self, ref_doc_ids) -> int:
+        """Apaga todos os nodes dos documentos em `ref_doc_ids`. Retorna quantos."""
+        rows = self._rows_for_ref_docs(ref_doc_ids)
+        if not rows:
+            return 0
+        self._alive[rows] = False
+        for row in rows:
+            self._pending.pop(row, None)
+        self._invalidate_partitions()
+        return len(rows)
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[Any] = None, **delete_kwargs: Any) -> None:
+        if filters is not None:
+            raise NotImplementedError("NumpyVectorStore não apaga por filtro de metadata")
+        wanted = set(node_ids or [])
+        for row, node_id in enumerate(self._node_ids):
+            if node_id in wanted:
+                self._alive[row] = False
+                self._pending.pop(row, None)
+        self._invalidate_partitions()
+
+    def clear(self) -> None:
+        self._close_files()
+        self._matrix = None
+        self._node_ids, self._ref_doc_ids, self._hashes = [], [], []
+        self._alive = None
+        self._persisted_rows = 0
+        self._pending = {}
+        self._invalidate_partitions()
+
+    # ------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------
+
+    def count(self) -> int:
+        # Não é __len__: o LlamaIndex faz `vector_store or SimpleVectorStore()`,
+        # e um store vazio seria trocado pelo padrão
+        return int(self._alive.sum()) if self._alive is not None else 0
+
+    def _load_nodes(self, rows: List[int]) -> List[BaseNode]:
+        nodes = []
+        for node_id, ref_doc_id, _, node_type, node_json, text in self._records(rows):
+            nodes.append(metadata_dict_to_node({"_node_content": node_json, "_node_type": node_type}, text=text))
+        return nodes
+
+    def get_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[Any] = None, **kwargs: Any) -> List[BaseNode]:
+        if self._alive is None:
+            return []
+        allowed = set(self.partition(filters).rows.tolist()) if filters is not None else None
+        wanted = set(node_ids) if node_ids is not None else None
+        rows = [
+            r for r, node_id in enumerate(self._node_ids)
+            if self._alive[r] and (wanted is None or node_id in wanted) and (allowed is None or r in allowed)
+        ]
+        return self._load_nodes(rows)
+
+    def node_ids(self) -> List[str]:
+        """Ids dos nodes vivos, na ordem das linhas."""
+        if self._alive is None:
+            return []
+        return [node_id for node_id, alive in zip(self._node_ids, self._alive) if alive]
+
+    def ref_doc_ids(self) -> set:
+        if self._alive is None:
+            return set()
+        return {ref for ref, alive in zip(self._ref_doc_ids, self._alive) if alive}
+
+    def _rows_for_ref_docs(self, ref_doc_ids) -> List[int]:
+        wanted = set(ref_doc_ids)
+        if self._alive is None:
+            return []
+        return [r for r, ref in enumerate(self._ref_doc_ids) if self._alive[r] and ref in wanted]
+
+    def embeddings_by_hash(self, ref_doc_ids=None) -> dict:
+        """{content_hash: embedding} dos nodes vivos (ou só dos documentos em `ref_doc_ids`)."""
+        if ref_doc_ids is None:
+            rows = np.flatnonzero(self._alive).tolist() if self._alive is not None else []
+        else:
+            rows = self._rows_for_ref_docs(ref_doc_ids)
+        return {self._hashes[r]: self._matrix[r].tolist() for r in rows}
+
+    # ------------------------------------------------------------
+    # Partições por metadata
+    # ------------------------------------------------------------
+
+    def _invalidate_partitions(self):
+        self._metadata = None
+        self._partitions = {}
+
+    def _row_metadata(self) -> List[Dict[str, str]]:
+        """Metadata escalar (como str) de cada linha; lida do nodes.db uma vez."""
+        if self._metadata is None:
+            node_json = {}
+            if self._conn is not None:
+                node_json.update(self._conn.execute("SELECT row, node_json FROM nodes"))
+            node_json.update((row, record[4]) for row, record in self._pending.items())
+            metadata = []
+            for row in range(len(self._node_ids)):
+                raw = json.loads(node_json[row]).get("metadata") or {} if row in node_json else {}
+                metadata.append({k: str(v) for k, v in raw.items() if isinstance(v, (str, int, float, bool))})
+            self._metadata = metadata
+        return self._metadata
+
+    def partition(self, filters) -> Partition:
+        """
+        Sub-índice dos nodes vivos cuja metadata casa com `filters` (dict ou
+        MetadataFilters de igualdade). Montado uma vez por filtro.
+        """
+        key = filter_key(filters)
+        part = self._partitions.get(key)
+        if part is None:
+            if self._alive is None:
+                rows = np.zeros(0, dtype=np.int64)
+            else:
+                metadata = self._row_metadata()
+                rows = np.asarray([
+                    r for r in np.flatnonzero(self._alive).tolist()
+                    if all(metadata[r].get(k) == v for k, v in key)
+                ], dtype=np.int64)
+            matrix = np.ascontiguousarray(self._matrix[rows]) if len(rows) else np.zeros((0, 0), dtype=np.float32)
+            part = Partition(rows, matrix, [self._node_ids[r] for r in rows.tolist()])
+            self._partitions[key] = part
+        return part
+
+    def partition_sizes(self, field: str) -> Dict[str, int]:
+        """Quantos nodes vivos há por valor de `field` (ex: "source")."""
+        if self._alive is None:
+            return {}
+        metadata = self._row_metadata()
+        sizes: Dict[str, int] = {}
+        for r in np.flatnonzero(self._alive).tolist():
+            value = metadata[r].get(field)
+            if value is not None:
+                sizes[value] = sizes.get(value, 0) + 1
+        return sizes
+
+    # ------------------------------------------------------------
+    # Busca
+    # ------------------------------------------------------------
+
+    def _mask(self, query: VectorStoreQuery) -> np.ndarray:
+        mask = self._alive.copy()
+        if query.node_ids:  # o VectorIndexRetriever passa [] quando não há filtro
+            wanted = set(query.node_ids)
+            mask &= np.fromiter((n in wanted for n in self._node_ids), dtype=bool, count=len(self._node_ids))
+        if query.doc_ids:
+            wanted = set(query.doc_ids)
+            mask &= np.fromiter((d in wanted for d in self._ref_doc_ids), dtype=bool, count=len(self._ref_doc_ids))
+        if query.filters is not None:
+            in_partition = np.zeros_like(mask)
+            in_partition[self.partition(query.filters).rows] = True
+            mask &= in_partition
+        return mask
+
+    def _top_k(self, scores: np.ndarray, candidates: np.ndarray, k: int) -> VectorStoreQueryResult:
+        """Top-k de `scores` (um por linha de `candidates`)."""
+        if not len(candidates) or k <= 0:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = candidates[top].tolist()
+        return VectorStoreQueryResult(
+            nodes=self._load_nodes(rows),
+            similarities=scores[top].astype(float).tolist(),
+            ids=[self._node_ids[r] for r in rows],
+        )
+
+    def _query_vectors(self, embeddings) -> np.ndarray:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        return _normalize_rows(vectors)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if self._matrix is None or query.query_embedding is None:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+        candidates = np.flatnonzero(self._mask(query))
+        scores = self._matrix[candidates] @ self._query_vectors(query.query_embedding)[0]
+        return self._top_k(scores, candidates, query.similarity_top_k)
+
+    def query_many(self, embeddings: Sequence[Sequence[float]], similarity_top_k: int,
+                   filters: Optional[Any] = None) -> List[VectorStoreQueryResult]:
+        """
+        Top-k de várias queries com um único produto matriz × matriz. Com
+        `filters`, o produto é só contra os vetores da partição.
+        """
+        if self._matrix is None or not len(embeddings):
+            return [VectorStoreQueryResult(nodes=[], similarities=[], ids=[]) for _ in embeddings]
+        if filters is not None:
+            part = self.partition(filters)
+            if not len(part):
+                return [VectorStoreQueryResult(nodes=[], similarities=[], ids=[]) for _ in embeddings]
+            candidates, matrix = part.rows, part.matrix
+            scores = self._query_vectors(embeddings) @ matrix.T
+        else:
+            candidates = np.flatnonzero(self._alive)
+            scores = (self._query_vectors(embeddings) @ self._matrix.T)[:, candidates]
+        return [self._top_k(row, candidates, similarity_top_k) for row in scores]
+
+    # ------------------------------------------------------------
+    # Migração do formato antigo (SimpleVectorStore + docstore em JSON)
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def has_legacy_storage(persist_dir) -> bool:
+        d = Path(persist_dir)
+        return (d / "docstore.json").exists() and any(d.glob("*vector_store.json"))
+
+    @classmethod
+    def from_legacy_storage(cls, persist_dir) -> "NumpyVectorStore":
+        """Converte o storage padrão do LlamaIndex sem recalcular embeddings."""
+        from llama_index.core import StorageContext  # type: ignore
+
+        ctx = StorageContext.from_defaults(persist_dir=str(persist_dir))
+        embedding_dict = ctx.vector_store.data.embedding_dict
+        docstore = ctx.docstore
+        store = cls()
+        batch = []
+        for node_id, embedding in embedding_dict.items():
+            node = docstore.get_node(node_id, raise_error=False)
+            if node is None:
+                continue
+            node.embedding = embedding
+            batch.append(node)
+        store.add(batch)
+        return store
+
+    @staticmethod
+    def remove_legacy_storage(persist_dir):
+        d = Path(persist_dir)
+        for name in ("docstore.json", "index_store.json", "graph_store.json", "image__vector_store.json"):
+            (d / name).unlink(missing_ok=True)
+        for f in d.glob("*vector_store.json"):
+            f.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        return {
+            "nodes": self.count(),
+            "dim": int(self._matrix.shape[1]) if self._matrix is not None else 0,
+            "mmap": isinstance(self._matrix, np.memmap),
+        }
@@ -4,131 +4,212 @@ db.py — Gerenciamento centralizado de conexões de banco de dados.
 Fornece conexões para os dois bancos:
 - sessions.db: Chats, mensagens e configurações do usuário.
 - mhw.db: Dados extraídos do jogo (monstros, armaduras, etc.)
+
+As conexões vêm dos pools de `data.pool`: leituras reaproveitam conexões
+abertas e todas as escritas do sessions.db passam pelo escritor único.
 """
 
 import sqlite3
 import os
+import threading
 import uuid
 import json
 from datetime import datetime
 from typing import Any, Optional
 
 from core.config import SESSIONS_DB_PATH, MHW_DB_PATH
+from data.pool import get_mhw_pool, get_sessions_pool, get_sessions_writer, PooledConnection
+
+def get_sessions_db() -> PooledConnection:
+    """Retorna conexão (somente leitura) do pool do banco de sessões. Escritas passam por `_write`."""
+    return get_sessions_pool().lease()
 
-def get_sessions_db() -> sqlite3.Connection:
-    """Retorna conexão ao banco de sessões."""
-    conn = sqlite3.connect(SESSIONS_DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    return conn
+def get_mhw_db() -> PooledConnection:
+    """Retorna conexão (somente leitura) do pool do banco de dados do jogo."""
+    return get_mhw_pool().lease()
 
-def get_mhw_db() -> sqlite3.Connection:
-    """Retorna conexão ao banco de dados do jogo."""
-    conn = sqlite3.connect(MHW_DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+def _write(fn):
+    """Executa fn(conn) no escritor único do sessions.db, dentro de uma transação."""
+    return get_sessions_writer().submit(fn)
 
 def init_sessions_db():
     """Inicializa tabelas do banco de sessões."""
-    conn = get_sessions_db()
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS chats (
-            id TEXT PRIMARY KEY,
-            title TEXT NOT NULL,
-            is_pinned INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS messages (
-            id TEXT PRIMARY KEY,
-            chat_id TEXT NOT NULL,
-            role TEXT NOT NULL,
-            content TEXT NOT NULL,
-            timestamp INTEGER NOT NULL,
-            FOREIGN KEY (chat_id) REFERENCES chats (id) ON DELETE CASCADE
-        )
-    """)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS user_config (
-            id TEXT PRIMARY KEY,
-            value TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    def _op(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chats (
+                id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                is_pinned INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id TEXT PRIMARY KEY,
+                chat_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
+                FOREIGN KEY (chat_id) REFERENCES chats (id) ON DELETE CASCADE
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_ts ON messages(chat_id, timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chats_updated_at ON chats(updated_at)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chat_summaries (
+                chat_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                covered_until INTEGER NOT NULL,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (chat_id) REFERENCES chats (id) ON DELETE CASCADE
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_config (
+                id TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+    _write(_op)
 
 # --- Chat Operations ---
 
 def create_chat(title: str = "Nova Conversa") -> str:
     chat_id = str(uuid.uuid4())
-    conn = get_sessions_db()
-    conn.execute("INSERT INTO chats (id, title) VALUES (?, ?)", (chat_id, title))
-    conn.commit()
-    conn.close()
+    _write(lambda conn: conn.execute("INSERT INTO chats (id, title) VALUES (?, ?)", (chat_id, title)))
     return chat_id
 
-def get_all_chats() -> list[dict]:
-    conn = get_sessions_db()
-    chats = conn.execute("SELECT * FROM chats ORDER BY updated_at DESC").fetchall()
-    conn.close()
+def get_all_chats(limit: Optional[int] = None, offset: int = 0) -> list[dict]:
+    """Chats do mais recente para o mais antigo; `limit`/`offset` paginam (idx_chats_updated_at)."""
+    with get_sessions_pool().connection() as conn:
+        if limit is None:
+            chats = conn.execute("SELECT * FROM chats ORDER BY updated_at DESC").fetchall()
+        else:
+            chats = conn.execute(
+                "SELECT * FROM chats ORDER BY updated_at DESC LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
     return [dict(chat) for chat in chats]
 
-def get_chat_messages(chat_id: str) -> list[dict]:
-    conn = get_sessions_db()
-    messages = conn.execute(
-        "SELECT * FROM messages WHERE chat_id = ? ORDER BY timestamp ASC", (chat_id,)
-    ).fetchall()
-    conn.close()
+def get_chat_messages(
+    chat_id: str,
+    limit: Optional[int] = None,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+) -> list[dict]:
+    """
+    Mensagens do chat em ordem cronológica. `before`/`after` (timestamp em
+    ms, exclusivos) recortam o intervalo; com `limit`, vêm as `limit` mais
+    recentes dele (página anterior = before=timestamp da primeira recebida).
+    """
+    where, params = "chat_id = ?", [chat_id]
+    if before is not None:
+        where += " AND timestamp < ?"
+        params.append(before)
+    if after is not None:
+        where += " AND timestamp > ?"
+        params.append(after)
+    with get_sessions_pool().connection() as conn:
+        if limit is None:
+            messages = conn.execute(
+                f"SELECT * FROM messages WHERE {where} ORDER BY timestamp ASC", params
+            ).fetchall()
+        else:
+            messages = conn.execute(
+                f"SELECT * FROM messages WHERE {where} ORDER BY timestamp DESC LIMIT ?", [*params, limit]
+            ).fetchall()[::-1]
     return [dict(msg) for msg in messages]
 
+_timestamp_lock = threading.Lock()
+_last_timestamp = 0
+
+def _next_timestamp() -> int:
+    """Timestamp em ms, estritamente crescente (pergunta e resposta do mesmo turno não empatam)."""
+    global _last_timestamp
+    with _timestamp_lock:
+        _last_timestamp = max(int(datetime.now().timestamp() * 1000), _last_timestamp + 1)
+        return _last_timestamp
+
 def add_message(chat_id: str, role: str, content: str) -> str:
     msg_id = str(uuid.uuid4())
-    timestamp = int(datetime.now().timestamp() * 1000)
-    conn = get_sessions_db()
-    conn.execute(
-        "INSERT INTO messages (id, chat_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
-        (msg_id, chat_id, role, content, timestamp)
-    )
-    conn.execute("UPDATE chats SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (chat_id,))
-    conn.commit()
-    conn.close()
+    timestamp = _next_timestamp()
+    def _op(conn):
+        conn.execute(
+            "INSERT INTO messages (id, chat_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+            (msg_id, chat_id, role, content, timestamp)
+        )
+        conn.execute("UPDATE chats SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (chat_id,))
+    _write(_op)
     return msg_id
 
+def add_turn(chat_id: str, user_message: str, response_text: str, title_length: int = 30) -> tuple[str, str]:
+    """
+    Grava pergunta + resposta numa única transação. No primeiro turno do
+    chat, o título vira o começo da pergunta. Retorna os ids das mensagens.
+    """
+    user_id, assistant_id = str(uuid.uuid4()), str(uuid.uuid4())
+    user_ts = _next_timestamp()
+    assistant_ts = _next_timestamp()
+    def _op(conn):
+        first_turn = conn.execute("SELECT 1 FROM messages WHERE chat_id = ? LIMIT 1", (chat_id,)).fetchone() is None
+        conn.executemany(
+            "INSERT INTO messages (id, chat_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+            [
+                (user_id, chat_id, "user", user_message, user_ts),
+                (assistant_id, chat_id, "assistant", response_text, assistant_ts),
+            ],
+        )
+        if first_turn:
+            conn.execute(
+                "UPDATE chats SET title = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (user_message[:title_length], chat_id),
+            )
+        else:
+            conn.execute("UPDATE chats SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (chat_id,))
+    _write(_op)
+    return user_id, assistant_id
+
 def delete_chat(chat_id: str):
-    conn = get_sessions_db()
-    conn.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
-    conn.execute("DELETE FROM chats WHERE id = ?", (chat_id,))
-    conn.commit()
-    conn.close()
+    def _op(conn):
+        conn.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
+        conn.execute("DELETE FROM chat_summaries WHERE chat_id = ?", (chat_id,))
+        conn.execute("DELETE FROM chats WHERE id = ?", (chat_id,))
+    _write(_op)
 
 def toggle_pin(chat_id: str):
-    conn = get_sessions_db()
-    conn.execute("UPDATE chats SET is_pinned = 1 - is_pinned WHERE id = ?", (chat_id,))
-    conn.commit()
-    conn.close()
+    _write(lambda conn: conn.execute("UPDATE chats SET is_pinned = 1 - is_pinned WHERE id = ?", (chat_id,)))
 
 def update_chat_title(chat_id: str, title: str):
-    conn = get_sessions_db()
-    conn.execute("UPDATE chats SET title = ? WHERE id = ?", (title, chat_id))
-    conn.commit()
-    conn.close()
+    _write(lambda conn: conn.execute("UPDATE chats SET title = ? WHERE id = ?", (title, chat_id)))
+
+# --- Resumo da conversa (services/history_manager.py) ---
+
+def get_chat_summary(chat_id: str) -> Optional[dict]:
+    """{"summary", "covered_until", "message_count"} ou None se o chat ainda não tem resumo."""
+    with get_sessions_pool().connection() as conn:
+        row = conn.execute(
+            "SELECT summary, covered_until, message_count FROM chat_summaries WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+    return dict(row) if row else None
+
+def set_chat_summary(chat_id: str, summary: str, covered_until: int, message_count: int):
+    _write(lambda conn: conn.execute(
+        "INSERT OR REPLACE INTO chat_summaries (chat_id, summary, covered_until, message_count, updated_at) "
+        "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+        (chat_id, summary, covered_until, message_count),
+    ))
 
 # --- User Config ---
 
 def set_user_config(config_id: str, value: Any):
-    conn = get_sessions_db()
     if isinstance(value, (dict, list)):
         value = json.dumps(value)
-    conn.execute("INSERT OR REPLACE INTO user_config (id, value) VALUES (?, ?)", (config_id, value))
-    conn.commit()
-    conn.close()
+    _write(lambda conn: conn.execute("INSERT OR REPLACE INTO user_config (id, value) VALUES (?, ?)", (config_id, value)))
 
 def get_user_config(config_id: str, default: Any = None) -> Any:
-    conn = get_sessions_db()
-    row = conn.execute("SELECT value FROM user_config WHERE id = ?", (config_id,)).fetchone()
-    conn.close()
+    with get_sessions_pool().connection() as conn:
+        row = conn.execute("SELECT value FROM user_config WHERE id = ?", (config_id,)).fetchone()
     if row:
         val = row['value']
         try:
@@ -0,0 +1,486 @@
+"""
+pool.py — Pool de conexões SQLite compartilhado entre requests.
+
+- mhw.db: conexões somente-leitura (mode=ro, immutable=1, mmap) reaproveitadas,
+  em vez de um sqlite3.connect() por chamada. O índice de nomes
+  (data/cache/name_index.db) é anexado como `nameidx` quando existe.
+- sessions.db: leitores reaproveitados + um único escritor servido por uma
+  thread dedicada (fila), então o PRAGMA journal_mode=WAL roda uma vez só.
+
+Cada pool expõe métricas (conexões abertas, emprestadas, tempo de espera)
+via `pool_metrics()`.
+
+`run_blocking(fn, ...)` executa trabalho bloqueante de banco num
+ThreadPoolExecutor limitado (DB_EXECUTOR_WORKERS), para handlers async não
+travarem o event loop.
+"""
+
+import asyncio
+import functools
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from core.config import MHW_DB_PATH, SESSIONS_DB_PATH, NAME_INDEX_PATH, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_MMAP_SIZE, DB_EXECUTOR_WORKERS
+
+
+class PoolTimeout(RuntimeError):
+    """Nenhuma conexão ficou livre dentro do tempo limite."""
+
+
+# ============================================================
+# POOL DE LEITURA
+# ============================================================
+
+class ConnectionPool:
+    """
+    Pool thread-safe de conexões SQLite.
+
+    Conexões ociosas ficam numa pilha (LIFO, mantém as "quentes" em uso).
+    Novas conexões são abertas sob demanda até `max_size`; depois disso
+    quem pede espera até `timeout` segundos.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], sqlite3.Connection], max_size: int, timeout: float):
+        self.name = name
+        self._factory = factory
+        self._max_size = max(1, max_size)
+        self._timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._conn_generation: dict[int, int] = {}
+        # Métricas
+        self._opened = 0
+        self._borrowed = 0
+        self._borrow_count = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+
+    def acquire(self) -> sqlite3.Connection:
+        start = time.perf_counter()
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            open_new = False
+            with self._lock:
+                if self._opened < self._max_size:
+                    self._opened += 1
+                    open_new = True
+            if open_new:
+                try:
+                    conn = self._factory()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+                with self._lock:
+                    self._conn_generation[id(conn)] = self._generation
+            else:
+                try:
+                    conn = self._idle.get(timeout=self._timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(f"Pool '{self.name}' sem conexões livres após {self._timeout}s")
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._borrowed += 1
+            self._borrow_count += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._borrowed -= 1
+            stale = self._conn_generation.get(id(conn)) != self._generation
+            if stale:
+                self._conn_generation.pop(id(conn), None)
+                self._opened -= 1
+        if stale:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def lease(self) -> "PooledConnection":
+        """Conexão emprestada que volta ao pool em close() (compatível com o padrão conn.close())."""
+        return PooledConnection(self, self.acquire())
+
+    def reset(self):
+        """Descarta todas as conexões (ex: arquivo do banco foi trocado). Emprestadas são fechadas ao voltar."""
+        with self._lock:
+            self._generation += 1
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._conn_generation.pop(id(conn), None)
+                self._opened -= 1
+            conn.close()
+
+    def close(self):
+        self.reset()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            count = self._borrow_count
+            return {
+                "max_size": self._max_size,
+                "open": self._opened,
+                "borrowed": self._borrowed,
+                "idle": self._idle.qsize(),
+                "borrow_count": count,
+                "wait_avg_ms": round(self._wait_total / count * 1000, 3) if count else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+                "timeouts": self._timeouts,
+            }
+
+
+class PooledConnection:
+    """Proxy de uma conexão emprestada; `close()` devolve ao pool em vez de fechar."""
+
+    __slots__ = ("_pool", "_conn")
+
+    def __init__(self, pool: ConnectionPool, conn: sqlite3.Connection):
+        self._pool = pool
+        self._conn: Optional[sqlite3.Connection] = conn
+
+    def __getattr__(self, name: str) -> Any:
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(self._conn, name)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # Rede de segurança para caminhos de erro que não chamam close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+# ============================================================
+# ESCRITOR ÚNICO
+# ============================================================
+
+class SingleWriter:
+    """
+    Serializa todas as escritas de um banco numa thread dedicada.
+
+    `submit(fn)` enfileira `fn(conn)`, que roda dentro de uma transação
+    (commit no sucesso, rollback na exceção) e devolve o resultado para
+    quem chamou.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], sqlite3.Connection]):
+        self.name = name
+        self._factory = factory
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._opened = 0
+        self._executed = 0
+        self._failed = 0
+        self._busy = False
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("submit() chamado de dentro do próprio escritor")
+        self._ensure_started()
+        fut: Future = Future()
+        self._queue.put((fn, fut, time.perf_counter()))
+        return fut.result()
+
+    def _run(self):
+        conn = self._factory()
+        with self._stats_lock:
+            self._opened = 1
+        try:
+            while True:
+                fn, fut, enqueued = self._queue.get()
+                if fn is None:
+                    break
+                waited = time.perf_counter() - enqueued
+                with self._stats_lock:
+                    self._busy = True
+                    self._wait_total += waited
+                    self._wait_max = max(self._wait_max, waited)
+                try:
+                    with conn:
+                        result = fn(conn)
+                    fut.set_result(result)
+                    with self._stats_lock:
+                        self._executed += 1
+                except Exception as e:
+                    fut.set_exception(e)
+                    with self._stats_lock:
+                        self._failed += 1
+                finally:
+                    with self._stats_lock:
+                        self._busy = False
+        finally:
+            conn.close()
+            with self._stats_lock:
+                self._opened = 0
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put((None, None, 0.0))
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            total = self._executed + self._failed
+            return {
+                "open": self._opened,
+                "borrowed": 1 if self._busy else 0,
+                "queued": self._queue.qsize(),
+                "executed": self._executed,
+                "failed": self._failed,
+                "wait_avg_ms": round(self._wait_total / total * 1000, 3) if total else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+# ============================================================
+# FÁBRICAS DE CONEXÃO
+# ============================================================
+
+def _open_mhw_readonly() -> sqlite3.Connection:
+    if not os.path.exists(MHW_DB_PATH):
+        raise FileNotFoundError(f"Database not found at {MHW_DB_PATH}. Please ensure mhw.db is downloaded.")
+    uri = f"{Path(MHW_DB_PATH).resolve().as_uri()}?mode=ro&immutable=1"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    # Índice de nomes normalizados (core/mhw/name_index.py), se já montado
+    if os.path.exists(NAME_INDEX_PATH):
+        conn.execute("ATTACH DATABASE ? AS nameidx", (f"{Path(NAME_INDEX_PATH).resolve().as_uri()}?mode=ro",))
+    return conn
+
+
+def _open_sessions_reader() -> sqlite3.Connection:
+    conn = sqlite3.connect(SESSIONS_DB_PATH, check_same_thread=False, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only=1")
+    return conn
+
+
+def _open_sessions_writer() -> sqlite3.Connection:
+    conn = sqlite3.connect(SESSIONS_DB_PATH, check_same_thread=False, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# ============================================================
+# INSTÂNCIAS GLOBAIS
+# ============================================================
+
+_init_lock = threading.Lock()
+_mhw_pool: Optional[ConnectionPool] = None
+_sessions_pool: Optional[ConnectionPool] = None
+_sessions_writer: Optional[SingleWriter] = None
+
+
+def get_mhw_pool() -> ConnectionPool:
+    global _mhw_pool
+    if _mhw_pool is None:
+        with _init_lock:
+            if _mhw_pool is None:
+                _mhw_pool = ConnectionPool("mhw", _open_mhw_readonly, DB_POOL_SIZE, DB_POOL_TIMEOUT)
+    return _mhw_pool
+
+
+def get_sessions_pool() -> ConnectionPool:
+    global _sessions_pool
+    if _sessions_pool is None:
+        with _init_lock:
+            if _sessions_pool is None:
+                _sessions_pool = ConnectionPool("sessions", _open_sessions_reader, DB_POOL_SIZE, DB_POOL_TIMEOUT)
+    return _sessions_pool
+
+
+def get_sessions_writer() -> SingleWriter:
+    global _sessions_writer
+    if _sessions_writer is None:
+        with _init_lock:
+            if _sessions_writer is None:
+                _sessions_writer = SingleWriter("sessions", _open_sessions_writer)
+    return _sessions_writer
+
+
+# ============================================================
+# VERSÃO DO mhw.db
+# ============================================================
+
+_fingerprint_lock = threading.Lock()
+_mhw_stat: Optional[tuple] = None
+_mhw_hash: Optional[str] = None
+
+
+def mhw_db_fingerprint() -> str:
+    """
+    sha256 do conteúdo do mhw.db.
+
+    O hash só é recalculado quando (mtime, tamanho) muda. Nesse caso o pool
+    de leitura é resetado, já que conexões abertas com immutable=1 não
+    enxergam alterações no arquivo.
+    """
+    global _mhw_stat, _mhw_hash
+    st = os.stat(MHW_DB_PATH)
+    stat_key = (st.st_mtime_ns, st.st_size)
+    if stat_key == _mhw_stat and _mhw_hash is not None:
+        return _mhw_hash
+    with _fingerprint_lock:
+        if stat_key == _mhw_stat and _mhw_hash is not None:
+            return _mhw_hash
+        digest = hashlib.sha256()
+        with open(MHW_DB_PATH, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        changed = _mhw_hash is not None and _mhw_hash != digest.hexdigest()
+        _mhw_stat, _mhw_hash = stat_key, digest.hexdigest()
+    if changed and _mhw_pool is not None:
+        _mhw_pool.reset()
+    return _mhw_hash
+
+
+# ============================================================
+# EXECUTOR PARA TRABALHO BLOQUEANTE
+# ============================================================
+
+class BlockingExecutor:
+    """ThreadPoolExecutor limitado + contadores (em execução, na fila, espera)."""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db-blocking")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _call(self, fn: Callable[[], Any], submitted: float) -> Any:
+        waited = time.perf_counter() - submitted
+        with self._lock:
+            self._running += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+                self._completed += 1
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            self._pending += 1
+        call = functools.partial(self._call, functools.partial(fn, *args, **kwargs), time.perf_counter())
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "completed": self._completed,
+                "wait_avg_ms": round(self._wait_total / self._completed * 1000, 3) if self._completed else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+_executor: Optional[BlockingExecutor] = None
+
+
+def get_blocking_executor() -> BlockingExecutor:
+    global _executor
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                _executor = BlockingExecutor(DB_EXECUTOR_WORKERS)
+    return _executor
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Executa `fn(*args, **kwargs)` no executor de banco e aguarda o resultado."""
+    return await get_blocking_executor().run(fn, *args, **kwargs)
+
+
+def pool_metrics() -> dict:
+    """Snapshot das métricas de todos os pools já inicializados."""
+    metrics = {}
+    if _mhw_pool is not None:
+        metrics["mhw"] = _mhw_pool.metrics()
+    if _sessions_pool is not None:
+        metrics["sessions_read"] = _sessions_pool.metrics()
+    if _sessions_writer is not None:
+        metrics["sessions_write"] = _sessions_writer.metrics()
+    if _executor is not None:
+        metrics["blocking_executor"] = _executor.metrics()
+    return metrics
+
+
+def close_all_pools():
+    """Fecha todas as conexões e o executor (chamado no shutdown do app)."""
+    global _executor
+    if _executor is not None:
+        _executor.close()
+        _executor = None
+    for p in (_mhw_pool, _sessions_pool, _sessions_writer):
+        if p is not None:
+            p.close()
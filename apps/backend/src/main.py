@@ -20,6 +20,7 @@ _src_dir = str(Path(__file__).resolve().parent)
 if _src_dir not in sys.path:
     sys.path.insert(0, _src_dir)
 
+import asyncio
 from contextlib import asynccontextmanager
 
 import uvicorn  # type: ignore
@@ -28,7 +29,7 @@ from fastapi.responses import JSONResponse  # type: ignore
 from fastapi.middleware.cors import CORSMiddleware  # type: ignore
 from fastapi.staticfiles import StaticFiles  # type: ignore
 
-from core.config import HOST, PORT, ROOT_DIR
+from core.config import HOST, PORT, ROOT_DIR, NVIDIA_API_KEY
 from core.logging import log
 
 # Log do ambiente de inicialização
@@ -46,7 +47,14 @@ try:
     from api.routers.chat import router as chat_router, init_skill_caps
     from api.routers.monsters import router as monsters_router
     from api.routers.equipment import router as equipment_router
+    from api.routers.metrics import router as metrics_router
     from services.monster_service import get_all_monster_names, get_all_skill_caps
+    from services.catalog_service import get_catalog
+    from core.mhw.entity_matcher import get_entity_matcher
+    from core.mhw.name_index import ensure_name_index
+    from data.pool import close_all_pools
+    from services.llm_client import init_llm_client, close_llm_client
+    from core.mhw.mhw_rag import prewarm_query_embeddings
     log.info("All modules imported successfully.")
 except Exception as e:
     log.error(f"Failed to import modules: {e}")
@@ -55,8 +63,25 @@ except Exception as e:
 
 # --- App Lifecycle ---
 
+async def _prewarm_query_embeddings():
+    try:
+        computed = await prewarm_query_embeddings()
+        log.info(f"Lifespan: Query embedding cache warm ({computed} new embeddings).")
+    except Exception as e:
+        log.warning(f"Lifespan: Query embedding pre-warm skipped: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Índice de nomes primeiro, à parte do resto: sem ele os tools do chat caem para LIKE
+    try:
+        if ensure_name_index():
+            log.info("Lifespan: Name index ready.")
+        else:
+            log.warning("Lifespan: Name index unavailable; name lookups fall back to LIKE.")
+    except Exception as e:
+        log.warning(f"Lifespan: Name index build failed ({e}); name lookups fall back to LIKE.")
+
     try:
         log.info("Lifespan: Loading monster data...")
         all_monsters = get_all_monster_names()
@@ -65,10 +90,29 @@ async def lifespan(app: FastAPI):
         skill_caps = get_all_skill_caps()
         init_skill_caps(skill_caps)
         log.info(f"Lifespan: Loaded {len(skill_caps)} skill caps.")
+
+        catalog = get_catalog()
+        log.info(f"Lifespan: Equipment catalog ready (ETag {catalog.etag}).")
+
+        matcher = get_entity_matcher()
+        log.info(f"Lifespan: Entity matcher ready ({matcher.stats()['patterns']} patterns).")
     except Exception as e:
         log.error(f"Lifespan: Failed to load data: {e}")
         log.error(traceback.format_exc())
+
+    try:
+        init_llm_client()
+    except Exception as e:
+        # Sem API key o app sobe mesmo assim; o chat responde com o erro
+        log.warning(f"Lifespan: LLM client not initialized: {e}")
+
+    # Em segundo plano: não atrasa o startup (só faz rede na primeira vez)
+    prewarm_task = asyncio.create_task(_prewarm_query_embeddings()) if NVIDIA_API_KEY else None
     yield
+    if prewarm_task is not None:
+        prewarm_task.cancel()
+    await close_llm_client()
+    close_all_pools()
 
 
 # --- App Setup ---
@@ -102,6 +146,7 @@ async def global_exception_handler(request, exc):
 app.include_router(chat_router)
 app.include_router(monsters_router)
 app.include_router(equipment_router)
+app.include_router(metrics_router)
 
 
 # --- Static Files (Frontend) ---
@@ -126,6 +171,10 @@ def run_server():
 
 
 if __name__ == "__main__":
+    # Executável PyInstaller: os processos do loader do RAG (spawn) reentram aqui
+    import multiprocessing
+    multiprocessing.freeze_support()
+
     t = threading.Thread(target=run_server)
     t.daemon = True
     t.start()
@@ -0,0 +1,183 @@
+"""
+catalog_service.py — Snapshot em memória do catálogo de equipamento.
+
+O mhw.db é somente-leitura, então as cinco coleções do Build Builder
+(armas, armaduras, joias, amuletos e set bonuses) são montadas uma única
+vez (no startup ou no primeiro acesso) e os endpoints só filtram/paginam
+listas em memória.
+
+Cada snapshot carrega um ETag forte derivado do sha256 do mhw.db: enquanto
+o arquivo não muda o ETag é o mesmo e o frontend recebe 304. Quando o
+arquivo muda (mtime/tamanho), o snapshot é reconstruído no próximo acesso.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Optional
+
+from core.logging import log
+from core.mhw import name_index
+from core.mhw.mhw_api import get_db_connection
+from data.pool import mhw_db_fingerprint
+from services import equipment_service
+
+# Incrementar quando o formato das respostas mudar (invalida ETags antigos)
+CATALOG_FORMAT_VERSION = 1
+
+_RANK_RARITY = {'LR': (1, 4), 'HR': (5, 8), 'MR': (9, 12)}
+
+
+def _fold(text: Optional[str]) -> str:
+    return (text or "").casefold()
+
+
+class CatalogSnapshot:
+    """
+    Coleções prontas para servir + chaves de filtro pré-calculadas.
+
+    Cada coleção é uma lista de tuplas (item, chaves...) na ordem final da
+    resposta; os itens são os mesmos dicts devolvidos pelos endpoints.
+    """
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.etag = '"' + hashlib.sha256(f"{CATALOG_FORMAT_VERSION}:{fingerprint}".encode()).hexdigest()[:32] + '"'
+        self.built_at = time.time()
+        self.build_ms = 0.0
+        # (item, type, element_folded, rarity)
+        self.weapons: list[tuple] = []
+        # (item, type, rank, search_key)
+        self.armor: list[tuple] = []
+        # (item, search_key)
+        self.decorations: list[tuple] = []
+        self.charms: list[tuple] = []
+        self.set_bonuses: list[dict] = []
+
+    @classmethod
+    def build(cls, fingerprint: str) -> "CatalogSnapshot":
+        start = time.perf_counter()
+        snap = cls(fingerprint)
+        conn = get_db_connection()
+        try:
+            weapons = equipment_service.list_weapons(conn, limit=-1)["items"]
+            armor = equipment_service.list_armor(conn, limit=-1)["items"]
+            decorations = equipment_service.list_decorations(conn, limit=-1)["items"]
+            charms = equipment_service.list_charms(conn, limit=-1)["items"]
+            set_bonuses = equipment_service.list_set_bonuses(conn)["items"]
+        finally:
+            conn.close()
+
+        snap.weapons = [
+            (
+                w,
+                w["type"],
+                _fold(w["element"]["type"]) if w["element"] else "",
+                w["rarity"],
+            )
+            for w in weapons
+        ]
+        snap.armor = [(a, a["type"], a["rank"], _fold(a["name"])) for a in armor]
+        snap.decorations = [(d, _fold(d["name"])) for d in decorations]
+        snap.charms = [(c, _fold(c["name"])) for c in charms]
+        snap.set_bonuses = set_bonuses
+        snap.build_ms = round((time.perf_counter() - start) * 1000, 1)
+        return snap
+
+    # ------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------
+
+    def weapons_page(self, type=None, element=None, rank=None, search=None, limit=200, offset=0) -> dict:
+        element = _fold(element) if element else None
+        rarity_range = _RANK_RARITY.get(rank.upper(), (1, 12)) if rank else None
+        # Busca por nome (pt/en, sem acento/caixa) resolvida pelo índice de nomes
+        ids = name_index.search_ids('weapon', search) if search else None
+
+        matches = [
+            w for w, w_type, w_element, rarity in self.weapons
+            if (not type or w_type == type)
+            and (element is None or w_element == element)
+            and (rarity_range is None or rarity_range[0] <= rarity <= rarity_range[1])
+            and (ids is None or w["id"] in ids)
+        ]
+        return {"items": matches[offset:offset + limit], "total": len(matches), "offset": offset}
+
+    def armor_page(self, type=None, rank=None, search=None, limit=100, offset=0) -> dict:
+        rank = rank.upper() if rank else None
+        s = _fold(search) if search else None
+
+        matches = [
+            a for a, a_type, a_rank, key in self.armor
+            if (not type or a_type == type)
+            and (rank is None or a_rank == rank)
+            and (s is None or s in key)
+        ]
+        return {"items": matches[offset:offset + limit], "total": len(matches), "offset": offset}
+
+    @staticmethod
+    def _search_page(entries: list[tuple], search: Optional[str], limit: int) -> dict:
+        s = _fold(search) if search else None
+        matches = [item for item, key in entries if s is None or s in key]
+        return {"items": matches[:limit], "total": len(matches)}
+
+    def decorations_page(self, search=None, limit=500) -> dict:
+        return self._search_page(self.decorations, search, limit)
+
+    def charms_page(self, search=None, limit=500) -> dict:
+        return self._search_page(self.charms, search, limit)
+
+    def set_bonuses_all(self) -> dict:
+        return {"items": self.set_bonuses, "total": len(self.set_bonuses)}
+
+
+# ============================================================
+# Snapshot global
+# ============================================================
+
+_lock = threading.Lock()
+_snapshot: Optional[CatalogSnapshot] = None
+_stats = {"builds": 0, "hits": 0, "not_modified": 0}
+
+
+def get_catalog() -> CatalogSnapshot:
+    """Snapshot atual; reconstrói se o mhw.db mudou desde a última montagem."""
+    global _snapshot
+    fingerprint = mhw_db_fingerprint()
+    snap = _snapshot
+    if snap is not None and snap.fingerprint == fingerprint:
+        return snap
+    with _lock:
+        if _snapshot is None or _snapshot.fingerprint != fingerprint:
+            name_index.ensure_name_index()
+            _snapshot = CatalogSnapshot.build(fingerprint)
+            _stats["builds"] += 1
+            log.info(
+                f"Catalog: snapshot montado em {_snapshot.build_ms}ms "
+                f"({len(_snapshot.weapons)} armas, {len(_snapshot.armor)} armaduras, "
+                f"{len(_snapshot.decorations)} joias, {len(_snapshot.charms)} amuletos)"
+            )
+        return _snapshot
+
+
+def record_request(not_modified: bool):
+    _stats["not_modified" if not_modified else "hits"] += 1
+
+
+def catalog_metrics() -> dict:
+    snap = _snapshot
+    metrics = dict(_stats)
+    if snap is not None:
+        metrics.update({
+            "etag": snap.etag,
+            "build_ms": snap.build_ms,
+            "built_at": snap.built_at,
+            "sizes": {
+                "weapons": len(snap.weapons),
+                "armor": len(snap.armor),
+                "decorations": len(snap.decorations),
+                "charms": len(snap.charms),
+                "set_bonuses": len(snap.set_bonuses),
+            },
+        })
+    return metrics
@@ -5,16 +5,30 @@ Contém o middleware anti-alucinação, construção do prompt do sistema,
 e orquestração da chamada à LLM.
 """
 
+import asyncio
 import re
 import json
-from typing import Optional, List
+import statistics
+import time
+from collections import deque
+from typing import AsyncIterator, NamedTuple, Optional, List
 
 import httpx  # type: ignore
-from openai import AsyncOpenAI  # type: ignore
+from openai import APITimeoutError  # type: ignore
 
-from core.config import NVIDIA_API_KEY, LLM_BASE_URL, LLM_MODEL, LLM_TIMEOUT, LLM_TEMPERATURE, LLM_MAX_TOKENS, GREETINGS
-from data.db import get_user_config, set_user_config, add_message, get_chat_messages, update_chat_title
+from core.config import (
+    LLM_MODEL, LLM_TEMPERATURE, LLM_MAX_TOKENS, GREETINGS, RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_SIMILARITY,
+)
+from data.db import get_user_config, set_user_config, add_turn
 from core.mhw.mhw_tools import get_armor_details, get_weapon_details
+from core.mhw.entity_matcher import find_entities, longest_non_overlapping
+from core.mhw.context_assembler import estimate_tokens
+from core.logging import log
+from services.llm_client import get_llm_client
+from services.llm_scheduler import QueueFullError, ScheduledTurn, get_llm_scheduler
+from services.response_cache import get_response_cache, turn_fingerprint
+from services.history_manager import load_history, schedule_summary_update, summary_message
+from data.pool import run_blocking
 
 
 # --- Anti-Hallucination Middleware ---
@@ -102,88 +116,119 @@ def _auto_detect_mr(user_message: str):
         except (ValueError, TypeError):
             pass
 
-def _extract_and_verify_equipment(context: str, user_query: str = "") -> str:
-    """Extrai nomes de equipamentos do contexto RAG e da query do usuário para busca SQL."""
-    # 1. Extração do contexto RAG
-    armor_pieces = re.findall(r'> PEÇA:\s*(.*?)\s*\(', context)
-    armor_sets = re.findall(r'===\s*(?:SET|CONJUNTO) DE ARMADURA:\s*(.*?)\s*(?:===|\[)', context)
-    weapons = re.findall(r'===\s*ARMA:\s*(.*?)\s*\(', context)
-    
-    if not armor_pieces:
-        armor_pieces = re.findall(r'> PEÇA:\s*(.*?)$', context, re.MULTILINE)
+def _format_armor(details: dict) -> str:
+    skills_str = ", ".join([f"{s['name']} Lv{s['points']}" for s in details['skills']])
+    slots_str = f"Slots: {details['slots']}" if details['slots'] else "Sem slots"
+    return f"ARMADURA: {details['name']} -> {skills_str} | {slots_str}"
+
+
+def _format_weapon(details: dict) -> str:
+    slots_str = f"Slots: {details['slots']}" if details['slots'] else "Sem slots"
+    stats_str = f"Ataque: {details['attack']} | Afinidade: {details['affinity']} | Elemento: {details['element']}"
+    monstro_str = f" | Monstro: {details['monstro']}" if details.get("monstro") else ""
+    return f"ARMA: {details['name_pt']} ({details['name_en']}) | TIPO: {details['type_pt']} ({details['type_en']}){monstro_str} | {stats_str} | {slots_str}"
+
+
+class QueryLookups(NamedTuple):
+    """Consultas SQL que dependem só da mensagem do usuário (não do RAG)."""
+    user_pieces: list
+    user_weapons: list
+    proactive_terms: list
+    proactive_entries: list  # (nome, linha formatada) da busca proativa elemento + tipo
+    armor: dict              # nome -> get_armor_details(nome)
+    weapons: dict            # nome -> get_weapon_details(nome)
+
 
-    # 1.5. Extração da query do usuário (Build Exportada)
+def _lookup_user_query(user_query: str) -> QueryLookups:
+    """
+    Resolve no mhw.db tudo o que a mensagem do usuário cita. Não depende do
+    contexto RAG, então roda em paralelo com a recuperação.
+    """
+    # Extração da query do usuário (Build Exportada)
     # Padrão: "Cintura: Nome da Peça [Skills]" ou "Elmo: Nome"
     user_pieces = re.findall(r'(?:Elmo|Peito|Braços|Cintura|Pernas|Waist|Head|Chest|Arms|Legs):\s*(.*?)(?:\s*\[|$)', user_query)
     user_weapons = re.findall(r'Arma:\s*(.*?)(?:\r?\n|$)', user_query, re.IGNORECASE)
 
-    # 2. Busca Proativa baseada na mensagem do usuário
-    from core.mhw.mhw_tools import MONSTER_TREE_MAP, MONSTER_EQUIPMENT_MAP, ELEMENT_MAP, WEAPON_MAP, search_equipment
-    
-    query_lower = user_query.lower()
-    proactive_search_terms = []
-    
-    # Detecção de Monstros
-    for monster in MONSTER_TREE_MAP.keys():
-        if monster in query_lower:
-            proactive_search_terms.append(monster)
-            
-    # Detecção de Elemento e Tipo de Arma para busca global
-    detected_element = None
-    for k, v in ELEMENT_MAP.items():
-        if k in query_lower:
-            detected_element = v
-            break
-            
-    detected_type = None
-    for k, v in WEAPON_MAP.items():
-        if k in query_lower:
-            detected_type = v
-            break
-    
-    verified_entries = []
-    seen_names = set()
+    # Busca Proativa baseada na mensagem do usuário
+    from core.mhw.mhw_tools import search_equipment
+
+    # Uma passada do matcher compartilhado detecta monstros, elemento, tipo de arma e nomes de equipamento
+    mentions = find_entities(user_query)
+    proactive_terms = list(dict.fromkeys(m.key for m in mentions if m.kind == "monster_tree"))
+    detected_element = next((m.value for m in mentions if m.kind == "element"), None)
+    detected_type = next((m.value for m in mentions if m.kind == "weapon_type"), None)
+
+    # Nomes completos de peças/armas citados literalmente na mensagem. Usa o
+    # padrão que casou: os spans são de user_query.lower(), que pode ter outro
+    # tamanho (ex: "İ" vira 2 caracteres), então fatiar user_query desalinharia
+    named = longest_non_overlapping([m for m in mentions if m.kind in ("armor_name", "weapon_name")])
+    user_pieces += [m.key for m in named if m.kind == "armor_name"]
+    user_weapons += [m.key for m in named if m.kind == "weapon_name"]
 
     # Se detectou Elemento + Tipo, faz busca proativa global
+    proactive_entries = []
     if detected_element and detected_type:
         proactive_results_json = search_equipment(element=detected_element, piece_type=detected_type, category="weapon")
         if proactive_results_json and not proactive_results_json.startswith("Nenhum"):
             try:
-                proactive_results = json.loads(proactive_results_json)
-                for res in proactive_results:
-                    name = res["name_pt"]
-                    if name not in seen_names:
-                        slots_str = f"Slots: {res['slots']}" if res['slots'] else "Sem slots"
-                        stats_str = f"Ataque: {res['attack']} | Afinidade: {res['affinity']} | Elemento: {res['element']}"
-                        monstro_str = f" | Monstro: {res['monstro']}" if res.get("monstro") else ""
-                        verified_entries.append(f"ARMA: {res['name_pt']} ({res['name_en']}) | TIPO: {res['type_pt']} ({res['type_en']}){monstro_str} | {stats_str} | {slots_str}")
-                        seen_names.add(name)
+                for res in json.loads(proactive_results_json):
+                    slots_str = f"Slots: {res['slots']}" if res['slots'] else "Sem slots"
+                    stats_str = f"Ataque: {res['attack']} | Afinidade: {res['affinity']} | Elemento: {res['element']}"
+                    monstro_str = f" | Monstro: {res['monstro']}" if res.get("monstro") else ""
+                    proactive_entries.append((
+                        res["name_pt"],
+                        f"ARMA: {res['name_pt']} ({res['name_en']}) | TIPO: {res['type_pt']} ({res['type_en']}){monstro_str} | {stats_str} | {slots_str}",
+                    ))
             except:
                 pass
 
+    armor = {name: get_armor_details(name) for name in dict.fromkeys(user_pieces + proactive_terms)}
+    weapons = {name: get_weapon_details(name) for name in dict.fromkeys(user_weapons + proactive_terms)}
+    return QueryLookups(user_pieces, user_weapons, proactive_terms, proactive_entries, armor, weapons)
+
+
+def _extract_and_verify_equipment(context: str, user_query: str = "", lookups: Optional[QueryLookups] = None) -> str:
+    """
+    Extrai nomes de equipamentos do contexto RAG e da query do usuário para busca SQL.
+    `lookups` é o resultado de _lookup_user_query já calculado (senão é feito aqui).
+    """
+    if lookups is None:
+        lookups = _lookup_user_query(user_query)
+
+    # Extração do contexto RAG
+    armor_pieces = re.findall(r'> PEÇA:\s*(.*?)\s*\(', context)
+    armor_sets = re.findall(r'===\s*(?:SET|CONJUNTO) DE ARMADURA:\s*(.*?)\s*(?:===|\[)', context)
+    weapons = re.findall(r'===\s*ARMA:\s*(.*?)\s*\(', context)
+
+    if not armor_pieces:
+        armor_pieces = re.findall(r'> PEÇA:\s*(.*?)$', context, re.MULTILINE)
+
+    verified_entries = []
+    seen_names = set()
+
+    for name, entry in lookups.proactive_entries:
+        if name not in seen_names:
+            verified_entries.append(entry)
+            seen_names.add(name)
+
     # Combinamos tudo para verificar outros itens citados ou encontrados via RAG
-    search_list = list(dict.fromkeys(armor_sets + armor_pieces + user_pieces + proactive_search_terms))
+    search_list = list(dict.fromkeys(armor_sets + armor_pieces + lookups.user_pieces + lookups.proactive_terms))
 
     # Processar Armaduras
     for name in search_list:
         if name in seen_names: continue
-        details = get_armor_details(name)
+        details = lookups.armor[name] if name in lookups.armor else get_armor_details(name)
         if details:
-            skills_str = ", ".join([f"{s['name']} Lv{s['points']}" for s in details['skills']])
-            slots_str = f"Slots: {details['slots']}" if details['slots'] else "Sem slots"
-            verified_entries.append(f"ARMADURA: {details['name']} -> {skills_str} | {slots_str}")
+            verified_entries.append(_format_armor(details))
             seen_names.add(name)
 
     # Processar Armas encontradas no RAG ou Termos Proativos ou Query
-    weapon_search_list = list(dict.fromkeys(weapons + user_weapons + proactive_search_terms))
+    weapon_search_list = list(dict.fromkeys(weapons + lookups.user_weapons + lookups.proactive_terms))
     for name in weapon_search_list:
         if name in seen_names: continue
-        details = get_weapon_details(name)
+        details = lookups.weapons[name] if name in lookups.weapons else get_weapon_details(name)
         if details:
-            slots_str = f"Slots: {details['slots']}" if details['slots'] else "Sem slots"
-            stats_str = f"Ataque: {details['attack']} | Afinidade: {details['affinity']} | Elemento: {details['element']}"
-            monstro_str = f" | Monstro: {details['monstro']}" if details.get("monstro") else ""
-            verified_entries.append(f"ARMA: {details['name_pt']} ({details['name_en']}) | TIPO: {details['type_pt']} ({details['type_en']}){monstro_str} | {stats_str} | {slots_str}")
+            verified_entries.append(_format_weapon(details))
             seen_names.add(name)
 
     if not verified_entries:
@@ -192,41 +237,13 @@ def _extract_and_verify_equipment(context: str, user_query: str = "") -> str:
     return "\n[!!!] DADOS TÉCNICOS VERIFICADOS (SQL - FONTE DE VERDADE ABSOLUTA) [!!!]\n" + "\n".join(verified_entries) + "\n--------------------------------------------------------------\n"
 
 
-async def process_chat(
+def _build_system_instruction(
     user_message: str,
-    chat_id: str,
+    local_context: str,
     skill_caps: dict,
-    get_rag_context_fn,
-) -> dict:
-    """
-    Processa uma mensagem de chat completa.
-
-    Args:
-        user_message: Mensagem do usuário.
-        chat_id: ID do chat.
-        skill_caps: Limites de nível de skills.
-        get_rag_context_fn: Função assíncrona para obter contexto RAG.
-
-    Returns:
-        {"response": str, "chat_id": str}
-    """
-    # Carregar histórico
-    history = []
-    try:
-        history = get_chat_messages(chat_id)
-    except Exception:
-        pass
-
-    # Obter contexto RAG
-    local_context = ""
-    try:
-        local_context = await get_rag_context_fn(user_message, history=history)
-    except Exception:
-        pass
-
-    # Auto-update MR
-    _auto_detect_mr(user_message)
-
+    lookups: Optional[QueryLookups],
+) -> str:
+    """Prompt do sistema (análise de build ou fluxo normal) + dados SQL verificados."""
     # 9.5: Detect exported build data from Builder
     is_build_export = "📋 BUILD EXPORTADA" in user_message or "===[ BUILD EXPORTADA ]===" in user_message
 
@@ -263,7 +280,7 @@ async def process_chat(
 
     if has_data:
         # Enriquecimento com SQL (passando a query do usuário para busca proativa)
-        sql_verified_data = _extract_and_verify_equipment(local_context, user_message)
+        sql_verified_data = _extract_and_verify_equipment(local_context, user_message, lookups)
         # Substitui o placeholder ou limpa se estiver vazio
         if sql_verified_data:
             system_instruction = system_instruction.replace("{sql_verified_data}", sql_verified_data + "\n")
@@ -272,38 +289,363 @@ async def process_chat(
         
         system_instruction = _inject_personality(system_instruction)
 
-    # LLM Call
-    client = AsyncOpenAI(
-        base_url=LLM_BASE_URL,
-        api_key=NVIDIA_API_KEY,
-        timeout=httpx.Timeout(LLM_TIMEOUT)
+    return system_instruction
+
+
+# ============================================================
+# Pipeline do turno
+# ============================================================
+
+_STAGE_WINDOW = 200
+_stage_history: dict[str, deque] = {}
+_prompt_tokens: deque = deque(maxlen=_STAGE_WINDOW)  # estimativa de tokens por turno
+
+
+class TurnTimings:
+    """Duração (ms) de cada etapa de um turno de chat."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: dict[str, float] = {}
+
+    async def measure(self, stage: str, awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.stages[stage] = (time.perf_counter() - started) * 1000
+
+    def record(self, stage: str, started: float):
+        self.stages[stage] = (time.perf_counter() - started) * 1000
+
+    def finish(self, label: str):
+        self.stages["total"] = (time.perf_counter() - self.start) * 1000
+        for stage, ms in self.stages.items():
+            _stage_history.setdefault(stage, deque(maxlen=_STAGE_WINDOW)).append(ms)
+        log.info(f"{label}: " + " | ".join(f"{stage} {ms:.0f}ms" for stage, ms in self.stages.items()))
+
+
+def chat_stage_metrics() -> dict:
+    """p50/p95 por etapa nos últimos turnos."""
+    metrics = {}
+    for stage, values in list(_stage_history.items()):
+        ordered = sorted(values)
+        if ordered:
+            metrics[stage] = {
+                "count": len(ordered),
+                "p50_ms": round(statistics.median(ordered), 1),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+            }
+    return metrics
+
+
+def _log_prompt_tokens(system_instruction: str, history: list[dict], user_message: str):
+    """Estimativa local de tokens do prompt do turno, por parte."""
+    parts = {
+        "system": estimate_tokens(system_instruction),
+        "history": sum(estimate_tokens(m["content"]) for m in history),
+        "user": estimate_tokens(user_message),
+    }
+    total = sum(parts.values())
+    _prompt_tokens.append(total)
+    log.info(f"Prompt: ~{total} tokens (sistema {parts['system']}, histórico {parts['history']}, pergunta {parts['user']})")
+
+
+def prompt_token_metrics() -> dict:
+    """p50/p95/máx da estimativa de tokens do prompt nos últimos turnos."""
+    ordered = sorted(_prompt_tokens)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "p50": int(statistics.median(ordered)),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+async def _prepare_turn(
+    user_message: str,
+    chat_id: str,
+    skill_caps: dict,
+    get_rag_context_fn,
+    timings: TurnTimings,
+) -> list[dict]:
+    """
+    Monta as mensagens enviadas à LLM (system + resumo + janela do
+    histórico + pergunta; ver history_manager). Compartilhado entre
+    process_chat e stream_chat.
+
+    As consultas SQL da mensagem do usuário começam junto com o turno e
+    correm em paralelo com histórico + RAG; todo acesso ao SQLite roda no
+    executor de banco (run_blocking), fora do event loop.
+    """
+    sql_task = asyncio.create_task(timings.measure("sql_query", run_blocking(_lookup_user_query, user_message)))
+    mr_task = asyncio.create_task(run_blocking(_auto_detect_mr, user_message))
+
+    # Carregar histórico: janela recente literal + resumo do que veio antes
+    history: list = []
+    summary: Optional[str] = None
+    try:
+        history, summary = await timings.measure("history", run_blocking(load_history, chat_id))
+    except Exception:
+        pass
+
+    # Obter contexto RAG
+    local_context = ""
+    try:
+        local_context = await timings.measure("rag", get_rag_context_fn(user_message, history=history))
+    except Exception:
+        pass
+
+    lookups: Optional[QueryLookups] = None
+    try:
+        lookups = await sql_task
+    except Exception as e:
+        log.warning(f"Chat: verificação SQL da mensagem falhou: {e}")
+    await asyncio.gather(mr_task, return_exceptions=True)
+
+    # Prompt + verificação SQL dos nomes vindos do RAG
+    system_instruction = await timings.measure(
+        "prompt", run_blocking(_build_system_instruction, user_message, local_context, skill_caps, lookups)
     )
 
-    sanitized_history = [{"role": msg["role"], "content": msg["content"]} for msg in history]
+    sanitized_history = summary_message(summary) + [{"role": msg["role"], "content": msg["content"]} for msg in history]
+    _log_prompt_tokens(system_instruction, sanitized_history, user_message)
+    return [
+        {"role": "system", "content": system_instruction},
+        *sanitized_history,
+        {"role": "user", "content": user_message},
+    ]
+
+
+class CachedTurn(NamedTuple):
+    """Resultado da consulta ao cache de respostas para um turno."""
+    fingerprint: str
+    embedding: Optional[list]
+    response: Optional[str]  # None = não estava em cache
+
+
+async def _lookup_response(user_message: str, messages: list[dict], use_cache: bool, timings: TurnTimings) -> Optional[CachedTurn]:
+    """
+    Consulta o cache de respostas com o contexto já montado (prompt do
+    sistema + resumo e janela do histórico). None quando o cache está desligado ou o request pediu bypass.
+    """
+    if not (use_cache and RESPONSE_CACHE_ENABLED):
+        return None
+    started = time.perf_counter()
+    user_mr = await run_blocking(get_user_config, "mr", 1)
+    # Prompt do sistema + diálogo (resumo e janela): perguntas que dependem da
+    # conversa ("explique melhor") não reaproveitam a resposta de outro chat
+    fingerprint = turn_fingerprint(
+        messages[0]["content"], messages[1:-1], user_mr, LLM_MODEL, LLM_TEMPERATURE, LLM_MAX_TOKENS
+    )
+
+    embedding = None
+    if RESPONSE_CACHE_SIMILARITY > 0:
+        # O prompt é a primeira query do RAG: o embedding já está no cache de queries
+        try:
+            from core.mhw.query_embedder import embed_model_ready, embed_queries
+            if embed_model_ready():
+                embedding = (await embed_queries([user_message]))[0]
+        except Exception as e:
+            log.warning(f"Chat: embedding para o cache de respostas falhou: {e}")
 
     try:
-        completion = await client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": system_instruction},
-                *sanitized_history,
-                {"role": "user", "content": user_message}
-            ],
-            temperature=LLM_TEMPERATURE,
-            max_tokens=LLM_MAX_TOKENS
-        )
-        response_text = completion.choices[0].message.content
+        response = await run_blocking(get_response_cache().get, user_message, fingerprint, embedding)
+    except Exception as e:
+        log.warning(f"Chat: leitura do cache de respostas falhou: {e}")
+        response = None
+    timings.record("cache", started)
+    return CachedTurn(fingerprint, embedding, response)
+
+
+async def _store_response(turn: Optional[CachedTurn], user_message: str, response_text: str):
+    if turn is None or not response_text:
+        return
+    try:
+        await run_blocking(get_response_cache().put, user_message, turn.fingerprint, response_text, turn.embedding)
+    except Exception as e:
+        log.warning(f"Chat: gravação no cache de respostas falhou: {e}")
+
 
-        # Save to DB
-        if chat_id:
-            add_message(chat_id, "user", user_message)
-            add_message(chat_id, "assistant", response_text)
-            if not get_chat_messages(chat_id):
-                update_chat_title(chat_id, user_message[:30])
+def _persist_turn(chat_id: str, user_message: str, response_text: str):
+    """Grava a pergunta e a resposta final no histórico do chat (uma transação; título no 1º turno)."""
+    if not chat_id:
+        return
+    add_turn(chat_id, user_message, response_text)
 
-        return {"response": response_text, "chat_id": chat_id}
 
-    except httpx.TimeoutException:
-        raise TimeoutError("Timeout da API.")
+async def process_chat(
+    user_message: str,
+    chat_id: str,
+    skill_caps: dict,
+    get_rag_context_fn,
+    use_cache: bool = True,
+    scheduled: Optional[ScheduledTurn] = None,
+) -> dict:
+    """
+    Processa uma mensagem de chat completa.
+
+    Args:
+        user_message: Mensagem do usuário.
+        chat_id: ID do chat.
+        skill_caps: Limites de nível de skills.
+        get_rag_context_fn: Função assíncrona para obter contexto RAG.
+        use_cache: False ignora o cache de respostas (não lê nem grava).
+        scheduled: Turno já admitido no scheduler da LLM (o router admite
+            antes para responder 503); None = admite aqui.
+
+    Returns:
+        {"response": str, "chat_id": str, "cached": bool}
+
+    Raises:
+        QueueFullError: fila da LLM cheia.
+    """
+    scheduled = scheduled or get_llm_scheduler().admit(chat_id)
+    timings = TurnTimings()
+    async with scheduled:
+        timings.record("queue", timings.start)
+        messages = await _prepare_turn(user_message, chat_id, skill_caps, get_rag_context_fn, timings)
+
+        turn = await _lookup_response(user_message, messages, use_cache, timings)
+        if turn is not None and turn.response is not None:
+            await timings.measure("persist", run_blocking(_persist_turn, chat_id, user_message, turn.response))
+            schedule_summary_update(chat_id)
+            timings.finish("Chat turn (cache)")
+            return {"response": turn.response, "chat_id": chat_id, "cached": True}
+
+        client = get_llm_client()
+
+        try:
+            slot_started = time.perf_counter()
+            async with scheduled.llm_slot():
+                timings.record("llm_slot", slot_started)
+                completion = await timings.measure("llm", client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=messages,
+                    temperature=LLM_TEMPERATURE,
+                    max_tokens=LLM_MAX_TOKENS
+                ))
+            response_text = completion.choices[0].message.content
+
+            # Save to DB
+            await timings.measure("persist", run_blocking(_persist_turn, chat_id, user_message, response_text))
+            await _store_response(turn, user_message, response_text)
+            schedule_summary_update(chat_id)
+            timings.finish("Chat turn")
+
+            return {"response": response_text, "chat_id": chat_id, "cached": False}
+
+        except (httpx.TimeoutException, APITimeoutError):
+            raise TimeoutError("Timeout da API.")
+        except Exception as e:
+            raise RuntimeError(str(e))
+
+
+async def stream_chat(
+    user_message: str,
+    chat_id: str,
+    skill_caps: dict,
+    get_rag_context_fn,
+    use_cache: bool = True,
+    scheduled: Optional[ScheduledTurn] = None,
+) -> AsyncIterator[dict]:
+    """
+    Variante em streaming de process_chat.
+
+    Gera eventos na ordem em que a LLM produz os tokens:
+        {"delta": str}                                  — trecho da resposta
+        {"done": True, "chat_id": str, "cached": bool}  — fim; resposta já gravada no histórico
+        {"error": str, "status": int}                   — falha (503 fila cheia, 504 timeout, 500 demais)
+
+    Com a resposta no cache, ela sai inteira num único delta. A mensagem do
+    assistente só é persistida depois que o stream termina sem erro, com o
+    texto completo. A vaga na LLM fica ocupada até o fim do stream. Loga o
+    time-to-first-token.
+    """
+    if scheduled is None:
+        try:
+            scheduled = get_llm_scheduler().admit(chat_id)
+        except QueueFullError as e:
+            yield {"error": str(e), "status": 503, "retry_after": e.retry_after}
+            return
+
+    timings = TurnTimings()
+    async with scheduled:
+        timings.record("queue", timings.start)
+        async for event in _stream_turn(user_message, chat_id, skill_caps, get_rag_context_fn, use_cache, scheduled, timings):
+            yield event
+
+
+async def _stream_turn(
+    user_message: str,
+    chat_id: str,
+    skill_caps: dict,
+    get_rag_context_fn,
+    use_cache: bool,
+    scheduled: ScheduledTurn,
+    timings: TurnTimings,
+) -> AsyncIterator[dict]:
+    """Corpo de stream_chat, já na vez do chat."""
+    parts: list[str] = []
+    first_token: Optional[float] = None
+    try:
+        messages = await _prepare_turn(user_message, chat_id, skill_caps, get_rag_context_fn, timings)
+        turn = await _lookup_response(user_message, messages, use_cache, timings)
+        prepared = time.perf_counter()
+    except Exception as e:
+        log.error(f"Chat stream: {e}")
+        yield {"error": str(e), "status": 500}
+        return
+
+    if turn is not None and turn.response is not None:
+        yield {"delta": turn.response}
+        await timings.measure("persist", run_blocking(_persist_turn, chat_id, user_message, turn.response))
+        schedule_summary_update(chat_id)
+        timings.finish("Chat stream (cache)")
+        yield {"done": True, "chat_id": chat_id, "cached": True}
+        return
+
+    try:
+        client = get_llm_client()
+        async with scheduled.llm_slot():
+            timings.record("llm_slot", prepared)
+            stream = await client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=messages,
+                temperature=LLM_TEMPERATURE,
+                max_tokens=LLM_MAX_TOKENS,
+                stream=True,
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    timings.record("llm_first_token", prepared)
+                    log.info(
+                        f"Chat stream: TTFT {(first_token - timings.start) * 1000:.0f}ms "
+                        f"(preparo {(prepared - timings.start) * 1000:.0f}ms, LLM {(first_token - prepared) * 1000:.0f}ms)"
+                    )
+                parts.append(delta)
+                yield {"delta": delta}
+    except (httpx.TimeoutException, APITimeoutError):
+        log.warning("Chat stream: timeout da API.")
+        yield {"error": "Timeout da API.", "status": 504}
+        return
     except Exception as e:
-        raise RuntimeError(str(e))
+        log.error(f"Chat stream: {e}")
+        yield {"error": str(e), "status": 500}
+        return
+
+    timings.record("llm", prepared)
+    response_text = "".join(parts)
+    await timings.measure("persist", run_blocking(_persist_turn, chat_id, user_message, response_text))
+    await _store_response(turn, user_message, response_text)
+    schedule_summary_update(chat_id)
+    timings.finish(f"Chat stream ({len(parts)} chunks)")
+    yield {"done": True, "chat_id": chat_id, "cached": False}
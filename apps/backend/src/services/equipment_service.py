@@ -0,0 +1,421 @@
+"""
+equipment_service.py — Consultas de equipamento para o Build Builder.
+
+Cada listagem roda a query principal da página e depois busca nomes,
+skills e set bonuses de TODAS as linhas de uma vez (IN (...) + JOIN com
+fallback pt→en via COALESCE), montando o resultado em Python.
+Assim o número de queries por request é constante, não proporcional ao
+número de linhas.
+"""
+
+from typing import Iterable, Optional
+
+from core.mhw import name_index
+
+
+# Limite seguro de parâmetros por statement (SQLITE_MAX_VARIABLE_NUMBER antigo = 999)
+_IN_CHUNK = 500
+
+
+# ============================================================
+# Helpers de lote
+# ============================================================
+
+def _chunks(ids: list) -> Iterable[list]:
+    for i in range(0, len(ids), _IN_CHUNK):
+        yield ids[i:i + _IN_CHUNK]
+
+
+def _placeholders(values: list) -> str:
+    return ",".join("?" * len(values))
+
+
+def _unique(values: Iterable) -> list:
+    return list(dict.fromkeys(v for v in values if v))
+
+
+def fetch_names(conn, table: str, ids: Iterable[int]) -> dict:
+    """{id -> nome} de uma tabela *_text, preferindo pt e caindo para en."""
+    ids = _unique(ids)
+    names: dict = {}
+    for chunk in _chunks(ids):
+        rows = conn.execute(f"""
+            SELECT b.id, COALESCE(pt.name, en.name) AS name
+            FROM (SELECT DISTINCT id FROM {table} WHERE id IN ({_placeholders(chunk)})) b
+            LEFT JOIN {table} pt ON pt.id = b.id AND pt.lang_id = 'pt'
+            LEFT JOIN {table} en ON en.id = b.id AND en.lang_id = 'en'
+        """, chunk).fetchall()
+        for r in rows:
+            names[r['id']] = r['name']
+    return names
+
+
+def fetch_names_by_lang(conn, table: str, ids: Iterable[int]) -> dict:
+    """{id -> (nome_pt, nome_en)} de uma tabela *_text (None onde faltar)."""
+    ids = _unique(ids)
+    names: dict = {}
+    for chunk in _chunks(ids):
+        rows = conn.execute(f"""
+            SELECT id, lang_id, name FROM {table}
+            WHERE id IN ({_placeholders(chunk)}) AND lang_id IN ('pt', 'en')
+        """, chunk).fetchall()
+        for r in rows:
+            pt, en = names.get(r['id'], (None, None))
+            if r['lang_id'] == 'pt':
+                pt = r['name']
+            else:
+                en = r['name']
+            names[r['id']] = (pt, en)
+    return names
+
+
+def fetch_skill_texts(conn, skilltree_ids: Iterable[int]) -> dict:
+    """{skilltree_id -> {"name", "description"}} com fallback pt→en."""
+    ids = _unique(skilltree_ids)
+    texts: dict = {}
+    for chunk in _chunks(ids):
+        rows = conn.execute(f"""
+            SELECT b.id,
+                   COALESCE(pt.name, en.name) AS name,
+                   COALESCE(pt.description, en.description) AS description
+            FROM (SELECT DISTINCT id FROM skilltree_text WHERE id IN ({_placeholders(chunk)})) b
+            LEFT JOIN skilltree_text pt ON pt.id = b.id AND pt.lang_id = 'pt'
+            LEFT JOIN skilltree_text en ON en.id = b.id AND en.lang_id = 'en'
+        """, chunk).fetchall()
+        for r in rows:
+            texts[r['id']] = {"name": r['name'], "description": r['description'] or ""}
+    return texts
+
+
+def fetch_owned_skills(conn, link_table: str, owner_col: str, owner_ids: Iterable[int]) -> dict:
+    """
+    {owner_id -> [{"name", "level"}]} para tabelas de ligação como
+    armor_skill (armor_id) e charm_skill (charm_id).
+    """
+    ids = _unique(owner_ids)
+    skills: dict = {}
+    for chunk in _chunks(ids):
+        rows = conn.execute(f"""
+            SELECT l.{owner_col} AS owner_id, l.level, COALESCE(pt.name, en.name) AS name
+            FROM {link_table} l
+            LEFT JOIN skilltree_text pt ON pt.id = l.skilltree_id AND pt.lang_id = 'pt'
+            LEFT JOIN skilltree_text en ON en.id = l.skilltree_id AND en.lang_id = 'en'
+            WHERE l.{owner_col} IN ({_placeholders(chunk)})
+            ORDER BY l.rowid
+        """, chunk).fetchall()
+        for r in rows:
+            if r['name'] is None:
+                continue
+            skills.setdefault(r['owner_id'], []).append({"name": r['name'], "level": r['level']})
+    return skills
+
+
+def fetch_set_bonus_tiers(conn, bonus_ids: Iterable[int]) -> dict:
+    """{setbonus_id -> [{"required", "skill", "description"}]} ordenado por peças necessárias."""
+    ids = _unique(bonus_ids)
+    tiers: dict = {}
+    for chunk in _chunks(ids):
+        rows = conn.execute(f"""
+            SELECT abs.setbonus_id, abs.required,
+                   COALESCE(pt.name, en.name) AS skill_name,
+                   COALESCE(pt.description, en.description) AS description
+            FROM armorset_bonus_skill abs
+            LEFT JOIN skilltree_text pt ON pt.id = abs.skilltree_id AND pt.lang_id = 'pt'
+            LEFT JOIN skilltree_text en ON en.id = abs.skilltree_id AND en.lang_id = 'en'
+            WHERE abs.setbonus_id IN ({_placeholders(chunk)})
+            ORDER BY abs.setbonus_id, abs.required
+        """, chunk).fetchall()
+        for r in rows:
+            if r['skill_name'] is None:
+                continue
+            tiers.setdefault(r['setbonus_id'], []).append({
+                "required": r['required'],
+                "skill": r['skill_name'],
+                "description": r['description'] or "",
+            })
+    return tiers
+
+
+def _slots(row) -> list:
+    return [s for s in [row['slot_1'], row['slot_2'], row['slot_3']] if s and s > 0]
+
+
+# ============================================================
+# Weapons
+# ============================================================
+
+def list_weapons(
+    conn,
+    type: Optional[str] = None,
+    element: Optional[str] = None,
+    rank: Optional[str] = None,
+    search: Optional[str] = None,
+    limit: int = 200,
+    offset: int = 0,
+) -> dict:
+    params: list = []
+    conditions = []
+    if type:
+        conditions.append("w.weapon_type = ?")
+        params.append(type)
+    if element:
+        conditions.append("LOWER(w.element1) = LOWER(?)")
+        params.append(element)
+    if rank:
+        # HR/LR vs MR based on rarity
+        rank_map = {'LR': (1, 4), 'HR': (5, 8), 'MR': (9, 12)}
+        r = rank_map.get(rank.upper(), (1, 12))
+        conditions.append("w.rarity BETWEEN ? AND ?")
+        params.extend(r)
+    if search:
+        # Nome pt ou en, sem acento/caixa, via índice de nomes (trigram)
+        ids_sql, ids_params = name_index.ids_matching_sql(conn, 'weapon', search)
+        conditions.append(f"w.id IN ({ids_sql})")
+        params.extend(ids_params)
+
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+    query = f"""
+        SELECT w.id, w.weapon_type, w.rarity, w.attack, w.attack_true,
+               w.affinity, w.defense, w.element1, w.element1_attack, w.element_hidden,
+               w.elderseal, w.slot_1, w.slot_2, w.slot_3, w.sharpness,
+               w.final, w.armorset_bonus_id, w.category
+        FROM weapon w
+        {where_clause}
+        ORDER BY w.rarity DESC, w.attack DESC
+        LIMIT ? OFFSET ?
+    """
+    weapons = conn.execute(query, params + [limit, offset]).fetchall()
+    total = conn.execute(f"SELECT COUNT(*) FROM weapon w {where_clause}", params).fetchone()[0]
+
+    names = fetch_names_by_lang(conn, 'weapon_text', (w['id'] for w in weapons))
+
+    results = []
+    for w in weapons:
+        pt_name, en_name = names.get(w['id'], (None, None))
+
+        name = pt_name or en_name
+
+        # Manual Fix: Mapear Noite mais Escura se encontrarmos Deepest Night
+        if en_name == "Deepest Night" and not pt_name:
+            name = "Noite mais Escura"
+
+        results.append({
+            "id": w['id'],
+            "name": name,
+            "name_en": en_name,
+            "type": w['weapon_type'],
+            "rarity": w['rarity'],
+            "attack": w['attack'],
+            "attack_true": w['attack_true'],
+            "affinity": w['affinity'],
+            "defense": w['defense'] or 0,
+            "element": {"type": w['element1'], "damage": w['element1_attack'], "hidden": bool(w['element_hidden'])} if w['element1'] else None,
+            "elderseal": w['elderseal'],
+            "slots": _slots(w),
+            "is_final": bool(w['final']),
+            "armorset_bonus_id": w['armorset_bonus_id'],
+            "category": w['category'],
+        })
+
+    return {"items": results, "total": total, "offset": offset}
+
+
+# ============================================================
+# Armor
+# ============================================================
+
+def list_armor(
+    conn,
+    type: Optional[str] = None,
+    rank: Optional[str] = None,
+    search: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+) -> dict:
+    conditions = ["at.lang_id = 'pt'"]
+    params: list = []
+
+    if type:
+        conditions.append("a.armor_type = ?")
+        params.append(type)
+    if rank:
+        conditions.append("a.rank = ?")
+        params.append(rank.upper())
+    if search:
+        conditions.append("at.name LIKE ?")
+        params.append(f"%{search}%")
+
+    where = " AND ".join(conditions)
+
+    query = f"""
+        SELECT a.id, at.name, a.armor_type, a.rank, a.rarity,
+               a.defense_base, a.defense_max, a.defense_augment_max,
+               a.fire, a.water, a.thunder, a.ice, a.dragon,
+               a.slot_1, a.slot_2, a.slot_3,
+               a.armorset_id, a.armorset_bonus_id
+        FROM armor a
+        JOIN armor_text at ON a.id = at.id
+        WHERE {where}
+        ORDER BY a.rarity DESC, a.defense_base DESC
+        LIMIT ? OFFSET ?
+    """
+    params.extend([limit, offset])
+    armors = conn.execute(query, params).fetchall()
+
+    # Lote: skills, nomes de set, nomes e tiers de bônus da página inteira
+    skills_by_armor = fetch_owned_skills(conn, "armor_skill", "armor_id", (a['id'] for a in armors))
+    set_names = fetch_names(conn, "armorset_text", (a['armorset_id'] for a in armors))
+    bonus_ids = [a['armorset_bonus_id'] for a in armors]
+    bonus_names = fetch_names(conn, "armorset_bonus_text", bonus_ids)
+    bonus_tiers = fetch_set_bonus_tiers(conn, bonus_ids)
+
+    results = []
+    for a in armors:
+        bonus_id = a['armorset_bonus_id']
+        results.append({
+            "id": a['id'],
+            "name": a['name'],
+            "type": a['armor_type'],
+            "rank": a['rank'],
+            "rarity": a['rarity'],
+            "set_name": set_names.get(a['armorset_id']),
+            "set_bonus_name": bonus_names.get(bonus_id),
+            "set_bonus_tiers": [
+                {"required": t['required'], "skill": t['skill']} for t in bonus_tiers.get(bonus_id, [])
+            ],
+            "defense": {"base": a['defense_base'], "max": a['defense_max']},
+            "resistances": {
+                "fire": a['fire'], "water": a['water'], "thunder": a['thunder'],
+                "ice": a['ice'], "dragon": a['dragon']
+            },
+            "slots": _slots(a),
+            "skills": skills_by_armor.get(a['id'], []),
+        })
+
+    return {"items": results, "total": len(results), "offset": offset}
+
+
+# ============================================================
+# Decorations
+# ============================================================
+
+def list_decorations(conn, search: Optional[str] = None, limit: int = 500) -> dict:
+    conditions = ["dt.lang_id = 'pt'"]
+    params: list = []
+
+    if search:
+        conditions.append("dt.name LIKE ?")
+        params.append(f"%{search}%")
+
+    where = " AND ".join(conditions)
+
+    query = f"""
+        SELECT d.id, dt.name, d.slot, d.rarity,
+               d.skilltree_id, d.skilltree_level,
+               d.skilltree2_id, d.skilltree2_level
+        FROM decoration d
+        JOIN decoration_text dt ON d.id = dt.id
+        WHERE {where}
+        ORDER BY d.slot DESC, dt.name
+        LIMIT ?
+    """
+    params.append(limit)
+    decos = conn.execute(query, params).fetchall()
+
+    skill_ids = [d['skilltree_id'] for d in decos] + [d['skilltree2_id'] for d in decos]
+    skill_texts = fetch_skill_texts(conn, skill_ids)
+
+    results = []
+    for d in decos:
+        skills = []
+        # Primary skill + secondary (rare, e.g. Expert+ Jewel 4)
+        for st_id, level in [(d['skilltree_id'], d['skilltree_level']), (d['skilltree2_id'], d['skilltree2_level'])]:
+            info = skill_texts.get(st_id) if st_id else None
+            if info and info['name']:
+                skills.append({"name": info['name'], "level": level, "description": info['description']})
+
+        results.append({
+            "id": d['id'],
+            "name": d['name'],
+            "tier": d['slot'],
+            "rarity": d['rarity'],
+            "skills": skills,
+        })
+
+    return {"items": results, "total": len(results)}
+
+
+# ============================================================
+# Charms
+# ============================================================
+
+def list_charms(conn, search: Optional[str] = None, limit: int = 500) -> dict:
+    conditions = ["ct.lang_id = 'pt'"]
+    params: list = []
+
+    if search:
+        conditions.append("ct.name LIKE ?")
+        params.append(f"%{search}%")
+
+    where = " AND ".join(conditions)
+
+    query = f"""
+        SELECT c.id, ct.name, c.rarity
+        FROM charm c
+        JOIN charm_text ct ON c.id = ct.id
+        WHERE {where}
+        ORDER BY c.rarity DESC, ct.name
+        LIMIT ?
+    """
+    params.append(limit)
+    charms = conn.execute(query, params).fetchall()
+
+    skills_by_charm = fetch_owned_skills(conn, "charm_skill", "charm_id", (c['id'] for c in charms))
+
+    results = [
+        {
+            "id": ch['id'],
+            "name": ch['name'],
+            "rarity": ch['rarity'],
+            "skills": skills_by_charm.get(ch['id'], []),
+        }
+        for ch in charms
+    ]
+
+    return {"items": results, "total": len(results)}
+
+
+# ============================================================
+# Set bonuses
+# ============================================================
+
+def list_set_bonuses(conn) -> dict:
+    bonuses = conn.execute("""
+        SELECT b.id, COALESCE(pt.name, en.name) AS name
+        FROM (SELECT DISTINCT id FROM armorset_bonus_text) b
+        LEFT JOIN armorset_bonus_text pt ON pt.id = b.id AND pt.lang_id = 'pt'
+        LEFT JOIN armorset_bonus_text en ON en.id = b.id AND en.lang_id = 'en'
+        WHERE COALESCE(pt.name, en.name) IS NOT NULL
+        ORDER BY name
+    """).fetchall()
+
+    tiers_by_bonus = fetch_set_bonus_tiers(conn, (b['id'] for b in bonuses))
+
+    results = [
+        {
+            "id": b['id'],
+            "set_name": b['name'],
+            "pieces": [
+                {
+                    "required": t['required'],
+                    "bonus_name": t['skill'],
+                    "description": t['description'],
+                }
+                for t in tiers_by_bonus.get(b['id'], [])
+            ],
+        }
+        for b in bonuses
+    ]
+
+    return {"items": results, "total": len(results)}
@@ -0,0 +1,145 @@
+"""
+history_manager.py — Janela do histórico do chat + resumo incremental.
+
+Mandar todas as mensagens do chat para a LLM a cada turno faz o prompt
+crescer sem limite. Aqui o histórico vira:
+
+  - janela: os últimos CHAT_HISTORY_MAX_TURNS turnos, literais, enquanto
+    couberem em CHAT_HISTORY_TOKEN_BUDGET tokens (estimate_tokens). Só as
+    mensagens da janela são lidas do banco (get_chat_messages com limit).
+  - resumo: o que ficou antes da janela, resumido pela LLM e guardado em
+    sessions.db (chat_summaries). `covered_until` marca a última mensagem
+    já incorporada.
+
+O resumo é atualizado depois do turno, fora do caminho da resposta
+(`schedule_summary_update`): as mensagens entre `covered_until` e o início
+da janela (no máximo CHAT_SUMMARY_BATCH por vez) são dobradas no resumo
+anterior. Até a atualização terminar, o turno seguinte usa o resumo antigo.
+"""
+
+import asyncio
+from typing import NamedTuple, Optional
+
+from core.config import (
+    LLM_MODEL, CHAT_HISTORY_MAX_TURNS, CHAT_HISTORY_TOKEN_BUDGET, CHAT_SUMMARY_MAX_TOKENS, CHAT_SUMMARY_BATCH,
+)
+from core.logging import log
+from core.mhw.context_assembler import estimate_tokens
+from data.db import get_chat_messages, get_chat_summary, set_chat_summary
+from data.pool import run_blocking
+
+_SUMMARY_INSTRUCTION = (
+    "Você resume conversas entre um caçador e um assistente de Monster Hunter World Iceborne.\n"
+    "Atualize o resumo com as novas mensagens. Mantenha: rank (MR/HR) e arma do usuário, monstros "
+    "em foco, builds, peças e skills discutidas, decisões tomadas e perguntas em aberto. "
+    "Descarte saudações e repetições. Responda só com o resumo, em português, em tópicos curtos."
+)
+
+
+class History(NamedTuple):
+    messages: list[dict]    # janela literal, em ordem cronológica
+    summary: Optional[str]  # resumo do que veio antes da janela
+
+
+def _window(recent: list[dict]) -> list[dict]:
+    """Sufixo de `recent` que cabe no orçamento, começando numa pergunta do usuário."""
+    window: list[dict] = []
+    tokens = 0
+    for msg in reversed(recent[-CHAT_HISTORY_MAX_TURNS * 2:]):
+        cost = estimate_tokens(msg["content"])
+        if window and tokens + cost > CHAT_HISTORY_TOKEN_BUDGET:
+            break
+        window.append(msg)
+        tokens += cost
+    window.reverse()
+    # Não começar com uma resposta solta: ela vai para o resumo junto com a pergunta
+    while window and window[0]["role"] != "user":
+        window.pop(0)
+    return window
+
+
+def load_history(chat_id: str) -> History:
+    """Janela + resumo para montar o prompt do turno (bloqueante: use run_blocking)."""
+    recent = get_chat_messages(chat_id, limit=CHAT_HISTORY_MAX_TURNS * 2)
+    stored = get_chat_summary(chat_id)
+    return History(_window(recent), stored["summary"] if stored else None)
+
+
+def summary_message(summary: Optional[str]) -> list[dict]:
+    """Mensagem de sistema com o resumo (vazia se não há resumo)."""
+    if not summary:
+        return []
+    return [{"role": "system", "content": f"RESUMO DA CONVERSA ATÉ AQUI (mensagens antigas):\n{summary}"}]
+
+
+# ============================================================
+# Atualização do resumo
+# ============================================================
+
+_updating: set[str] = set()
+_tasks: set[asyncio.Task] = set()
+
+
+def _pending_messages(chat_id: str) -> tuple[Optional[dict], list[dict]]:
+    """(resumo atual, mensagens antes da janela ainda fora do resumo)."""
+    recent = get_chat_messages(chat_id, limit=CHAT_HISTORY_MAX_TURNS * 2)
+    window = _window(recent)
+    if not window:
+        return None, []
+    stored = get_chat_summary(chat_id)
+    after = stored["covered_until"] if stored else None
+    pending = get_chat_messages(chat_id, before=window[0]["timestamp"], after=after)
+    return stored, pending[:CHAT_SUMMARY_BATCH]
+
+
+async def update_summary(chat_id: str) -> bool:
+    """Dobra no resumo as mensagens que saíram da janela. Retorna se atualizou."""
+    from services.llm_client import get_llm_client
+    from services.llm_scheduler import get_llm_scheduler
+
+    stored, pending = await run_blocking(_pending_messages, chat_id)
+    if not pending:
+        return False
+
+    transcript = "\n".join(
+        f"{'Usuário' if m['role'] == 'user' else 'Assistente'}: {m['content']}" for m in pending
+    )
+    previous = stored["summary"] if stored else "(sem resumo ainda)"
+    # Divide as vagas da LLM com os turnos (sem passar pela admissão)
+    async with get_llm_scheduler().llm_slot():
+        completion = await get_llm_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=[
+                {"role": "system", "content": _SUMMARY_INSTRUCTION},
+                {"role": "user", "content": f"RESUMO ATUAL:\n{previous}\n\nNOVAS MENSAGENS:\n{transcript}"},
+            ],
+            temperature=0.2,
+            max_tokens=CHAT_SUMMARY_MAX_TOKENS,
+        )
+    summary = (completion.choices[0].message.content or "").strip()
+    if not summary:
+        return False
+
+    count = (stored["message_count"] if stored else 0) + len(pending)
+    await run_blocking(set_chat_summary, chat_id, summary, pending[-1]["timestamp"], count)
+    log.info(f"Histórico: resumo do chat {chat_id[:8]} atualizado (+{len(pending)} mensagens, {count} no total)")
+    return True
+
+
+async def _run_update(chat_id: str):
+    try:
+        await update_summary(chat_id)
+    except Exception as e:
+        log.warning(f"Histórico: falha ao atualizar o resumo do chat {chat_id[:8]}: {e}")
+    finally:
+        _updating.discard(chat_id)
+
+
+def schedule_summary_update(chat_id: str):
+    """Atualiza o resumo em segundo plano (uma atualização por chat de cada vez)."""
+    if not chat_id or chat_id in _updating:
+        return
+    _updating.add(chat_id)
+    task = asyncio.create_task(_run_update(chat_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
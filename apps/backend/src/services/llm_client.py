@@ -0,0 +1,183 @@
+"""
+llm_client.py — Cliente da LLM compartilhado pelo processo inteiro.
+
+Um único AsyncOpenAI sobre um httpx.AsyncClient criado no lifespan do
+FastAPI (main.py) e fechado no shutdown. Assim as conexões TLS com a API
+são reaproveitadas entre turnos de chat em vez de um handshake por request.
+
+- Pool: LLM_MAX_CONNECTIONS conexões, até LLM_MAX_KEEPALIVE ociosas por
+  LLM_KEEPALIVE_EXPIRY segundos.
+- HTTP/2 quando o pacote `h2` está instalado (LLM_HTTP2=0 desliga).
+- Retry/backoff: o próprio SDK repete (backoff exponencial com jitter,
+  respeitando Retry-After) erros de conexão, 408, 409, 429 e 5xx até
+  LLM_MAX_RETRIES vezes.
+
+Os event hooks do httpx alimentam `llm_client_metrics()`: conexões novas x
+requests (taxa de reuso), versão HTTP, tentativas repetidas e latência até
+os headers da resposta.
+"""
+
+import importlib.util
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import httpx  # type: ignore
+from openai import AsyncOpenAI  # type: ignore
+
+from core.config import (
+    NVIDIA_API_KEY, LLM_BASE_URL, LLM_TIMEOUT, LLM_CONNECT_TIMEOUT,
+    LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE, LLM_KEEPALIVE_EXPIRY,
+    LLM_HTTP2, LLM_MAX_RETRIES,
+)
+from core.logging import log
+
+_LATENCY_WINDOW = 500
+
+
+class LLMClientMetrics:
+    """Contadores do cliente HTTP da LLM (thread-safe, baratos de atualizar)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.retries = 0
+        self.errors = 0
+        self.status: dict[int, int] = {}
+        self.http_versions: dict[str, int] = {}
+        self._latencies: deque = deque(maxlen=_LATENCY_WINDOW)
+
+    def record_connect(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def record_request(self, request: httpx.Request):
+        with self._lock:
+            self.requests += 1
+            # O SDK marca as repetições com x-stainless-retry-count
+            if request.headers.get("x-stainless-retry-count", "0") != "0":
+                self.retries += 1
+
+    def record_response(self, response: httpx.Response, latency_ms: float):
+        with self._lock:
+            self.status[response.status_code] = self.status.get(response.status_code, 0) + 1
+            self.http_versions[response.http_version] = self.http_versions.get(response.http_version, 0) + 1
+            if response.status_code >= 400:
+                self.errors += 1
+            self._latencies.append(latency_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            reused = max(0, self.requests - self.new_connections)
+            data = {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_requests": reused,
+                "reuse_rate": round(reused / self.requests, 3) if self.requests else 0.0,
+                "retries": self.retries,
+                "error_responses": self.errors,
+                "status": dict(self.status),
+                "http_versions": dict(self.http_versions),
+            }
+        if latencies:
+            data["latency_ms"] = {
+                "count": len(latencies),
+                "p50": round(statistics.median(latencies), 1),
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+                "max": round(latencies[-1], 1),
+            }
+        return data
+
+
+_metrics = LLMClientMetrics()
+_client: Optional[AsyncOpenAI] = None
+_http2 = False
+
+
+def _http2_available() -> bool:
+    return LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+async def _on_request(request: httpx.Request):
+    _metrics.record_request(request)
+    request.extensions["mhw_started"] = time.perf_counter()
+
+    # Trace do httpcore: só dispara connect_tcp quando abre conexão nova
+    async def trace(event: str, info: dict):
+        if event == "connection.connect_tcp.complete":
+            _metrics.record_connect()
+
+    request.extensions["trace"] = trace
+
+
+async def _on_response(response: httpx.Response):
+    started = response.request.extensions.get("mhw_started")
+    latency_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+    _metrics.record_response(response, latency_ms)
+
+
+def _build_client() -> AsyncOpenAI:
+    global _http2
+    _http2 = _http2_available()
+    if LLM_HTTP2 and not _http2:
+        log.warning("LLM client: pacote 'h2' ausente; usando HTTP/1.1.")
+
+    http_client = httpx.AsyncClient(
+        http2=_http2,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        event_hooks={"request": [_on_request], "response": [_on_response]},
+    )
+    return AsyncOpenAI(
+        base_url=LLM_BASE_URL,
+        api_key=NVIDIA_API_KEY,
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        max_retries=LLM_MAX_RETRIES,
+        http_client=http_client,
+    )
+
+
+def init_llm_client() -> AsyncOpenAI:
+    """Cria o cliente compartilhado (chamado no startup do app)."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+        log.info(
+            f"LLM client: {LLM_BASE_URL} (HTTP/{'2' if _http2 else '1.1'}, "
+            f"{LLM_MAX_CONNECTIONS} conexões, {LLM_MAX_RETRIES} retries)"
+        )
+    return _client
+
+
+def get_llm_client() -> AsyncOpenAI:
+    """Cliente compartilhado; criado sob demanda fora do app (scripts)."""
+    return _client if _client is not None else init_llm_client()
+
+
+async def close_llm_client():
+    """Fecha o pool de conexões (chamado no shutdown do app)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def llm_client_metrics() -> dict:
+    data = _metrics.snapshot()
+    data.update({
+        "base_url": LLM_BASE_URL,
+        "http2": _http2,
+        "active": _client is not None,
+        "max_connections": LLM_MAX_CONNECTIONS,
+        "max_keepalive": LLM_MAX_KEEPALIVE,
+        "max_retries": LLM_MAX_RETRIES,
+    })
+    return data
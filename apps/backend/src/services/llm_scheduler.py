@@ -0,0 +1,227 @@
+"""
+llm_scheduler.py — Controle de admissão e concorrência das chamadas à LLM.
+
+Sem controle, um pico de usuários vira um pico de requests de até 60s no
+endpoint da NVIDIA e volta como 429/timeouts. O scheduler fica na frente
+de toda chamada à LLM do processo:
+
+  - Admissão (`admit`): o turno entra na fila ou é recusado na hora
+    (QueueFullError → HTTP 503 com Retry-After) quando já há
+    LLM_QUEUE_MAX turnos esperando. A recusa acontece antes do RAG, então
+    custa quase nada.
+  - FIFO por chat: turnos do mesmo chat rodam um de cada vez, na ordem em
+    que chegaram (asyncio.Lock acorda os waiters em ordem). A pergunta 2 só
+    monta o histórico depois que a resposta 1 foi gravada.
+  - Concorrência: no máximo LLM_MAX_CONCURRENCY chamadas à LLM em voo
+    (`llm_slot`), inclusive o stream inteiro e os resumos do histórico.
+
+`llm_scheduler_metrics()` expõe profundidade da fila, chamadas ativas,
+recusas e p50/p95 da espera (fila do chat e slot da LLM).
+
+Uso num turno:
+    turn = get_llm_scheduler().admit(chat_id)   # pode levantar QueueFullError
+    async with turn:                            # vez do chat (FIFO)
+        ...                                     # histórico, RAG, cache
+        async with turn.llm_slot():             # vaga na LLM
+            ...
+"""
+
+import asyncio
+import math
+import statistics
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from core.config import LLM_MAX_CONCURRENCY, LLM_QUEUE_MAX, LLM_QUEUE_RETRY_AFTER
+
+_WINDOW = 500
+_MAX_RETRY_AFTER = 60
+
+
+class QueueFullError(RuntimeError):
+    """Fila da LLM cheia; `retry_after` é a sugestão de espera em segundos."""
+
+    def __init__(self, queued: int, retry_after: int):
+        super().__init__(f"Fila da LLM cheia ({queued} turnos esperando). Tente de novo em {retry_after}s.")
+        self.queued = queued
+        self.retry_after = retry_after
+
+
+def _percentiles(values) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        "max_ms": round(ordered[-1], 1),
+    }
+
+
+class ScheduledTurn:
+    """Um turno admitido. Conta na fila até começar a chamada à LLM ou terminar."""
+
+    def __init__(self, scheduler: "LLMScheduler", chat_id: str):
+        self._scheduler = scheduler
+        self.chat_id = chat_id
+        self.admitted = time.perf_counter()
+        self._queued = True
+        self._entered = False
+        self._released = False
+
+    def _leave_queue(self):
+        if self._queued:
+            self._queued = False
+            self._scheduler.queued -= 1
+
+    async def __aenter__(self) -> "ScheduledTurn":
+        started = time.perf_counter()
+        try:
+            await self._scheduler._chat_lock(self.chat_id).acquire()
+        except BaseException:
+            # Cancelado na fila do chat (cliente desconectou): devolve o lugar
+            self._scheduler._release_chat(self.chat_id, locked=False)
+            self.release()
+            raise
+        self._entered = True
+        self._scheduler._chat_waits.append((time.perf_counter() - started) * 1000)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+    @asynccontextmanager
+    async def llm_slot(self) -> AsyncIterator[None]:
+        """Vaga de chamada à LLM para este turno (sai da fila ao conseguir)."""
+        async with self._scheduler.llm_slot():
+            self._leave_queue()
+            yield
+
+    def release(self):
+        """Libera a vez do chat e a posição na fila (idempotente)."""
+        if self._released:
+            return
+        self._released = True
+        self._leave_queue()
+        self._scheduler.completed += 1
+        if self._entered:
+            self._scheduler._release_chat(self.chat_id)
+
+    def __del__(self):
+        # Rede de segurança: turno admitido cujo stream nunca começou
+        try:
+            if not self._released and not self._entered:
+                self.release()
+        except Exception:
+            pass
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int, max_queue: int, retry_after: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = max(1, retry_after)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._chats: dict[str, list] = {}  # chat_id -> [asyncio.Lock, turnos usando]
+        self.queued = 0
+        self.active = 0
+        self.peak_queued = 0
+        self.peak_active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self._chat_waits: deque = deque(maxlen=_WINDOW)
+        self._slot_waits: deque = deque(maxlen=_WINDOW)
+        self._durations: deque = deque(maxlen=_WINDOW)
+
+    # --- FIFO por chat ---
+
+    def _chat_lock(self, chat_id: str) -> asyncio.Lock:
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            entry = self._chats[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _release_chat(self, chat_id: str, locked: bool = True):
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            return
+        if locked:
+            entry[0].release()
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._chats[chat_id]
+
+    # --- Admissão ---
+
+    def estimate_retry_after(self) -> int:
+        """Segundos até a fila andar: fila / concorrência × duração mediana de uma chamada."""
+        if not self._durations:
+            return self.retry_after
+        median_s = statistics.median(self._durations) / 1000
+        rounds = self.queued / self.max_concurrency + 1
+        return max(1, min(_MAX_RETRY_AFTER, math.ceil(rounds * median_s)))
+
+    def admit(self, chat_id: str) -> ScheduledTurn:
+        """Reserva um lugar na fila ou levanta QueueFullError (não espera)."""
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(self.queued, self.estimate_retry_after())
+        self.queued += 1
+        self.admitted += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        return ScheduledTurn(self, chat_id)
+
+    # --- Concorrência ---
+
+    @asynccontextmanager
+    async def llm_slot(self) -> AsyncIterator[None]:
+        """Uma das LLM_MAX_CONCURRENCY vagas de chamada à LLM."""
+        started = time.perf_counter()
+        async with self._semaphore:
+            acquired = time.perf_counter()
+            self._slot_waits.append((acquired - started) * 1000)
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            try:
+                yield
+            finally:
+                self.active -= 1
+                self._durations.append((time.perf_counter() - acquired) * 1000)
+
+    def metrics(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "peak_active": self.peak_active,
+            "peak_queued": self.peak_queued,
+            "chats_in_flight": len(self._chats),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "retry_after_s": self.estimate_retry_after(),
+            "chat_wait": _percentiles(self._chat_waits),
+            "slot_wait": _percentiles(self._slot_waits),
+            "llm_call": _percentiles(self._durations),
+        }
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Scheduler do processo (criado no primeiro uso, dentro do event loop)."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(LLM_MAX_CONCURRENCY, LLM_QUEUE_MAX, LLM_QUEUE_RETRY_AFTER)
+    return _scheduler
+
+
+def llm_scheduler_metrics() -> dict:
+    return get_llm_scheduler().metrics()
@@ -0,0 +1,228 @@
+"""
+response_cache.py — Cache persistente de respostas do chat.
+
+Muita gente pergunta a mesma coisa ("fraquezas do Rathalos", "build de
+katana gelo MR"). Quando a pergunta normalizada e o contexto do turno são
+os mesmos, a resposta da LLM é reaproveitada e a geração é pulada.
+
+- Chave: sha1(pergunta normalizada + fingerprint do contexto)
+- Fingerprint (`turn_fingerprint`): hash do prompt do sistema (contexto
+  RAG recuperado + bloco verificado por SQL), do diálogo enviado junto
+  (resumo + janela do histórico), MR do usuário, modelo, temperatura e
+  max_tokens. Mudou o índice, o mhw.db, o perfil ou a conversa, muda a
+  chave: um "explique melhor" só reaproveita resposta da mesma conversa.
+- Quase-duplicatas (opcional): guarda o embedding da pergunta; sem acerto
+  exato, procura entre as respostas com o mesmo fingerprint a de maior
+  cosseno >= RESPONSE_CACHE_SIMILARITY.
+- Expiração: TTL (RESPONSE_CACHE_TTL) e LRU por `last_used` acima de
+  RESPONSE_CACHE_SIZE entradas.
+
+Persistido em data/response_cache.db, ao lado do sessions.db.
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Optional, Sequence
+
+from core.config import (
+    RESPONSE_CACHE_PATH, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIMILARITY,
+)
+from core.mhw.embedding_cache import normalize_query
+
+
+def turn_fingerprint(
+    system_prompt: str,
+    history: Sequence[dict],
+    user_mr,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+) -> str:
+    """
+    Hash de tudo, além da pergunta, que determina a resposta da LLM.
+    `history`: mensagens entre o prompt do sistema e a pergunta (resumo + janela).
+    """
+    h = hashlib.sha1()
+    for part in (system_prompt, str(user_mr), model, repr(temperature), str(max_tokens)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    for msg in history:
+        h.update(f"{msg['role']}\0{msg['content']}\1".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _key(prompt: str, fingerprint: str) -> str:
+    return hashlib.sha1(f"{fingerprint}\0{normalize_query(prompt)}".encode("utf-8")).hexdigest()
+
+
+def _to_blob(vector: Optional[Sequence[float]]) -> Optional[bytes]:
+    if not vector:
+        return None
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return array("f", (v / norm for v in vector)).tobytes()
+
+
+def _from_blob(blob: bytes) -> array:
+    values = array("f")
+    values.frombytes(blob)
+    return values
+
+
+class ResponseCache:
+    def __init__(self, path: str, max_size: int, ttl: float, similarity: float):
+        self.path = path
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    prompt TEXT NOT NULL,
+                    embedding BLOB,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_fingerprint ON responses(fingerprint)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+            self._conn = conn
+        return self._conn
+
+    def _touch(self, conn: sqlite3.Connection, key: str):
+        conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        conn.commit()
+
+    def get(self, prompt: str, fingerprint: str, embedding: Optional[Sequence[float]] = None) -> Optional[str]:
+        """
+        Resposta em cache para `prompt` com este contexto. Com `embedding`,
+        aceita também uma pergunta quase igual (mesmo fingerprint).
+        """
+        key = _key(prompt, fingerprint)
+        oldest = time.time() - self.ttl
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] >= oldest:
+                self._touch(conn, key)
+                self.hits += 1
+                return row[0]
+            if row is not None:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+                self.expired += 1
+
+            query = _to_blob(embedding) if self.similarity > 0 else None
+            if query is not None:
+                target = _from_blob(query)
+                best_key, best_response, best_score = None, None, self.similarity
+                for other_key, blob, response in conn.execute(
+                    "SELECT key, embedding, response FROM responses "
+                    "WHERE fingerprint = ? AND embedding IS NOT NULL AND created_at >= ?",
+                    (fingerprint, oldest),
+                ):
+                    vector = _from_blob(blob)
+                    if len(vector) != len(target):
+                        continue
+                    score = sum(a * b for a, b in zip(target, vector))
+                    if score >= best_score:
+                        best_key, best_response, best_score = other_key, response, score
+                if best_key is not None:
+                    self._touch(conn, best_key)
+                    self.near_hits += 1
+                    return best_response
+
+            self.misses += 1
+            return None
+
+    def put(self, prompt: str, fingerprint: str, response: str, embedding: Optional[Sequence[float]] = None):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, fingerprint, prompt, embedding, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (_key(prompt, fingerprint), fingerprint, normalize_query(prompt), _to_blob(embedding), response, now, now),
+            )
+            self.expired += conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)).rowcount
+            count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_size:
+                excess = count - self.max_size
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self.evicted += excess
+            conn.commit()
+            self.stored += 1
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def metrics(self) -> dict:
+        with self._lock:
+            total = self.hits + self.near_hits + self.misses
+            size = self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "size": size,
+                "max_size": self.max_size,
+                "ttl_s": self.ttl,
+                "similarity": self.similarity,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.near_hits) / total, 3) if total else 0.0,
+                "stored": self.stored,
+                "evicted": self.evicted,
+                "expired": self.expired,
+            }
+
+
+_cache: Optional[ResponseCache] = None
+_init_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        with _init_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    RESPONSE_CACHE_PATH, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIMILARITY
+                )
+    return _cache
+
+
+def response_cache_metrics() -> dict:
+    return get_response_cache().metrics()
@@ -117,38 +117,33 @@ export const ChatProvider: React.FC<ChatProviderProps> = ({ children }) => {
     setMessages(prev => [...prev, userMsg]);
     setIsLoading(true);
 
-    try {
-      const apiData = await api.getChatResponse(text, activeChatId);
-
-      let responseText = "";
-      let detectedMonster = null;
+    const assistantId = (Date.now() + 1).toString();
+    let started = false;
 
-      if (typeof apiData === 'string') {
-        responseText = apiData;
-      } else {
-        responseText = apiData.response;
-        detectedMonster = apiData.detected_monster;
-        fetchChats();
-      }
-
-      const assistantMsg: Message = {
-        id: (Date.now() + 1).toString(),
-        role: 'assistant',
-        content: responseText || "Forgive me, Hunter. I lost my notes.",
-        timestamp: Date.now()
-      };
+    try {
+      // Os trechos chegam conforme a LLM gera; a mensagem do assistente
+      // nasce no primeiro trecho e vai sendo completada.
+      const responseText = await api.streamChatResponse(text, activeChatId, {
+        onDelta: (delta) => {
+          if (!started) {
+            started = true;
+            setIsLoading(false);
+            setMessages(prev => [...prev, { id: assistantId, role: 'assistant', content: delta, timestamp: Date.now() }]);
+          } else {
+            setMessages(prev => prev.map(m => m.id === assistantId ? { ...m, content: m.content + delta } : m));
+          }
+        },
+      });
+      fetchChats();
 
-      setMessages(prev => [...prev, assistantMsg]);
-
-      if (detectedMonster) {
-        const intel = await api.getMonsterIntel(detectedMonster);
-        if (intel && intel.weakness) {
-          setMonsterIntel({
-            ...intel,
-            name: detectedMonster.charAt(0).toUpperCase() + detectedMonster.slice(1).toLowerCase(),
-            image: intel.image || `https://picsum.photos/seed/${detectedMonster}/800/600`
-          });
-        }
+      if (!started) {
+        const assistantMsg: Message = {
+          id: assistantId,
+          role: 'assistant',
+          content: responseText || "Forgive me, Hunter. I lost my notes.",
+          timestamp: Date.now()
+        };
+        setMessages(prev => [...prev, assistantMsg]);
       }
     } catch (error) {
       console.error(error);
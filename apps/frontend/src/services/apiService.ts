@@ -39,6 +39,72 @@ export async function getChatResponse(message: string, chatId: string | null = n
   }
 }
 
+export interface ChatStreamHandlers {
+  onDelta: (text: string) => void;
+}
+
+/**
+ * Versão em streaming de getChatResponse (/chat/stream, Server-Sent Events).
+ * Chama onDelta a cada trecho recebido e resolve com o texto completo.
+ */
+export async function streamChatResponse(
+  message: string,
+  chatId: string | null,
+  { onDelta }: ChatStreamHandlers,
+): Promise<string> {
+  const controller = new AbortController();
+  const timeoutId = setTimeout(() => controller.abort(), 90000);
+
+  try {
+    const response = await fetch(`${API_URL}/chat/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'text/event-stream',
+      },
+      body: JSON.stringify({ message, chat_id: chatId }),
+      signal: controller.signal,
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`${response.status} ${response.statusText}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let fullText = '';
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const raw = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        if (!raw.startsWith('data: ')) continue;
+
+        const event = JSON.parse(raw.slice(6));
+        if (event.error) throw new Error(event.error);
+        if (event.delta) {
+          fullText += event.delta;
+          onDelta(event.delta);
+        }
+      }
+    }
+    return fullText;
+  } catch (error: any) {
+    if (error.name === 'AbortError') {
+      throw new Error("⏰ A requisição demorou demais e foi cancelada. Tente novamente com uma pergunta mais simples.");
+    }
+    throw error;
+  } finally {
+    clearTimeout(timeoutId);
+  }
+}
+
 export async function getChats() {
   const res = await fetch(`${API_URL}/chats`);
   return res.json();
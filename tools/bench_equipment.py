@@ -0,0 +1,168 @@
+"""
+bench_equipment.py — Benchmark dos endpoints /equipment (N+1 antigo vs. consultas em lote).
+
+Para cada endpoint roda a implementação antiga (uma query por linha) e a
+atual (services/equipment_service.py) contra o mesmo mhw.db, contando
+statements SQL por request (sqlite3 trace callback) e medindo p50/p95.
+
+Uso:
+    python tools/bench_equipment.py [--runs 30] [--limit 500]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "apps" / "backend" / "src"))
+
+from core.mhw.mhw_api import get_db_connection  # noqa: E402
+from services import equipment_service  # noqa: E402
+
+
+# ============================================================
+# Implementação antiga (N+1) — mantida aqui só para comparação
+# ============================================================
+
+def _legacy_get_text(conn, table, item_id, lang='pt'):
+    row = conn.execute(f"SELECT name FROM {table} WHERE id = ? AND lang_id = ?", (item_id, lang)).fetchone()
+    if row:
+        return row['name']
+    row = conn.execute(f"SELECT name FROM {table} WHERE id = ? AND lang_id = 'en'", (item_id,)).fetchone()
+    return row['name'] if row else None
+
+
+def _legacy_skill_info(conn, skilltree_id, lang='pt'):
+    row = conn.execute("SELECT name, description FROM skilltree_text WHERE id = ? AND lang_id = ?", (skilltree_id, lang)).fetchone()
+    if row:
+        return {"name": row['name'], "description": row['description'] or ""}
+    row = conn.execute("SELECT name, description FROM skilltree_text WHERE id = ? AND lang_id = 'en'", (skilltree_id,)).fetchone()
+    if row:
+        return {"name": row['name'], "description": row['description'] or ""}
+    return {"name": None, "description": ""}
+
+
+def legacy_armor(conn, limit):
+    armors = conn.execute("""
+        SELECT a.id, at.name, a.armor_type, a.rank, a.rarity, a.defense_base, a.defense_max,
+               a.fire, a.water, a.thunder, a.ice, a.dragon, a.slot_1, a.slot_2, a.slot_3,
+               a.armorset_id, a.armorset_bonus_id
+        FROM armor a JOIN armor_text at ON a.id = at.id
+        WHERE at.lang_id = 'pt'
+        ORDER BY a.rarity DESC, a.defense_base DESC LIMIT ? OFFSET 0
+    """, (limit,)).fetchall()
+    results = []
+    for a in armors:
+        q = """SELECT st.name, ars.level FROM armor_skill ars JOIN skilltree_text st ON ars.skilltree_id = st.id
+               WHERE ars.armor_id = ? AND st.lang_id = ?"""
+        skills = conn.execute(q, (a['id'], 'pt')).fetchall() or conn.execute(q, (a['id'], 'en')).fetchall()
+        set_name = _legacy_get_text(conn, 'armorset_text', a['armorset_id']) if a['armorset_id'] else None
+        tiers = []
+        bonus_name = None
+        if a['armorset_bonus_id']:
+            row = conn.execute("SELECT name FROM armorset_bonus_text WHERE id = ? AND lang_id = 'pt'", (a['armorset_bonus_id'],)).fetchone()
+            bonus_name = row['name'] if row else None
+            tiers = conn.execute("""
+                SELECT abs.required, st.name AS skill_name FROM armorset_bonus_skill abs
+                JOIN skilltree_text st ON abs.skilltree_id = st.id
+                WHERE abs.setbonus_id = ? AND st.lang_id = 'pt' ORDER BY abs.required
+            """, (a['armorset_bonus_id'],)).fetchall()
+        results.append((a['id'], set_name, bonus_name, len(tiers), len(skills)))
+    return results
+
+
+def legacy_decorations(conn, limit):
+    decos = conn.execute("""
+        SELECT d.id, dt.name, d.slot, d.skilltree_id, d.skilltree2_id
+        FROM decoration d JOIN decoration_text dt ON d.id = dt.id
+        WHERE dt.lang_id = 'pt' ORDER BY d.slot DESC, dt.name LIMIT ?
+    """, (limit,)).fetchall()
+    results = []
+    for d in decos:
+        s1 = _legacy_skill_info(conn, d['skilltree_id'])
+        s2 = _legacy_skill_info(conn, d['skilltree2_id']) if d['skilltree2_id'] else None
+        results.append((d['id'], s1, s2))
+    return results
+
+
+def legacy_charms(conn, limit):
+    charms = conn.execute("""
+        SELECT c.id, ct.name, c.rarity FROM charm c JOIN charm_text ct ON c.id = ct.id
+        WHERE ct.lang_id = 'pt' ORDER BY c.rarity DESC, ct.name LIMIT ?
+    """, (limit,)).fetchall()
+    results = []
+    for ch in charms:
+        q = """SELECT st.name, cs.level FROM charm_skill cs JOIN skilltree_text st ON cs.skilltree_id = st.id
+               WHERE cs.charm_id = ? AND st.lang_id = ?"""
+        skills = conn.execute(q, (ch['id'], 'pt')).fetchall() or conn.execute(q, (ch['id'], 'en')).fetchall()
+        results.append((ch['id'], len(skills)))
+    return results
+
+
+def legacy_set_bonuses(conn, limit):
+    bonuses = conn.execute("SELECT id, name FROM armorset_bonus_text WHERE lang_id = 'pt' ORDER BY name").fetchall()
+    results = []
+    for b in bonuses:
+        q = """SELECT abs.required, st.name, st.description FROM armorset_bonus_skill abs
+               JOIN skilltree_text st ON abs.skilltree_id = st.id
+               WHERE abs.setbonus_id = ? AND st.lang_id = ? ORDER BY abs.required"""
+        tiers = conn.execute(q, (b['id'], 'pt')).fetchall() or conn.execute(q, (b['id'], 'en')).fetchall()
+        results.append((b['id'], len(tiers)))
+    return results
+
+
+# ============================================================
+# Runner
+# ============================================================
+
+CASES = [
+    ("/equipment/armor", legacy_armor, lambda conn, limit: equipment_service.list_armor(conn, limit=limit)),
+    ("/equipment/decorations", legacy_decorations, lambda conn, limit: equipment_service.list_decorations(conn, limit=limit)),
+    ("/equipment/charms", legacy_charms, lambda conn, limit: equipment_service.list_charms(conn, limit=limit)),
+    ("/equipment/set-bonuses", legacy_set_bonuses, lambda conn, limit: equipment_service.list_set_bonuses(conn)),
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def measure(fn, conn, limit, runs):
+    statements = [0]
+    conn.set_trace_callback(lambda _sql: statements.__setitem__(0, statements[0] + 1))
+    fn(conn, limit)  # aquecimento + contagem
+    per_request = statements[0]
+    conn.set_trace_callback(None)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(conn, limit)
+        timings.append((time.perf_counter() - start) * 1000)
+    return per_request, statistics.median(timings), _percentile(timings, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        print(f"{'endpoint':<26} {'impl':<7} {'stmts/req':>10} {'p50 ms':>9} {'p95 ms':>9}")
+        print("-" * 65)
+        for endpoint, legacy_fn, batched_fn in CASES:
+            for label, fn in (("before", legacy_fn), ("after", batched_fn)):
+                stmts, p50, p95 = measure(fn, conn, args.limit, args.runs)
+                print(f"{endpoint:<26} {label:<7} {stmts:>10} {p50:>9.2f} {p95:>9.2f}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+bench_llm_queue.py — Teste de carga do scheduler da LLM (services/llm_scheduler.py).
+
+Sobe o servidor LLM falso (tools/stub_llm_server.py, com limite de
+requests em voo que devolve 429) e dispara uma rajada de turnos:
+--chats chats × --messages mensagens, todas de uma vez. Cada turno imita o
+chat: "prepara" por --prep segundos (histórico + RAG) e chama a LLM pelo
+cliente compartilhado (services/llm_client.py).
+
+Dois cenários contra o mesmo stub:
+  - direto: sem scheduler, como era antes
+  - scheduler: admissão (503 quando a fila passa de --queue), FIFO por chat
+    e no máximo --concurrency chamadas em voo
+
+Relata turnos ok / 429 / 503 / erro, p50/p95 de latência, pico em voo no
+stub, respostas fora de ordem dentro de um chat e as métricas do scheduler.
+
+Uso:
+    python tools/bench_llm_queue.py [--chats 40] [--messages 3] [--concurrency 8] [--queue 64] [--capacity 10] [--latency 1.0] [--stream]
+    python tools/bench_llm_queue.py --url http://127.0.0.1:8765   # stub já rodando
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import Counter, defaultdict
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "apps" / "backend" / "src"))
+
+
+def _http(url: str, method: str = "GET") -> dict:
+    request = urllib.request.Request(url, method=method, data=b"" if method == "POST" else None)
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def start_stub(args) -> subprocess.Popen:
+    process = subprocess.Popen([
+        sys.executable, str(ROOT_DIR / "tools" / "stub_llm_server.py"),
+        "--port", str(args.port), "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--capacity", str(args.capacity),
+    ])
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            _http(f"{args.url}/stats")
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit("stub LLM não respondeu em 20s")
+
+
+async def run_scenario(args, scheduler) -> dict:
+    from openai import RateLimitError  # type: ignore
+    from services.llm_client import get_llm_client
+    from services.llm_scheduler import QueueFullError
+
+    client = get_llm_client()
+    outcomes: Counter = Counter()
+    latencies: list[float] = []
+    retry_after: list[int] = []
+    finished: dict[str, list[int]] = defaultdict(list)
+
+    async def call(chat_id: str, index: int):
+        messages = [{"role": "user", "content": f"{chat_id} mensagem {index}"}]
+        if args.stream:
+            stream = await client.chat.completions.create(model="stub-llm", messages=messages, stream=True)
+            async for _ in stream:
+                pass
+        else:
+            await client.chat.completions.create(model="stub-llm", messages=messages)
+
+    async def turn(chat_id: str, index: int):
+        started = time.perf_counter()
+        try:
+            if scheduler is None:
+                await asyncio.sleep(args.prep)
+                await call(chat_id, index)
+            else:
+                async with scheduler.admit(chat_id) as scheduled:
+                    await asyncio.sleep(args.prep)
+                    async with scheduled.llm_slot():
+                        await call(chat_id, index)
+            outcomes["ok"] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+            finished[chat_id].append(index)
+        except QueueFullError as e:
+            outcomes["503"] += 1
+            retry_after.append(e.retry_after)
+        except RateLimitError:
+            outcomes["429"] += 1
+        except Exception as e:
+            outcomes[f"erro {type(e).__name__}"] += 1
+
+    _http(f"{args.url}/stats/reset", "POST")
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(turn(f"chat-{c:03d}", m))
+        for m in range(args.messages)
+        for c in range(args.chats)
+    ]
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    out_of_order = sum(1 for order in finished.values() if order != sorted(order))
+    return {
+        "outcomes": dict(outcomes),
+        "elapsed_s": elapsed,
+        "p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+        "out_of_order_chats": out_of_order,
+        "retry_after": (min(retry_after), max(retry_after)) if retry_after else None,
+        "stub": _http(f"{args.url}/stats"),
+        "scheduler": scheduler.metrics() if scheduler is not None else None,
+    }
+
+
+def report(label: str, result: dict):
+    outcomes = ", ".join(f"{k}: {v}" for k, v in sorted(result["outcomes"].items()))
+    print(f"\n== {label}")
+    print(f"  turnos         {outcomes}")
+    print(f"  tempo total    {result['elapsed_s']:.1f}s")
+    print(f"  latência ok    p50 {result['p50_ms']:.0f}ms   p95 {result['p95_ms']:.0f}ms")
+    print(f"  stub           pico em voo {result['stub']['peak']}, 429s {result['stub']['rate_limited']}")
+    print(f"  fora de ordem  {result['out_of_order_chats']} chats")
+    metrics = result["scheduler"]
+    if metrics:
+        print(
+            f"  scheduler      pico ativo {metrics['peak_active']}, pico na fila {metrics['peak_queued']}, "
+            f"recusados {metrics['rejected']}"
+        )
+        if result["retry_after"]:
+            print(f"  Retry-After    {result['retry_after'][0]}–{result['retry_after'][1]}s nos 503")
+        for name in ("chat_wait", "slot_wait"):
+            wait = metrics[name]
+            if wait.get("count"):
+                print(f"  {name:<14} p50 {wait['p50_ms']:.0f}ms   p95 {wait['p95_ms']:.0f}ms   máx {wait['max_ms']:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=40)
+    parser.add_argument("--messages", type=int, default=3, help="Mensagens por chat, enviadas sem esperar a resposta")
+    parser.add_argument("--prep", type=float, default=0.05, help="Segundos de preparo do turno (histórico + RAG)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--queue", type=int, default=64)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--retries", type=int, default=0, help="LLM_MAX_RETRIES do cliente (0 mostra os 429 crus)")
+    parser.add_argument("--url", default=None, help="Stub já rodando (senão sobe um)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--capacity", type=int, default=10)
+    args = parser.parse_args()
+
+    process = None
+    if args.url is None:
+        args.url = f"http://127.0.0.1:{args.port}"
+        process = start_stub(args)
+
+    # Antes de importar o cliente: o config lê as variáveis no import
+    os.environ["LLM_BASE_URL"] = f"{args.url}/v1"
+    os.environ.setdefault("NVIDIA_API_KEY", "stub")
+    os.environ["LLM_HTTP2"] = "0"
+    os.environ["LLM_MAX_RETRIES"] = str(args.retries)
+
+    from services.llm_client import close_llm_client
+    from services.llm_scheduler import LLMScheduler
+
+    async def run():
+        try:
+            report("direto (sem scheduler)", await run_scenario(args, None))
+            scheduler = LLMScheduler(args.concurrency, args.queue, retry_after=5)
+            report(f"scheduler ({args.concurrency} em voo, fila {args.queue})", await run_scenario(args, scheduler))
+        finally:
+            await close_llm_client()
+
+    print(f"{args.chats} chats × {args.messages} mensagens, stub com {args.capacity} em voo e ~{args.latency}s por resposta")
+    try:
+        asyncio.run(run())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+bench_rag_loader.py — Benchmark do rag_loader: serial vs. pool de processos.
+
+Roda load_document_groups com cada quantidade de workers, confere que os
+documentos (ids, textos, metadata) e o mapa grupo -> XMLs são idênticos ao
+modo serial e mede o tempo total.
+
+Uso:
+    python tools/bench_rag_loader.py [--workers 0 2 4] [--runs 3]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "apps" / "backend" / "src"))
+
+from core.mhw.rag_loader import load_document_groups  # noqa: E402
+
+
+def _snapshot(docs_by_group, sources):
+    docs = [(d.id_, d.text, d.metadata) for docs in docs_by_group.values() for d in docs]
+    return docs, sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    baseline = None
+    rows = []
+    for workers in args.workers:
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            result = load_document_groups(workers=workers)
+            timings.append(time.perf_counter() - start)
+            snapshot = _snapshot(*result)
+            if baseline is None:
+                baseline = snapshot
+            elif snapshot != baseline:
+                raise SystemExit(f"workers={workers}: documentos diferentes do modo serial")
+        rows.append((workers, len(baseline[0]), statistics.median(timings), min(timings)))
+
+    print(f"\n{'workers':>8} {'docs':>7} {'mediana s':>10} {'min s':>8}")
+    print("-" * 37)
+    for workers, docs, median, best in rows:
+        print(f"{workers:>8} {docs:>7} {median:>10.2f} {best:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+bench_sessions.py — Benchmark do sessions.db com muitos chats longos.
+
+Cria um sessions.db temporário (nunca o de data/), semeia N chats × M
+mensagens e mede p50/p95 das consultas do caminho do chat, primeiro sem os
+índices (idx_messages_chat_ts, idx_chats_updated_at) e depois com eles:
+
+  - lista de chats (página de 50, ORDER BY updated_at)
+  - histórico inteiro de um chat x página (limit) x página anterior (before)
+  - janela do history_manager (load_history)
+  - gravação do turno: antigo (2× add_message + get_chat_messages inteiro)
+    x add_turn (uma transação)
+
+Uso:
+    python tools/bench_sessions.py [--chats 10000] [--messages 200] [--runs 200] [--db /tmp/bench_sessions.db]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "apps" / "backend" / "src"))
+
+_INDEXES = {
+    "idx_messages_chat_ts": "CREATE INDEX idx_messages_chat_ts ON messages(chat_id, timestamp)",
+    "idx_chats_updated_at": "CREATE INDEX idx_chats_updated_at ON chats(updated_at)",
+}
+_WORDS = "rathalos legiana joia ataque build katana gelo fraqueza armadura slot skill crítico mr rank".split()
+
+
+def _text(rng: random.Random, length: int) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < length:
+        words.append(rng.choice(_WORDS))
+    return " ".join(words)
+
+
+def seed(path: str, chats: int, messages: int, content: int) -> list[str]:
+    """Semeia o banco (sem índices; ficam para depois) e retorna os ids dos chats."""
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    for name in _INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    chat_ids = [f"bench-{i:06d}" for i in range(chats)]
+    base_ts = 1_700_000_000_000
+    started = time.perf_counter()
+    with conn:
+        conn.executemany(
+            "INSERT INTO chats (id, title, created_at, updated_at) VALUES (?, ?, datetime(?, 'unixepoch'), datetime(?, 'unixepoch'))",
+            [(cid, f"Chat {i}", 1_700_000_000 + i, 1_700_000_000 + rng.randrange(10_000_000)) for i, cid in enumerate(chat_ids)],
+        )
+    for i, cid in enumerate(chat_ids):
+        rows = [
+            (f"{cid}-{j}", cid, "user" if j % 2 == 0 else "assistant", _text(rng, content), base_ts + i * 1_000_000 + j * 1000)
+            for j in range(messages)
+        ]
+        conn.executemany("INSERT INTO messages (id, chat_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)", rows)
+        if i % 500 == 499:
+            conn.commit()
+            print(f"  semeando... {i + 1}/{chats} chats", end="\r", flush=True)
+    conn.commit()
+    conn.close()
+    print(f"  {chats} chats × {messages} mensagens semeados em {time.perf_counter() - started:.1f}s" + " " * 10)
+    return chat_ids
+
+
+def set_indexes(path: str, enabled: bool):
+    conn = sqlite3.connect(path)
+    with conn:
+        for name, ddl in _INDEXES.items():
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+            if enabled:
+                conn.execute(ddl)
+        conn.execute("ANALYZE")
+    conn.close()
+
+
+def measure(fn, args_list) -> dict:
+    timings = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--content", type=int, default=160, help="Caracteres por mensagem")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "bench_sessions.db"))
+    args = parser.parse_args()
+
+    for suffix in ("", "-wal", "-shm"):
+        Path(args.db + suffix).unlink(missing_ok=True)
+    # Antes de importar data.db: o pool lê o caminho do config no import
+    os.environ["SESSIONS_DB_PATH"] = args.db
+
+    from data import db  # noqa: E402
+    from data.pool import get_sessions_pool, get_sessions_writer  # noqa: E402
+    from services.history_manager import load_history  # noqa: E402
+
+    db.init_sessions_db()
+    chat_ids = seed(args.db, args.chats, args.messages, args.content)
+    rng = random.Random(7)
+    sample = [rng.choice(chat_ids) for _ in range(args.runs)]
+    middle_ts = {cid: 1_700_000_000_000 + chat_ids.index(cid) * 1_000_000 + (args.messages // 2) * 1000 for cid in set(sample)}
+
+    def legacy_turn(cid):
+        db.add_message(cid, "user", "pergunta")
+        db.add_message(cid, "assistant", "resposta")
+        db.get_chat_messages(cid)
+
+    cases = [
+        ("lista de chats (página)", lambda: measure(db.get_all_chats, [(args.page, 0)] * args.runs)),
+        ("histórico inteiro", lambda: measure(db.get_chat_messages, [(c,) for c in sample])),
+        ("histórico (página)", lambda: measure(db.get_chat_messages, [(c, args.page) for c in sample])),
+        ("histórico (página anterior)", lambda: measure(db.get_chat_messages, [(c, args.page, middle_ts[c]) for c in sample])),
+        ("janela (load_history)", lambda: measure(load_history, [(c,) for c in sample])),
+        ("turno antigo (2 escritas + leitura)", lambda: measure(legacy_turn, [(c,) for c in sample])),
+        ("turno (add_turn)", lambda: measure(db.add_turn, [(c, "pergunta", "resposta") for c in sample])),
+    ]
+
+    results = {}
+    for label, enabled in (("sem índices", False), ("com índices", True)):
+        set_indexes(args.db, enabled)
+        get_sessions_pool().reset()
+        print(f"\n== {label}")
+        for name, run in cases:
+            results[(label, name)] = stats = run()
+            print(f"  {name:<38} p50 {stats['p50']:8.2f}ms   p95 {stats['p95']:8.2f}ms")
+
+    print(f"\n{'consulta':<38} {'p50 sem':>10} {'p50 com':>10} {'ganho':>8}")
+    for name, _ in cases:
+        before, after = results[("sem índices", name)]["p50"], results[("com índices", name)]["p50"]
+        print(f"{name:<38} {before:9.2f}ms {after:9.2f}ms {before / after if after else 0:7.1f}x")
+
+    get_sessions_writer().close()
+
+
+if __name__ == "__main__":
+    main()
@@ -96,6 +96,7 @@ def build_exe():
         "--add-data", f".env{os.pathsep}.",           # Inclui o .env na raiz
         "--hidden-import", "core.mhw.rag_pipeline",  # Pipeline de auto-atualização do RAG
         "--hidden-import", "core.mhw.rag_loader",    # Loader de XMLs estruturados
+        "--hidden-import", "core.mhw.game_data_cache",  # Cache compilado dos XMLs
         "--paths", backend_src,      # Adiciona a pasta src para busca de módulos
         main_script                  # Script principal
     ]
@@ -204,7 +205,12 @@ if __name__ == "__main__":
     try:
         sys.path.append(os.path.abspath("apps/backend/src"))
         from core.mhw import mhw_rag
-        
+        from core.mhw.game_data_cache import get_game_data_cache
+
+        # Compilar os XMLs para o cache binário antes de indexar
+        get_game_data_cache().compile_all()
+        print("✓ Cache de dados do jogo compilado.")
+
         # Garantir rebuild limpo
         storage_path = Path("apps/backend/src/data/storage")
         _force_rmtree(storage_path)
@@ -0,0 +1,124 @@
+"""
+stub_llm_server.py — Servidor LLM falso (API OpenAI /v1/chat/completions) para testes de carga.
+
+Responde depois de --latency segundos (± --jitter), com ou sem stream, e
+imita o limite do endpoint da NVIDIA: acima de --capacity requests em voo
+devolve 429. GET /stats mostra em voo, pico, atendidos e 429s;
+POST /stats/reset zera os contadores.
+
+Uso:
+    python tools/stub_llm_server.py [--port 8765] [--latency 1.0] [--jitter 0.2] [--capacity 10] [--chunks 20]
+
+Depois aponte o backend para ele:
+    LLM_BASE_URL=http://127.0.0.1:8765/v1 NVIDIA_API_KEY=stub LLM_HTTP2=0
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import uvicorn  # type: ignore
+from fastapi import FastAPI, Request  # type: ignore
+from fastapi.responses import JSONResponse, StreamingResponse  # type: ignore
+
+MODEL = "stub-llm"
+
+
+class Stats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.served = 0
+        self.rate_limited = 0
+
+    def snapshot(self) -> dict:
+        return {"in_flight": self.in_flight, "peak": self.peak, "served": self.served, "rate_limited": self.rate_limited}
+
+
+def build_app(latency: float, jitter: float, capacity: int, chunks: int) -> FastAPI:
+    app = FastAPI(title="Stub LLM")
+    stats = Stats()
+
+    def delay() -> float:
+        return max(0.0, latency + random.uniform(-jitter, jitter))
+
+    def chunk(content: str, finish=None) -> str:
+        body = {
+            "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": MODEL,
+            "choices": [{"index": 0, "delta": {"content": content} if content else {}, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(body)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        if capacity and stats.in_flight >= capacity:
+            stats.rate_limited += 1
+            return JSONResponse(
+                {"error": {"message": "Too Many Requests", "type": "rate_limit"}}, status_code=429,
+                headers={"Retry-After": "1"},
+            )
+        stats.in_flight += 1
+        stats.peak = max(stats.peak, stats.in_flight)
+        prompt = body["messages"][-1]["content"] if body.get("messages") else ""
+        text = f"Resposta para: {prompt}"
+
+        if body.get("stream"):
+            async def events():
+                try:
+                    step = delay() / max(1, chunks)
+                    for i in range(chunks):
+                        await asyncio.sleep(step)
+                        yield chunk(text if i == 0 else " ...")
+                    yield chunk("", finish="stop")
+                    yield "data: [DONE]\n\n"
+                    stats.served += 1
+                finally:
+                    stats.in_flight -= 1
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        try:
+            await asyncio.sleep(delay())
+            stats.served += 1
+        finally:
+            stats.in_flight -= 1
+        return {
+            "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": MODEL,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats.snapshot()
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        stats.reset()
+        return stats.snapshot()
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0, help="Segundos por resposta")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--capacity", type=int, default=10, help="Requests em voo antes de 429 (0 = sem limite)")
+    parser.add_argument("--chunks", type=int, default=20, help="Pedaços por resposta em stream")
+    args = parser.parse_args()
+
+    app = build_app(args.latency, args.jitter, args.capacity, args.chunks)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+test_name_resolution.py — Resolução de nomes dos tools do chat (core/mhw/name_index.py).
+
+Confere contra o mhw.db de data/ que resolve_name mantém o que as buscas
+LIKE antigas devolviam para termos parciais (primeiro id da tabela entre
+os que casam) e só passa na frente o nome exato e as palavras inteiras:
+
+  - get_skill_info('Ataque')     -> Reforço de Ataque (não "Ataque de Fogo")
+  - get_armor_details('Couro')   -> Elmo de Couro (não "Couro de Zorah α")
+  - get_weapon_details('osso')   -> a de maior raridade entre todas as que
+    casam no melhor nível, não só entre os primeiros ids
+
+Uso:
+    python tools/test_name_resolution.py
+"""
+
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "apps" / "backend" / "src"))
+
+from core.mhw.mhw_api import get_skill_info  # noqa: E402
+from core.mhw.mhw_tools import get_armor_details, get_weapon_details  # noqa: E402
+from core.mhw.name_index import RANK_EXACT, RANK_WORD, ensure_name_index, resolve_name, search_ids  # noqa: E402
+from data.pool import get_mhw_pool  # noqa: E402
+
+
+def check(label: str, got, expected):
+    assert got == expected, f"{label}: esperado {expected!r}, veio {got!r}"
+    print(f"✅ {label}: {got}")
+
+
+def main():
+    # Os tools também funcionam sem o índice (LIKE); aqui testamos o caminho indexado
+    assert ensure_name_index(), "índice de nomes indisponível (SQLite sem FTS5 trigram?)"
+
+    check("get_skill_info('Ataque')", (get_skill_info("Ataque") or {}).get("name"), "Reforço de Ataque")
+    check("get_armor_details('Couro')", (get_armor_details("Couro") or {}).get("name"), "Elmo de Couro")
+
+    for term in ("bone", "osso"):
+        matches = resolve_name("weapon", term, limit=None)
+        check(f"resolve_name('{term}', limit=None) sem corte", len(matches), len(search_ids("weapon", term)))
+        best = [m["id"] for m in matches if m["rank"] == matches[0]["rank"]]
+        with get_mhw_pool().connection() as conn:
+            top = conn.execute(
+                f"SELECT MAX(rarity) FROM weapon WHERE id IN ({','.join('?' * len(best))})", best
+            ).fetchone()[0]
+        check(f"get_weapon_details('{term}') raridade máxima", (get_weapon_details(term) or {}).get("rarity"), top)
+
+    exact = resolve_name("armor", "elmo de couro", limit=1)
+    check("nome exato sem caixa", (exact[0]["name"], exact[0]["rank"]), ("Elmo de Couro", RANK_EXACT))
+
+    monster = resolve_name("monster", "Rathalos", limit=2)
+    check("exato antes das variantes", [m["name"] for m in monster][:1], ["Rathalos"])
+
+    skill = resolve_name("skill", "critico", limit=1)
+    check("sem acento, palavra inteira", (skill[0]["name"], skill[0]["rank"]), ("Olho Crítico", RANK_WORD))
+
+
+if __name__ == "__main__":
+    main()
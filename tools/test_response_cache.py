@@ -0,0 +1,85 @@
+"""
+test_response_cache.py — O cache de respostas não atravessa conversas.
+
+Dois chats fazem a mesma pergunta dependente de contexto ("explique
+melhor") com o mesmo contexto RAG, mas históricos diferentes: a resposta
+gravada por um não pode sair no outro, nem por acerto exato nem por
+quase-duplicata (mesmo embedding). O mesmo chat, com o mesmo histórico,
+continua acertando.
+
+Usa bancos temporários (sessions.db e response_cache.db); não precisa de LLM.
+
+Uso:
+    python tools/test_response_cache.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "apps" / "backend" / "src"))
+
+TMP_DIR = tempfile.mkdtemp(prefix="mhw_cache_test_")
+os.environ["SESSIONS_DB_PATH"] = os.path.join(TMP_DIR, "sessions.db")
+
+from data.db import init_sessions_db  # noqa: E402
+from services import chat_service  # noqa: E402
+from services.response_cache import ResponseCache  # noqa: E402
+
+SYSTEM = {"role": "system", "content": "DADOS TÉCNICOS (RAG):\nRathalos: fraco a Dragão e Trovão."}
+QUESTION = "explique melhor"
+HISTORY_A = [
+    {"role": "user", "content": "Quais as fraquezas do Rathalos?"},
+    {"role": "assistant", "content": "Dragão e Trovão."},
+]
+HISTORY_B = [
+    {"role": "user", "content": "Qual a melhor arma contra o Rathalos?"},
+    {"role": "assistant", "content": "Arco de Trovão."},
+]
+
+
+def _messages(history: list[dict]) -> list[dict]:
+    return [SYSTEM, *history, {"role": "user", "content": QUESTION}]
+
+
+async def main():
+    init_sessions_db()
+    cache = ResponseCache(os.path.join(TMP_DIR, "response_cache.db"), max_size=100, ttl=3600, similarity=0.9)
+    chat_service.get_response_cache = lambda: cache
+    timings = chat_service.TurnTimings()
+
+    # Chat A grava a resposta
+    turn_a = await chat_service._lookup_response(QUESTION, _messages(HISTORY_A), True, timings)
+    assert turn_a is not None and turn_a.response is None, "cache deveria começar vazio"
+    await chat_service._store_response(turn_a, QUESTION, "Resposta sobre as fraquezas.")
+
+    # Mesmo chat, mesmo histórico: acerto
+    again = await chat_service._lookup_response(QUESTION, _messages(HISTORY_A), True, timings)
+    assert again.response == "Resposta sobre as fraquezas.", "mesmo diálogo deveria acertar o cache"
+
+    # Chat B, mesma pergunta e mesmo contexto RAG, histórico diferente: erro
+    turn_b = await chat_service._lookup_response(QUESTION, _messages(HISTORY_B), True, timings)
+    assert turn_b.fingerprint != turn_a.fingerprint, "histórico diferente precisa mudar o fingerprint"
+    assert turn_b.response is None, "resposta de outra conversa saiu do cache"
+
+    # Sem histórico também é outra conversa
+    fresh = await chat_service._lookup_response(QUESTION, _messages([]), True, timings)
+    assert fresh.response is None, "turno sem histórico reaproveitou resposta de conversa"
+
+    # Quase-duplicata: mesmo embedding, fingerprint de outra conversa
+    embedding = [0.6, 0.8, 0.0]
+    cache.put("explica melhor", turn_a.fingerprint, "Resposta A (embedding).", embedding)
+    assert cache.get("pode explicar melhor?", turn_b.fingerprint, embedding) is None, \
+        "quase-duplicata atravessou conversas"
+    assert cache.get("pode explicar melhor?", turn_a.fingerprint, embedding) == "Resposta A (embedding).", \
+        "quase-duplicata da mesma conversa deveria acertar"
+
+    cache.close()
+    print("✅ Cache de respostas separa conversas com históricos diferentes.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())